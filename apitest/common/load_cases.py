@@ -4,9 +4,13 @@ Created on 2019-03-06
 @author: zhengjin
 '''
 
+import hashlib
+import json
 import sys
 import os
 
+from collections import namedtuple
+
 project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
     sys.path.index(project_dir)
@@ -20,6 +24,9 @@ from utils import XlsxUtils
 
 class LoadCases(object):
 
+    CASE_NAME_INDEX = 1
+    CASE_TAGS_INDEX = 2
+
     __load = None
 
     @classmethod
@@ -34,55 +41,87 @@ class LoadCases(object):
         self.__test_cases = []
         self.__header = []
 
+        # case index, built once when sheet loaded
+        self.__record_types = {}
+        self.__sheets = {}  # (file_path, sheet_name) => {'header', 'cases', 'names', 'tags', 'stamp'}
+        self.__sheet_names = {}  # file_path => sheet names of last load_all_cases()
+        self.__cur_sheet = None
+        self.__loaded_names = {}
+
     # --------------------------------------------------------------
     # Load test cases data
     # --------------------------------------------------------------
-    def load_all_cases(self, file_path):
+    def load_all_cases(self, file_path, is_use_cache=True):
+        '''
+        Load cases of all sheets. If is_use_cache, cases are loaded from the compiled cache file
+        when the workbook is not changed, and the cache file is rebuilt after excel is parsed.
+        '''
+        cache_path = self.__get_cache_path(file_path)
+        if is_use_cache and self.__is_cache_valid(file_path, cache_path):
+            self.__logger.info('load test cases from compiled cache: ' + cache_path)
+            # cache may be valid by content hash for a touched file, and cases are bound to the current stamp
+            return self.load_cases_from_snapshot(cache_path, self.__get_file_stamp(file_path, is_with_hash=False))
+
         sheets = self.__xlsx.get_all_sheets_names(file_path)
-        
+        self.__sheet_names[file_path] = list(sheets)
+
         ret_tc = []
-        for sheet in sheets:
-            tmp_tcs = self.pre_load_sheet(file_path, sheet).load_all_cases_by_sheet()
-            ret_tc.extend(tmp_tcs)
+        try:
+            for sheet in sheets:
+                tmp_tcs = self.pre_load_sheet(file_path, sheet).load_all_cases_by_sheet()
+                ret_tc.extend(tmp_tcs)
+        finally:
+            # all sheets are parsed into case index, and workbook is not used any more
+            self.__xlsx.release_workbooks()
 
-        self.__test_cases = ret_tc
+        self.__set_loaded_tcs(ret_tc)
+        if is_use_cache:
+            self.__write_snapshot(file_path, cache_path)
         return ret_tc
 
     def pre_load_sheet(self, file_path, sheet_name):
-        self.__xlsx.pre_read_sheet(file_path, sheet_name)
+        '''
+        Sheet is parsed once, and parsed again if the workbook is changed (by mtime and size).
+        '''
+        key = (file_path, sheet_name)
+        stamp = self.__get_file_stamp(file_path, is_with_hash=False)
+        if key not in self.__sheets or self.__sheets[key]['stamp'] != stamp:
+            self.__xlsx.pre_read_sheet(file_path, sheet_name)
+            header = self.__xlsx.read_header_row()
+            if len(header) == 0:
+                raise Exception('No header line defined for test case!')
+            rows = self.__xlsx.read_all_rows_by_sheet()[1:]
+            self.__sheets[key] = self.__build_sheet_index(header, rows, stamp)
 
-        self.__header = self.__xlsx.read_header_row()
-        if len(self.__header) == 0:
-            raise Exception('No header line defined for test case!')
+        self.__cur_sheet = self.__sheets[key]
+        self.__header = self.__cur_sheet['header']
         return self
 
     def load_all_cases_by_sheet(self):
-        self.__test_cases = self.__xlsx.read_all_rows_by_sheet()
+        self.__verify_sheet_loaded()
+        self.__set_loaded_tcs(self.__cur_sheet['cases'])
         return self.__test_cases
 
     def load_cases_by_sheet_and_tags(self, tags):
         '''
         Tags: list of keywords, like ['p1', 'smoke']
         '''
-        tcs = self.__xlsx.read_all_rows_by_sheet()
-        ret_tcs = []
-        for tc in tcs:
-            tmp_tags = tc[2].split(',')
-            found = True
-            for tag in tags:
-                if tag not in tmp_tags:
-                    found = False
-                    break
-            if found:
-                ret_tcs.append(tc)
-
-        self.__test_cases = ret_tcs
+        self.__verify_sheet_loaded()
+        if len(tags) == 0:
+            return self.load_all_cases_by_sheet()
+
+        tags_index = self.__cur_sheet['tags']
+        other_tags_cases = [set(tags_index.get(tag, ())) for tag in tags[1:]]
+        ret_tcs = [tc for tc in tags_index.get(tags[0], [])
+                   if all([tc in tag_cases for tag_cases in other_tags_cases])]
+        self.__set_loaded_tcs(ret_tcs)
         return ret_tcs
 
     def load_cases_by_sheet_and_ids(self, ids):
-        tcs = self.__xlsx.read_all_rows_by_sheet()
-        ret_tcs = [tc for tc in tcs if tc[1] in ids]
-        self.__test_cases = ret_tcs
+        self.__verify_sheet_loaded()
+        names_index = self.__cur_sheet['names']
+        ret_tcs = [names_index[case_id] for case_id in ids if case_id in names_index]
+        self.__set_loaded_tcs(ret_tcs)
         return ret_tcs
 
     def get_case_header_by_sheet(self):
@@ -91,6 +130,136 @@ class LoadCases(object):
     def get_loaded_tcs(self):
         return self.__test_cases
 
+    def __verify_sheet_loaded(self):
+        if self.__cur_sheet is None:
+            raise Exception('Pls pre load sheet first!')
+
+    def __set_loaded_tcs(self, tcs):
+        self.__test_cases = list(tcs)
+        # first case wins for duplicated case names
+        self.__loaded_names = {}
+        for tc in self.__test_cases:
+            self.__loaded_names.setdefault(tc[self.CASE_NAME_INDEX], tc)
+
+    # --------------------------------------------------------------
+    # Case index
+    # --------------------------------------------------------------
+    def __build_sheet_index(self, header, rows, stamp):
+        '''
+        Build case records (immutable namedtuple) and index by case name and tags for one sheet.
+        '''
+        record_type = self.__get_record_type(header)
+        cases = tuple([record_type._make(row) for row in rows])
+
+        names_index = {}
+        tags_index = {}
+        for tc in cases:
+            names_index.setdefault(tc[self.CASE_NAME_INDEX], tc)  # first case wins for duplicated names
+            for tag in tc[self.CASE_TAGS_INDEX].split(','):
+                tags_index.setdefault(tag, set()).add(tc)
+        # keep cases in sheet order for each tag
+        for tag, tag_cases in tags_index.items():
+            tags_index[tag] = [tc for tc in cases if tc in tag_cases]
+
+        return {'header': record_type._schema, 'cases': cases, 'names': names_index, 'tags': tags_index, 'stamp': stamp}
+
+    def __get_record_type(self, header):
+        header = tuple([str(col) for col in header])
+        record_type = self.__record_types.get(header)
+        if record_type is None:
+            record_type = namedtuple('TestCase', header, rename=True)
+            record_type._schema = header
+            self.__record_types[header] = record_type
+        return record_type
+
+    # --------------------------------------------------------------
+    # Cases snapshot (for parallel workers)
+    # --------------------------------------------------------------
+    def dump_cases_snapshot(self, file_path, snapshot_path):
+        '''
+        Load all cases from excel, and save header and cases of each sheet as json snapshot.
+        '''
+        self.load_all_cases(file_path)
+        return self.__write_snapshot(file_path, snapshot_path)
+
+    def __write_snapshot(self, file_path, snapshot_path):
+        snapshot = {'file_path': file_path, 'sheets': []}
+        snapshot.update(self.__get_file_stamp(file_path))
+        stamp = {'mtime': snapshot['mtime'], 'size': snapshot['size']}
+        for sheet_name in self.__sheet_names.get(file_path, []):
+            sheet = self.__sheets.get((file_path, sheet_name))
+            if sheet is None or sheet['stamp'] != stamp:
+                # workbook is changed while loading, and cases are not saved with the new stamp
+                self.__logger.warning('test cases are changed while loading, and snapshot is not written: ' + file_path)
+                return ''
+            snapshot['sheets'].append({'name': sheet_name, 'header': sheet['header'], 'cases': sheet['cases']})
+
+        tmp_path = snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, snapshot_path)
+        except IOError as e:
+            self.__logger.warning('write test cases snapshot failed: %s' % e)
+            return ''
+        self.__logger.info('dump test cases snapshot: ' + snapshot_path)
+        return snapshot_path
+
+    def load_cases_from_snapshot(self, snapshot_path, stamp=None):
+        '''
+        Stamp: workbook mtime and size which cases are bound to, default is the stamp saved in snapshot.
+        '''
+        if not os.path.exists(snapshot_path):
+            raise FileNotFoundError('cases snapshot file is not exist: ' + snapshot_path)
+
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if stamp is None:
+            stamp = {'mtime': snapshot.get('mtime'), 'size': snapshot.get('size')}
+
+        ret_tc = []
+        self.__sheet_names[snapshot['file_path']] = [sheet['name'] for sheet in snapshot['sheets']]
+        for sheet in snapshot['sheets']:
+            key = (snapshot['file_path'], sheet['name'])
+            self.__sheets[key] = self.__build_sheet_index(sheet['header'], sheet['cases'], stamp)
+            self.__cur_sheet = self.__sheets[key]
+            self.__header = self.__cur_sheet['header']
+            ret_tc.extend(self.__cur_sheet['cases'])
+
+        self.__set_loaded_tcs(ret_tc)
+        return ret_tc
+
+    # --------------------------------------------------------------
+    # Compiled cases cache
+    # --------------------------------------------------------------
+    def __get_cache_path(self, file_path):
+        dir_path, file_name = os.path.split(os.path.abspath(file_path))
+        return os.path.join(dir_path, '.%s.cases.json' % file_name)
+
+    def __get_file_stamp(self, file_path, is_with_hash=True):
+        stat = os.stat(file_path)
+        stamp = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        if is_with_hash:
+            with open(file_path, 'rb') as f:
+                stamp['sha1'] = hashlib.sha1(f.read()).hexdigest()
+        return stamp
+
+    def __is_cache_valid(self, file_path, cache_path):
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except ValueError:
+            self.__logger.warning('invalid test cases cache file: ' + cache_path)
+            return False
+
+        stamp = self.__get_file_stamp(file_path, is_with_hash=False)
+        if cached.get('mtime') == stamp['mtime'] and cached.get('size') == stamp['size']:
+            return True
+        # file touched but content not changed
+        return cached.get('sha1') == self.__get_file_stamp(file_path)['sha1']
+
     # --------------------------------------------------------------
     # Get one test case info
     # --------------------------------------------------------------
@@ -98,9 +267,9 @@ class LoadCases(object):
         if len(self.__test_cases) == 0:
             raise Exception('No test cases found!')
 
-        for tc in self.get_loaded_tcs():
-            if tc[1] == case_name:
-                return {k: v for k, v in zip(self.get_case_header_by_sheet(), tc)}
+        tc = self.__loaded_names.get(case_name)
+        if tc is not None:
+            return dict(zip(tc._schema, tc))
 
     # --------------------------------------------------------------
     # Case Utils
@@ -24,6 +24,14 @@ elif [[ $1 == "report" ]]; then
     echo "$tag generate allure report."
     allure generate outputs/results/ -o outputs/reports/ --clean
     # outputs: logs/ results/ reports/
+elif [[ $1 == "parallel" ]]; then
+    workers=${2:-4}
+    echo "$tag start run api test in parallel by $workers workers."
+    # pytest-xdist: master process dumps cases snapshot, and each worker loads cases from it.
+    # results of workers are merged into one html report and allure results dir.
+    pytest -v -n $workers --dist load testcases/ --html=outputs/api-report.html --alluredir outputs/results/
+    echo "$tag generate allure report."
+    allure generate outputs/results/ -o outputs/reports/ --clean
 else
     echo "invalid input args!"
     exit 99
@@ -20,6 +20,7 @@ except ValueError:
 from utils import Constants
 from utils import LogManager
 from utils import SysUtils
+from utils import XlsxBulkWriter
 Constants.add_project_paths()
 
 from common import LoadConfigs
@@ -27,6 +28,8 @@ from common import LoadCases
 
 
 project_path = os.path.join(os.getenv('PYPATH'), 'apitest')
+results_header = ['CaseName', 'StatusCode', 'Latency(ms)', 'Outcome']
+results_writer = None
 
 
 def load_configs():
@@ -34,39 +37,120 @@ def load_configs():
     LoadConfigs.load_configs(cfg_file_path)
 
 
-def init_logger():
+def init_logger(worker_id=''):
     logdir_path = LoadConfigs.get_testenv_configs().get('logdir_path')
     logdir_path = logdir_path.replace('{project}', project_path)
-    logfile_path = os.path.join(
-        logdir_path, 'pytest_log_%s.txt' % SysUtils.get_current_date_and_time())
-    LogManager.build_logger(logfile_path)
+    logfile_name = 'pytest_log_%s.txt' % SysUtils.get_current_date_and_time()
+    if len(worker_id) > 0:
+        logfile_name = logfile_name.replace('.txt', '_%s.txt' % worker_id)
+    LogManager.build_logger(os.path.join(logdir_path, logfile_name))
 
 
-def load_testcases():
+def get_tc_file_path():
     tc_file_path = LoadConfigs.get_testenv_configs().get('tc_file_path')
-    tc_file_path = tc_file_path.replace('{project}', project_path)
-    LoadCases.get_instance().load_all_cases(tc_file_path)
+    return tc_file_path.replace('{project}', project_path)
+
+
+def get_cases_snapshot_path():
+    output_dir = LoadConfigs.get_testenv_configs().get('output_dir')
+    return os.path.join(output_dir.replace('{project}', project_path), 'cases_snapshot.json')
+
+
+def load_testcases(is_worker=False):
+    if is_worker:
+        LoadCases.get_instance().load_cases_from_snapshot(get_cases_snapshot_path())
+    else:
+        LoadCases.get_instance().load_all_cases(get_tc_file_path())
+
+
+def build_results_writer():
+    global results_writer
+    testenv_configs = LoadConfigs.get_testenv_configs()
+    results_file_path = testenv_configs.get('results_file_path').replace('{project}', project_path)
+    results_writer = XlsxBulkWriter(results_file_path, testenv_configs.get('results_sheet'), results_header)
+
+
+def get_results_spool_dir():
+    output_dir = LoadConfigs.get_testenv_configs().get('output_dir')
+    return os.path.join(output_dir.replace('{project}', project_path), 'results_spool')
 
 
 def init_allure_env():
     allure.environment(report='Allure report', browser='Firefox', hostname='zhengjin.host.local')
 
 
-@pytest.fixture(scope='session')
+def get_xdist_worker_id(config):
+    if hasattr(config, 'workerinput'):
+        return config.workerinput.get('workerid', '')
+    return ''
+
+
+def is_xdist_master(config):
+    return getattr(config.option, 'numprocesses', None) and not hasattr(config, 'workerinput')
+
+
+def pytest_configure(config):
+    '''
+    For parallel run (pytest-xdist), the master process parses test cases once into a snapshot,
+    and each worker inits cases from the snapshot instead of excel.
+    '''
+    if not hasattr(config, 'workerinput'):
+        # master or non-xdist process, and results rows left by a previous crashed run are not merged
+        load_configs()
+        SysUtils.delete_files_in_dir(get_results_spool_dir())
+
+    if is_xdist_master(config):
+        init_logger('master')
+        LoadCases.get_instance().dump_cases_snapshot(get_tc_file_path(), get_cases_snapshot_path())
+        build_results_writer()
+
+
+def pytest_unconfigure(config):
+    if is_xdist_master(config):
+        # aggregate results rows from all workers, and write excel once
+        results_writer.merge_spool_and_flush(get_results_spool_dir())
+        LogManager.clear_log_handles()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    '''
+    Buffer case results (status code, latency, outcome), and written into excel at the end of session.
+    '''
+    outcome = yield
+    report = outcome.get_result()
+    if report.when != 'call' or results_writer is None:
+        return
+
+    resp = getattr(item.instance, 'last_resp', None)
+    if resp is None:
+        results_writer.append_row([item.name, '', int(report.duration * 1000), report.outcome])
+    else:
+        latency = int(resp.elapsed.total_seconds() * 1000)
+        results_writer.append_row([item.name, resp.status_code, latency, report.outcome])
+
+
+@pytest.fixture(scope='session', autouse=True)
 def setup_test_session(request):
     '''
-    Setup for test session: 
+    Setup for test session (in each worker for parallel run): 
     1) init logger and allure; 2) load configs and testcases.
     '''
+    worker_id = get_xdist_worker_id(request.config)
     load_configs()
-    init_logger()
-    load_testcases()
+    init_logger(worker_id)
+    load_testcases(is_worker=len(worker_id) > 0)
+    build_results_writer()
     init_allure_env()
 
     logger = LogManager.get_logger()
     logger.info('[session setup]: 1) init logger and allure; 2) load configs and testcases.')
 
     def clear():
+        if len(worker_id) > 0:
+            results_writer.dump_to_spool(get_results_spool_dir(), worker_id)
+        else:
+            results_writer.flush()
         logger.info('[session clearup] done.')
         LogManager.clear_log_handles()
     request.addfinalizer(clear)
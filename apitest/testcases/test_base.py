@@ -18,6 +18,7 @@ class TestBase(object):
     CASE_SCHEMA_EXP_MSG = 'RetMsg'
 
     def base_http_assert(self, resp, retCode=200):
+        self.last_resp = resp  # for case results, status code and latency
         assert(resp is not None and resp.status_code == retCode)
 # TestBase end
 
@@ -1,5 +1,11 @@
 from monkeytest.monkey_monitor import MonkeyMonitor
 from monkeytest.profile_monitor import ProfileMonitor
 from monkeytest.chart_parser import ChartParser
+from monkeytest.profile_dashboard import ProfileDashboard
+from monkeytest.proc_sampler import ProcSampler
+from monkeytest.logcat_analyzer import LogcatAnalyzer
+from monkeytest.logcat_streamer import LogcatStreamer
+from monkeytest.artifact_collector import ArtifactCollector
 from monkeytest.monkey_report import MonkeyReport
 from monkeytest.monkey_test import MonkeyTest
+from monkeytest.monkey_device_pool import MonkeyDevicePool
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2018-12-12
+
+@author: zhengjin
+'''
+
+import os
+import sys
+import tarfile
+import time
+import zipfile
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants, LogManager, AdbUtils, SysUtils
+
+
+class ArtifactCollector(object):
+    '''
+    Pull test artifacts from device concurrently, and archive local logs into one file by stdlib (zip or tar.xz).
+    '''
+
+    ARCHIVE_FORMAT_ZIP = 'zip'
+    ARCHIVE_FORMAT_XZ = 'xz'
+
+    # already compressed, and stored in zip as is
+    __compressed_exts = ('.gz', '.xz', '.zip', '.png', '.jpg')
+
+    def __init__(self, serial=''):
+        self.__logger = LogManager.get_logger()
+        self.__sysutils = SysUtils()
+        self.__adb = AdbUtils(serial).get_adb_cmd()
+
+    # --------------------------------------------------------------
+    # Pull files
+    # --------------------------------------------------------------
+    def pull_files(self, file_pairs, timeout=300, max_concurrency=8):
+        '''
+        File pairs: list of (remote file or dir path, local dir path), and returns failed remote paths.
+        '''
+        for _, local_dir_path in file_pairs:
+            SysUtils.create_dir(local_dir_path)
+        cmds = ['%s pull %s %s' % (self.__adb, remote_path, local_dir_path) for remote_path, local_dir_path in file_pairs]
+
+        start = time.perf_counter()
+        results = self.__sysutils.run_cmds(cmds, timeout=timeout, max_concurrency=max_concurrency)
+        failed = [pair[0] for pair, result in zip(file_pairs, results) if not result.is_ok()]
+        self.__logger.info('Pull %d files in %.3f secs, failed: %d' % (len(cmds), time.perf_counter() - start, len(failed)))
+        return failed
+
+    # --------------------------------------------------------------
+    # Archive
+    # --------------------------------------------------------------
+    def create_archive(self, src_dir_path, archive_path, archive_format=ARCHIVE_FORMAT_ZIP):
+        '''
+        Files are compressed one by one while writing into archive, and no temp files.
+        '''
+        if not os.path.exists(src_dir_path):
+            self.__logger.error('Dir is NOT exist: ' + src_dir_path)
+            return False
+        SysUtils.create_dir(os.path.dirname(archive_path))
+
+        start = time.perf_counter()
+        base_name = os.path.basename(src_dir_path.rstrip(os.sep))
+        if archive_format == self.ARCHIVE_FORMAT_ZIP:
+            self.__create_zip_archive(src_dir_path, base_name, archive_path)
+        elif archive_format == self.ARCHIVE_FORMAT_XZ:
+            with tarfile.open(archive_path, mode='w:xz') as tar:
+                tar.add(src_dir_path, arcname=base_name)
+        else:
+            raise ValueError('invalid archive format: ' + archive_format)
+
+        self.__logger.info('Create archive file %s (%d KB) in %.3f secs' % (
+            archive_path, os.path.getsize(archive_path) / 1024, time.perf_counter() - start))
+        return True
+
+    def __create_zip_archive(self, src_dir_path, base_name, archive_path):
+        with zipfile.ZipFile(archive_path, mode='w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            for dir_path, _, file_names in os.walk(src_dir_path):
+                for file_name in file_names:
+                    file_path = os.path.join(dir_path, file_name)
+                    arc_name = os.path.join(base_name, os.path.relpath(file_path, src_dir_path))
+                    compress_type = zipfile.ZIP_STORED if file_name.endswith(self.__compressed_exts) else zipfile.ZIP_DEFLATED
+                    zf.write(file_path, arcname=arc_name, compress_type=compress_type)
+
+
+if __name__ == '__main__':
+
+    LogManager.build_logger(Constants.LOG_FILE_PATH)
+
+    local_dir_path = os.path.join(os.getenv('HOME'), 'Downloads/tmp_files/device_logs')
+    collector = ArtifactCollector()
+    collector.pull_files([('/data/anr', local_dir_path), ('/data/tombstones', local_dir_path)])
+    collector.create_archive(local_dir_path, local_dir_path + '.zip')
+
+    LogManager.clear_log_handles()
+    print('artifact collector test DONE.')
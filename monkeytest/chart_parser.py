@@ -5,10 +5,12 @@ Created on 2018-11-20
 @author: zhengjin
 '''
 
+import multiprocessing
 import os
 import sys
-import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 sys.path.append(os.getenv('PYPATH'))
 from utils import Constants, LogManager, SysUtils
@@ -29,6 +31,9 @@ class ChartParser(object):
                             'upflow_com_jd_b2b.txt',
                             'downflow_com_jd_b2b.txt')
 
+    # points more than chart pixels are not visible, and downsampled before plot
+    __max_plot_points = 1000
+
     def __init__(self, report_root_path):
         '''
         Constructor
@@ -45,114 +50,177 @@ class ChartParser(object):
         if len(profile_types) > 2:
             raise Exception('Invalid number of profile types!')
 
-        y1_arr = self.sysutils.read_lines_from_file(
-            self.__get_abs_profile_filepath(profile_types[0]))
+        y1_arr = self.__load_profile_values(self.__get_abs_profile_filepath(profile_types[0]))
         if len(y1_arr) == 0:
             raise Exception('y1_arr length is zero!')
 
-        y2_arr = []
+        y2_arr = np.array([], dtype=np.int64)
         if len(profile_types) == 2:
-            y2_arr = self.sysutils.read_lines_from_file(
-                self.__get_abs_profile_filepath(profile_types[1]))
+            y2_arr = self.__load_profile_values(self.__get_abs_profile_filepath(profile_types[1]))
 
-        ret_y1_arr = [int(float(item.split()[1])) for item in y1_arr]
-        ret_y2_arr = []
-        if len(y2_arr) > 0:
-            ret_y2_arr = [int(float(item.split()[1])) for item in y2_arr]
+        return self.__fix_negative_num_issue(y1_arr), self.__fix_negative_num_issue(y2_arr)
 
-        return self.__fix_negative_num_issue(ret_y1_arr), self.__fix_negative_num_issue(ret_y2_arr)
+    def __load_profile_values(self, file_path):
+        # line: "2018-11-26-12-19-50\t42.56", and only value column is loaded
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            self.__logger.error('File is NOT exist or empty: ' + file_path)
+            return np.array([], dtype=np.int64)
+        values = np.loadtxt(file_path, usecols=1, dtype=np.float64, ndmin=1, encoding='utf-8')
+        return values.astype(np.int64)  # same as int(float(value))
 
     def __get_abs_profile_filepath(self, file_name):
         return os.path.join(self.__handtest_dir_path, file_name)
 
     def __fix_negative_num_issue(self, y_arr):
-        for i in range(0, len(y_arr)):
-            if y_arr[i] < 0:
-                y_arr[i] = 0
-        return y_arr
+        return np.clip(y_arr, 0, None)
+
+    @classmethod
+    def downsample_min_max(cls, y_arr, max_points):
+        '''
+        Split values into max_points/2 buckets, and keep min and max of each bucket (spikes are kept).
+        Returns (x indexes, y values).
+        '''
+        y_arr = np.asarray(y_arr)
+        if len(y_arr) <= max_points:
+            return np.arange(len(y_arr)), y_arr
+
+        bucket_size = -(-len(y_arr) // max(max_points // 2, 1))  # ceil
+        buckets = -(-len(y_arr) // bucket_size)
+        # pad last bucket with nan, which is ignored by nanargmin and nanargmax
+        padded = np.full(buckets * bucket_size, np.nan)
+        padded[:len(y_arr)] = y_arr
+        padded = padded.reshape(buckets, bucket_size)
+
+        offsets = np.arange(buckets) * bucket_size
+        idx = np.concatenate((offsets + np.nanargmin(padded, axis=1), offsets + np.nanargmax(padded, axis=1)))
+        idx = np.unique(idx)  # sorted, keep time order
+        return idx, y_arr[idx]
+
+    def __plot_line(self, ax, y_arr, color):
+        x_arr, y_arr = self.downsample_min_max(y_arr, self.__max_plot_points)
+        ax.plot(x_arr, y_arr, color=color)
 
     # --------------------------------------------------------------
     # Build Charts
     # --------------------------------------------------------------
     def build_all_profile_charts(self):
+        '''
+        Charts of one report are built one by one, and use build_profile_charts_for_reports() for many reports.
+        '''
         self.build_profile_chart(ChartParser.CATEGORY_CPU)
         self.build_profile_chart(ChartParser.CATEGORY_MEM)
         self.build_profile_chart(ChartParser.CATEGORY_UPFLOW)
         self.build_profile_chart(ChartParser.CATEGORY_DOWNFLOW)
 
     def build_profile_chart(self, p_category, is_show=False):
-        plt.title('APP Profile Test')
-        plt.grid(True, color='green', linestyle='--', linewidth='1')
+        if is_show:
+            import matplotlib.pyplot as plt  # window is required only for show
+            fig = plt.figure()
+        else:
+            # no pyplot global state, and render by Agg which is safe in threads and sub processes
+            fig = Figure()
+            FigureCanvasAgg(fig)
+        ax = fig.add_subplot(1, 1, 1)
+        ax.set_title('APP Profile Test')
+        ax.grid(True, color='green', linestyle='--', linewidth='1')
 
         profile_types = self.__profile_types_list[p_category].split(',')
         if p_category == self.CATEGORY_CPU:
-            self.__build_cpu_chart(profile_types)
-            self.__save_profile_image('cpu')
+            self.__build_cpu_chart(ax, profile_types)
+            self.__save_profile_image(fig, 'cpu')
         elif p_category == self.CATEGORY_MEM:
-            self.__build_mem_pss_chart(profile_types)
-            self.__save_profile_image('mem')
+            self.__build_mem_pss_chart(ax, profile_types)
+            self.__save_profile_image(fig, 'mem')
         elif p_category == self.CATEGORY_UPFLOW:
-            self.__build_upflow_chart(profile_types)
-            self.__save_profile_image('upflow')
+            self.__build_upflow_chart(ax, profile_types)
+            self.__save_profile_image(fig, 'upflow')
         elif p_category == self.CATEGORY_DOWNFLOW:
-            self.__build_downflow_chart(profile_types)
-            self.__save_profile_image('downflow')
+            self.__build_downflow_chart(ax, profile_types)
+            self.__save_profile_image(fig, 'downflow')
         else:
             raise Exception('Invalid input profile category!')
 
         if is_show:
             plt.show()
-        plt.close('all')
+            plt.close(fig)
 
-    def __build_cpu_chart(self, profile_types):
+    def __build_cpu_chart(self, ax, profile_types):
         y1_arr, y2_arr = self.__read_profile_data(profile_types)
-        x_arr = [x for x in range(0, len(y1_arr))]
-        plt.plot(x_arr, y1_arr, color='red')
-        plt.plot(x_arr, y2_arr, color='blue')
+        self.__plot_line(ax, y1_arr, 'red')
+        self.__plot_line(ax, y2_arr, 'blue')
 
         x_label_desc1 = 'Red: %s (average: %.2f%%, max: %d%%)' \
             % (profile_types[0].rstrip('.txt'), np.average(y1_arr), np.max(y1_arr))
         x_label_desc2 = 'Blue: %s (average: %.2f%%, max: %d%%)' \
             % (profile_types[1].rstrip('.txt'), np.average(y2_arr), np.max(y2_arr))
-        plt.xlabel('Time (secs)\n%s\n%s' % (x_label_desc1, x_label_desc2))
-        plt.ylabel('CPU usage (%)')
+        ax.set_xlabel('Time (secs)\n%s\n%s' % (x_label_desc1, x_label_desc2))
+        ax.set_ylabel('CPU usage (%)')
 
-    def __build_mem_pss_chart(self, profile_types):
+    def __build_mem_pss_chart(self, ax, profile_types):
         y1_arr, y2_arr = self.__read_profile_data(profile_types)
-        x_arr = [x for x in range(0, len(y1_arr))]
-        plt.plot(x_arr, y1_arr, color='red')
-        plt.plot(x_arr, y2_arr, color='blue')
+        self.__plot_line(ax, y1_arr, 'red')
+        self.__plot_line(ax, y2_arr, 'blue')
 
         x_label_desc1 = 'Red: %s (average: %.2f MB, max: %d MB)' \
             % (profile_types[0].rstrip('.txt'), np.average(y1_arr), np.max(y1_arr))
         x_label_desc2 = 'Blue: %s (average: %.2f MB, max: %d MB)' \
             % (profile_types[1].rstrip('.txt'), np.average(y2_arr), np.max(y2_arr))
-        plt.xlabel('Time (secs)\n%s\n%s' % (x_label_desc1, x_label_desc2))
-        plt.ylabel('Memory Pss Usage (MB)')
+        ax.set_xlabel('Time (secs)\n%s\n%s' % (x_label_desc1, x_label_desc2))
+        ax.set_ylabel('Memory Pss Usage (MB)')
 
-    def __build_upflow_chart(self, profile_types):
+    def __build_upflow_chart(self, ax, profile_types):
         y_arr, _ = self.__read_profile_data(profile_types)
-        x_arr = [x for x in range(0, len(y_arr))]
-        plt.plot(x_arr, y_arr, color='red')
+        self.__plot_line(ax, y_arr, 'red')
 
         x_label_desc = 'Red: ' + profile_types[0].rstrip('.txt')
-        plt.xlabel('Time (secs)\n%s' % x_label_desc)
-        plt.ylabel('Upflow (KB)')
+        ax.set_xlabel('Time (secs)\n%s' % x_label_desc)
+        ax.set_ylabel('Upflow (KB)')
 
-    def __build_downflow_chart(self, profile_types):
+    def __build_downflow_chart(self, ax, profile_types):
         y_arr, _ = self.__read_profile_data(profile_types)
-        x_arr = [x for x in range(0, len(y_arr))]
-        plt.plot(x_arr, y_arr, color='red')
+        self.__plot_line(ax, y_arr, 'red')
 
         x_label_desc = 'Red: ' + profile_types[0].rstrip('.txt')
-        plt.xlabel('Time (secs)\n%s' % x_label_desc)
-        plt.ylabel('Downflow (KB)')
+        ax.set_xlabel('Time (secs)\n%s' % x_label_desc)
+        ax.set_ylabel('Downflow (KB)')
 
-    def __save_profile_image(self, key):
+    def __save_profile_image(self, fig, key):
         save_dpi = 300
         save_path = os.path.join(self.__report_root_path, 'profile_%s.png' % key)
-        plt.tight_layout()
-        plt.savefig(save_path, format='png', dpi=save_dpi)
+        fig.tight_layout()
+        fig.savefig(save_path, format='png', dpi=save_dpi)
+
+
+# --------------------------------------------------------------
+# Build charts in process pool
+# --------------------------------------------------------------
+def build_profile_chart_in_process(report_root_path, p_category):
+    if not LogManager.has_logger():
+        LogManager.build_logger(os.path.join(report_root_path, 'chart_parser_log.log'))
+    try:
+        ChartParser(report_root_path).build_profile_chart(p_category)
+    except Exception as e:
+        LogManager.get_logger().error('Build chart %d failed for %s: %s' % (p_category, report_root_path, e))
+        return False
+    return True
+
+
+def build_profile_charts_for_reports(report_root_paths, processes=None, categories=None):
+    '''
+    Build charts for many reports (devices or runs), each (report, category) chart is a task in process pool.
+    Returns list of (report path, category) which is failed, and failures are also logged in this process.
+    '''
+    if categories is None:
+        categories = (ChartParser.CATEGORY_CPU, ChartParser.CATEGORY_MEM,
+                      ChartParser.CATEGORY_UPFLOW, ChartParser.CATEGORY_DOWNFLOW)
+    tasks = [(path, category) for path in report_root_paths for category in categories]
+    with multiprocessing.Pool(processes=processes) as pool:
+        results = pool.starmap(build_profile_chart_in_process, tasks)
+
+    failed_tasks = [task for task, is_ok in zip(tasks, results) if not is_ok]
+    if len(failed_tasks) > 0 and LogManager.has_logger():
+        LogManager.get_logger().error('Build charts failed (%d/%d): %s' % (len(failed_tasks), len(tasks), failed_tasks))
+    return failed_tasks
 
 
 if __name__ == '__main__':
@@ -162,6 +230,7 @@ if __name__ == '__main__':
     root_path = '/Users/zhengjin/Downloads/tmp_files'
     parser = ChartParser(root_path)
 #     parser.build_all_profile_charts()
+#     print('failed charts:', build_profile_charts_for_reports([root_path], processes=4))
     parser.build_profile_chart(ChartParser.CATEGORY_CPU, True)
 #     parser.build_profile_chart(ChartParser.CATEGORY_MEM, True)
 #     parser.build_profile_chart(ChartParser.CATEGORY_UPFLOW)
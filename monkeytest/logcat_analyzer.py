@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2018-12-03
+
+@author: zhengjin
+'''
+
+import re
+import os
+import sys
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants, LogManager
+
+
+class LogcatAnalyzer(object):
+    '''
+    Streaming analyzer for logcat (threadtime format), feed lines one by one.
+    Exceptions are bucketed by signature (exception class, top stack frame), and ANRs are counted in the same pass.
+    '''
+
+    CATEGORY_EXCEPTION = 'exception'
+    CATEGORY_ANR = 'anr'
+
+    # 11-26 12:19:53.667 12530 12530 W System.err: java.lang.NullPointerException: ...
+    __re_logcat_line = re.compile(r'^\S+\s+(\d+):(\d+):(\d+)\.(\d+)\s+(\d+)\s+(\d+)\s+[VDIWEF]\s+([^:]*?)\s*:\s?(.*)$')
+    __re_exception = re.compile(r'^(?:Caused by:\s+)?((?:[\w$]+\.)+[\w$]*(?:Exception|Error))\b:?\s*(.*)$')
+    __re_stack_frame = re.compile(r'^\s*at\s+([\w$.<>]+)\(')
+    __re_anr = re.compile(r'^ANR\b')
+
+    __exception_tags = ('System.err', 'AndroidRuntime')
+    __anr_tags = ('ANRManager', 'ActivityManager')
+    # on MTK builds, one anr is logged by both ActivityManager and ANRManager
+    __anr_dup_window_ms = 1000
+
+    def __init__(self):
+        self.__categories = (self.CATEGORY_EXCEPTION, self.CATEGORY_ANR)
+        self.__exceptions = {}  # (exception class, top frame) => [count, sample message]
+        self.__pending = {}  # (pid, tid) => (exception class, message), wait for top stack frame
+        self.__anr_count = 0
+        self.__last_anr_times = {}  # (pid, anr message) => time in ms
+
+    # --------------------------------------------------------------
+    # Feed logcat lines
+    # --------------------------------------------------------------
+    def analyze_file(self, file_path, categories=(CATEGORY_EXCEPTION, CATEGORY_ANR)):
+        '''
+        Only lines of categories are analyzed in this file, like anr only for the anr log file.
+        '''
+        if not os.path.exists(file_path):
+            LogManager.get_logger().error('File is NOT exist: ' + file_path)
+            return self
+
+        self.__categories = categories
+        try:
+            with open(file_path, mode='r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    self.feed(line)
+            self.flush()
+        finally:
+            self.__categories = (self.CATEGORY_EXCEPTION, self.CATEGORY_ANR)
+        return self
+
+    def feed(self, line):
+        '''
+        Returns 'exception' or 'anr' if the line starts an exception or anr, otherwise None.
+        '''
+        # fast pre-filter before regex
+        if 'System.err' not in line and 'AndroidRuntime' not in line and 'ANR' not in line:
+            return None
+
+        matched = self.__re_logcat_line.match(line)
+        if matched is None:
+            return None
+        hour, minute, sec, millis, pid, tid, tag, msg = matched.groups()
+
+        if tag in self.__anr_tags:
+            if self.CATEGORY_ANR not in self.__categories or not self.__re_anr.match(msg):
+                return None
+            anr_key = (pid, msg)
+            anr_time = ((int(hour) * 60 + int(minute)) * 60 + int(sec)) * 1000 + int(millis)
+            last_time = self.__last_anr_times.get(anr_key)
+            self.__last_anr_times[anr_key] = anr_time
+            if last_time is not None and abs(anr_time - last_time) <= self.__anr_dup_window_ms:
+                return None
+            self.__anr_count += 1
+            return self.CATEGORY_ANR
+        if self.CATEGORY_EXCEPTION not in self.__categories or tag not in self.__exception_tags:
+            return None
+
+        thread_key = (pid, tid)
+        frame = self.__re_stack_frame.match(msg)
+        if frame is not None:
+            if thread_key in self.__pending:
+                self.__add_exception(self.__pending.pop(thread_key), frame.group(1))
+            return None
+
+        exception = self.__re_exception.match(msg)
+        if exception is None:
+            return None
+        if msg.startswith('Caused by:'):
+            return None  # keep signature of the outermost exception
+        if thread_key in self.__pending:
+            self.__add_exception(self.__pending.pop(thread_key), '')
+        self.__pending[thread_key] = (exception.group(1), msg)
+        return self.CATEGORY_EXCEPTION
+
+    def flush(self):
+        for pending in self.__pending.values():
+            self.__add_exception(pending, '')
+        self.__pending.clear()
+
+    def __add_exception(self, pending, top_frame):
+        exception_class, msg = pending
+        key = (exception_class, top_frame)
+        if key in self.__exceptions:
+            self.__exceptions[key][0] += 1
+        else:
+            self.__exceptions[key] = [1, msg[:120]]
+
+    # --------------------------------------------------------------
+    # Results
+    # --------------------------------------------------------------
+    def get_anr_count(self):
+        return self.__anr_count
+
+    def get_exception_count(self):
+        return sum([item[0] for item in self.__exceptions.values()])
+
+    def get_exception_summary(self):
+        '''
+        Returns list of (count, exception class, top frame, sample message), order by count desc.
+        '''
+        ret_list = [(v[0], k[0], k[1], v[1]) for k, v in self.__exceptions.items()]
+        return sorted(ret_list, key=lambda item: item[0], reverse=True)
+
+
+if __name__ == '__main__':
+
+    LogManager.build_logger(Constants.LOG_FILE_PATH)
+
+    log_path = os.path.join(os.getenv('PYPATH'), 'monkeytest/reports/examples/logcat_full_log.log')
+    analyzer = LogcatAnalyzer().analyze_file(log_path)
+    for item in analyzer.get_exception_summary():
+        print('total: %d, exception: %s, at: %s' % item[:3])
+    print('total anr:', analyzer.get_anr_count())
+
+    LogManager.clear_log_handles()
+    print('logcat analyzer test DONE.')
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2018-12-05
+
+@author: zhengjin
+'''
+
+import collections
+import gzip
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants, LogManager, SysUtils
+from monkeytest import LogcatAnalyzer
+
+
+class LogcatStreamer(object):
+    '''
+    Stream "adb logcat" stdout into host, classify exceptions and anr on the fly,
+    and write logs into local compressed rotating segments.
+    Lines around exceptions and anr (like grep -C) are written into exception and anr log files.
+    Exception context is only for stack frames of app package, same as grep 'at com.jd.b2b' -C 20 on shell.
+    '''
+
+    CATEGORY_EXCEPTION = LogcatAnalyzer.CATEGORY_EXCEPTION
+    CATEGORY_ANR = LogcatAnalyzer.CATEGORY_ANR
+
+    def __init__(self, log_dir_path, full_log_name, exception_log_name, anr_log_name,
+                 context_lines=20, segment_size=64*1024*1024, serial='', app_pkg_name=Constants.PKG_NAME_ZGB):
+        self.__logger = LogManager.get_logger()
+        self.__sysutils = SysUtils()
+        self.__analyzer = LogcatAnalyzer()
+        self.__adb_args = ['adb', '-s', serial] if len(serial) > 0 else ['adb']
+        self.__app_frame = 'at ' + app_pkg_name
+
+        self.__log_dir_path = log_dir_path
+        self.__full_log_name = full_log_name
+        self.__segment_size = segment_size
+        self.__segment_index = 0
+        self.__segment_written = 0
+        self.__segment_file = None
+
+        self.__context_lines = context_lines
+        self.__ring_buffer = collections.deque(maxlen=context_lines)  # (seq, line)
+        self.__category_file_names = {self.CATEGORY_EXCEPTION: exception_log_name, self.CATEGORY_ANR: anr_log_name}
+        self.__category_files = {}
+        self.__after_lines = {self.CATEGORY_EXCEPTION: 0, self.CATEGORY_ANR: 0}
+        self.__last_written_seq = {self.CATEGORY_EXCEPTION: -1, self.CATEGORY_ANR: -1}
+
+        self.__process = None
+        self.__reader_thread = None
+
+    # --------------------------------------------------------------
+    # Start and stop
+    # --------------------------------------------------------------
+    def start(self, log_level=Constants.LOGCAT_LOG_LEVEL):
+        self.__sysutils.run_sys_cmd(' '.join(self.__adb_args + ['logcat', '-c']))
+        cmd = self.__adb_args + ['logcat', '-v', 'threadtime', '*:%s' % log_level]
+        self.__logger.info('Start live logcat: ' + ' '.join(cmd))
+        self.__process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+        self.__open_next_segment()
+        for category, file_name in self.__category_file_names.items():
+            self.__category_files[category] = open(os.path.join(self.__log_dir_path, file_name), 'w', encoding='utf-8')
+        self.__reader_thread = threading.Thread(target=self.__read_loop, name='logcat_reader', daemon=True)
+        self.__reader_thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        '''
+        Log files are closed by reader thread when stream is closed, and not here, the thread may be still writing.
+        '''
+        if self.__process is not None and self.__process.poll() is None:
+            self.__process.kill()
+        if self.__reader_thread is not None:
+            self.__reader_thread.join(timeout)
+            if self.__reader_thread.is_alive():
+                self.__logger.warning('Live logcat reader is still running after %d secs, and results may be incomplete.' % timeout)
+        self.__logger.info('Stop live logcat, exceptions: %d, anr: %d'
+                           % (self.__analyzer.get_exception_count(), self.__analyzer.get_anr_count()))
+
+    def get_analyzer(self):
+        return self.__analyzer
+
+    # --------------------------------------------------------------
+    # Read and classify lines
+    # --------------------------------------------------------------
+    def __read_loop(self):
+        seq = 0
+        try:
+            for raw_line in self.__process.stdout:
+                self.__write_segment(raw_line)  # keep raw bytes in full log
+                line = raw_line.decode(encoding='utf-8', errors='replace').rstrip('\r\n') + '\n'
+                self.__handle_line(seq, line)
+                seq += 1
+        finally:
+            self.__close_files()
+        self.__logger.info('Live logcat stream closed.')
+
+    def __close_files(self):
+        self.__analyzer.flush()
+        if self.__segment_file is not None:
+            self.__segment_file.close()
+            self.__segment_file = None
+        for f in self.__category_files.values():
+            f.close()
+
+    def __handle_line(self, seq, line):
+        # all exceptions are counted by analyzer, and only app exceptions are written with context
+        category = self.__analyzer.feed(line)
+        if category != self.CATEGORY_ANR:
+            category = self.CATEGORY_EXCEPTION if self.__app_frame in line else None
+        if category is not None:
+            if self.__after_lines[category] == 0:
+                self.__logger.warning('[live logcat] %s: %s' % (category, line.strip()))
+            self.__write_context_before(category, seq)
+            self.__after_lines[category] = self.__context_lines + 1
+
+        for key in self.__after_lines.keys():
+            if self.__after_lines[key] > 0:
+                self.__category_files[key].write(line)
+                self.__last_written_seq[key] = seq
+                self.__after_lines[key] -= 1
+        self.__ring_buffer.append((seq, line))
+
+    def __write_context_before(self, category, cur_seq):
+        f = self.__category_files[category]
+        last_seq = self.__last_written_seq[category]
+        # separator like grep -C, only between blocks which are not contiguous
+        next_seq = min([seq for seq, _ in self.__ring_buffer if seq > last_seq] + [cur_seq])
+        if last_seq >= 0 and next_seq != last_seq + 1:
+            f.write('--\n')
+        for seq, line in self.__ring_buffer:
+            if seq > self.__last_written_seq[category]:
+                f.write(line)
+                self.__last_written_seq[category] = seq
+
+    # --------------------------------------------------------------
+    # Rotating compressed segments
+    # --------------------------------------------------------------
+    def __open_next_segment(self):
+        if self.__segment_file is not None:
+            self.__segment_file.close()
+        name, ext = os.path.splitext(self.__full_log_name)
+        segment_path = os.path.join(self.__log_dir_path, '%s_%03d%s.gz' % (name, self.__segment_index, ext))
+        self.__segment_file = gzip.open(segment_path, 'wb', compresslevel=3)
+        self.__segment_index += 1
+        self.__segment_written = 0
+
+    def __write_segment(self, line):
+        self.__segment_file.write(line)
+        self.__segment_written += len(line)
+        if self.__segment_written >= self.__segment_size:
+            self.__open_next_segment()
+
+
+if __name__ == '__main__':
+
+    LogManager.build_logger(Constants.LOG_FILE_PATH)
+
+    log_dir_path = os.path.join(os.getenv('HOME'), 'Downloads/tmp_files')
+    streamer = LogcatStreamer(log_dir_path, 'logcat_full_log.log', 'logcat_exception.log', 'logcat_anr.log')
+    streamer.start()
+    time.sleep(10)
+    streamer.stop()
+    print('exceptions:', streamer.get_analyzer().get_exception_summary())
+
+    LogManager.clear_log_handles()
+    print('logcat streamer test DONE.')
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2018-12-10
+
+@author: zhengjin
+'''
+
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants, LogManager, AdbUtils, SysUtils
+from monkeytest import MonkeyTest
+
+
+def run_monkey_test_on_device(test_pkg_name, run_mins, serial, log_dir_path):
+    '''
+    Run in sub process, and returns (serial, is_passed, exception summary, total anr).
+    '''
+    # any failure of one device is returned as result, and not breaks results of other devices in pool
+    try:
+        test = MonkeyTest(test_pkg_name, run_mins, serial, log_dir_path)
+        test.mokeytest_main()
+    except Exception as e:
+        print('Monkey test failed on device %s: %s' % (serial, e))
+        return serial, False, [], 0
+
+    analyzer = test.get_logcat_analyzer()
+    if analyzer is None:
+        return serial, False, [], 0
+    return serial, True, analyzer.get_exception_summary(), analyzer.get_anr_count()
+
+
+class MonkeyDevicePool(object):
+    '''
+    Run monkey test on all connected devices concurrently, one sub process per device.
+    Logs are saved in monkeyreports/<current time>/<serial>, and a summary report for all devices is created at the end.
+    '''
+
+    def __init__(self, test_pkg_name, run_mins, serials=None, processes=None):
+        self.__test_pkg_name = test_pkg_name
+        self.__run_mins = int(run_mins)
+        self.__serials = serials if serials is not None else AdbUtils.get_connected_devices()
+        self.__processes = processes if processes is not None else len(self.__serials)
+
+        cur_time = SysUtils.get_current_date_and_time()
+        self.__log_root_path = os.path.join(os.getcwd(), 'monkeyreports', cur_time)
+        self.__summary_report_path = os.path.join(self.__log_root_path, 'monkey_test_summary_report.txt')
+
+        SysUtils.create_dir(self.__log_root_path)
+        self.__logger = LogManager.build_logger(os.path.join(self.__log_root_path, 'run_log.log'))
+        self.__sysutils = SysUtils()
+
+    def __get_device_log_dir_path(self, serial):
+        # serial of wifi device is like 192.168.1.10:5555
+        return os.path.join(self.__log_root_path, serial.replace(':', '_'))
+
+    # --------------------------------------------------------------
+    # Run on devices
+    # --------------------------------------------------------------
+    def run(self):
+        if len(self.__serials) == 0:
+            raise Exception('No devices connected!')
+        self.__logger.info('Run monkey test on %d devices: %s' % (len(self.__serials), ', '.join(self.__serials)))
+
+        args = [(self.__test_pkg_name, self.__run_mins, serial, self.__get_device_log_dir_path(serial))
+                for serial in self.__serials]
+        # spawn: each device process builds its own logger, and not inherits handlers from this process
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(processes=self.__processes) as pool:
+            results = pool.starmap(run_monkey_test_on_device, args)
+
+        self.__create_summary_report(results)
+        LogManager.clear_log_handles()
+        return results
+
+    # --------------------------------------------------------------
+    # Summary report
+    # --------------------------------------------------------------
+    def __create_summary_report(self, results):
+        output_lines = []
+        output_lines.append('TEST PACKAGE: %s\n' % self.__test_pkg_name)
+        output_lines.append('RUN TIME (minutes): %d\n' % self.__run_mins)
+
+        output_lines.append('\nDevices summary info:\n')
+        exceptions = {}  # (exception class, top frame) => [count, devices count, sample message]
+        total_anr = 0
+        for serial, is_passed, summary, anr_count in results:
+            output_lines.append('device: %s, status: %s, exception: %d, anr: %d\n' % (
+                serial, 'done' if is_passed else 'failed', sum([item[0] for item in summary]), anr_count))
+            total_anr += anr_count
+            for count, exception_class, top_frame, msg in summary:
+                key = (exception_class, top_frame)
+                if key in exceptions:
+                    exceptions[key][0] += count
+                    exceptions[key][1] += 1
+                else:
+                    exceptions[key] = [count, 1, msg]
+
+        output_lines.append('\nAPP exceptions summary info:\n')
+        if len(exceptions) == 0:
+            output_lines.append('null\n')
+        for k, v in sorted(exceptions.items(), key=lambda item: item[1][0], reverse=True):
+            output_lines.append('total: %d, devices: %d, exception: %s, at: %s, desc: %s\n' % (
+                v[0], v[1], k[0], k[1], v[2]))
+
+        output_lines.append('\nAPP ANR summary info:\n')
+        output_lines.append('Total ANR: %d\n' % total_anr)
+
+        self.__sysutils.write_lines_to_file(self.__summary_report_path, output_lines)
+        self.__logger.info('Create summary report: ' + self.__summary_report_path)
+
+
+if __name__ == '__main__':
+
+    pool = MonkeyDevicePool(Constants.PKG_NAME_ZGB, Constants.RUN_MINS)
+    pool.run()
+    print('Monkey test on devices DONE.')
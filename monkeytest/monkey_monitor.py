@@ -18,12 +18,12 @@ class MonkeyMonitor(object):
     classdocs
     '''
 
-    def __init__(self):
+    def __init__(self, serial=''):
         '''
         Constructor
         '''
         self.__logger = LogManager.get_logger()
-        self.__adbutils = AdbUtils()
+        self.__adbutils = AdbUtils(serial)
 
     def __get_monkey_process_id(self):
         return self.__adbutils.get_process_id_by_name('monkey')
@@ -43,10 +43,6 @@ class MonkeyMonitor(object):
         return monkey_process_id
 
     def process_monkey_monitor_main(self, run_mins, interval=Constants.WAIT_TIME_IN_LOOP):
-
-        def _is_monkey_process_killed():
-            return self.__get_monkey_process_id() == ''
-
         spec_run_time = int(run_mins) * 60
         interval = int(interval)
 
@@ -55,6 +51,14 @@ class MonkeyMonitor(object):
                 'Error, spec_time must be less than max_time (12 hours)!')
             exit(1)
 
+        # process is checked in every loop, and reuse one adb shell
+        self.__adbutils.use_shell_session()
+        try:
+            self.__monkey_monitor_loop(spec_run_time, interval)
+        finally:
+            self.__adbutils.close_shell_session()
+
+    def __monkey_monitor_loop(self, spec_run_time, interval):
         monkey_p_id = self.__wait_for_monkey_process_started()
         if monkey_p_id == '':
             self.__logger.error('Error, the monkey process is NOT started!')
@@ -63,7 +67,7 @@ class MonkeyMonitor(object):
         # LOOP
         start = time.perf_counter()
         while 1:
-            if _is_monkey_process_killed():
+            if self.__get_monkey_process_id() == '':
                 self.__logger.error('Error, the monkey process is NOT running!')
                 return
 
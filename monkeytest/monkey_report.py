@@ -4,12 +4,12 @@ Created on 2018-11-26
 @author: zhengjin
 '''
 
-import re
 import os
 import sys
 
 sys.path.append(os.getenv('PYPATH'))
 from utils import Constants, LogManager, SysUtils
+from monkeytest import LogcatAnalyzer
 
 
 class MonkeyReport(object):
@@ -17,13 +17,14 @@ class MonkeyReport(object):
     classdocs
     '''
 
-    def __init__(self, log_root_dir_path, log_exception_name, log_anr_name):
+    def __init__(self, log_root_dir_path, log_exception_name, log_anr_name, log_full_name=''):
         '''
         Constructor
         '''
         self.__log_exception_path = os.path.join(
             log_root_dir_path, log_exception_name)
         self.__log_anr_path = os.path.join(log_root_dir_path, log_anr_name)
+        self.__log_full_path = os.path.join(log_root_dir_path, log_full_name) if len(log_full_name) > 0 else ''
         self.__monkey_test_report_path_for_win = os.path.join(
             log_root_dir_path, 'monkey_test_report.txt')
 
@@ -33,55 +34,41 @@ class MonkeyReport(object):
     # --------------------------------------------------------------
     # Create report
     # --------------------------------------------------------------
-    def create_monkey_test_report(self, dict_title):
+    def create_monkey_test_report(self, dict_title, analyzer=None):
         '''
         Include: package name, run time, device info, app info, exception sum info, total anr
+        If analyzer is set (fed by live logcat), logcat files are not analyzed again.
         '''
+        if analyzer is None:
+            analyzer = self.__analyze_logcat_files()
+
         output_lines = []
         output_lines = output_lines + ['%s: %s\n' % (k, v) for k, v in dict_title.items()]
 
         output_lines.append('\nAPP exceptions summary info:\n')
-        output_lines = output_lines + self.__get_exception_sum_info()
+        output_lines = output_lines + self.__get_exception_sum_info(analyzer)
 
         output_lines.append('\rAPP ANR summary info:\n')
-        output_lines.append('Total ANR: %d\n' % self.__get_anr_sum_info())
+        output_lines.append('Total ANR: %d\n' % analyzer.get_anr_count())
 
         self.__sysutils.write_lines_to_file(
             self.__monkey_test_report_path_for_win, output_lines)
+        return analyzer
 
-    def __get_exception_sum_info(self):
-        input_lines = self.__sysutils.read_lines_from_file(self.__log_exception_path)
-
-        ret_dict = {}
-        exception_key = ''
-        for line in input_lines:
-            if 'W System.err' not in line:
-                continue
-
-            re_results = re.match('.+:\s+(.*Exception.{20,100})', line)
-            try:
-                exception_key = re_results.group(1)
-            except AttributeError as e:
-                continue
+    def __analyze_logcat_files(self):
+        # full logcat includes both exceptions and anr, and analyzed in one pass
+        if len(self.__log_full_path) > 0 and os.path.exists(self.__log_full_path):
+            return LogcatAnalyzer().analyze_file(self.__log_full_path)
 
-            try:
-                ret_dict[exception_key] = ret_dict[exception_key] + 1
-            except KeyError as e:
-                ret_dict[exception_key] = 1
-        # end for
+        # context lines (grep -C) of exception and anr files are overlapped, and each file is analyzed for its own category
+        analyzer = LogcatAnalyzer().analyze_file(self.__log_exception_path, categories=(LogcatAnalyzer.CATEGORY_EXCEPTION,))
+        return analyzer.analyze_file(self.__log_anr_path, categories=(LogcatAnalyzer.CATEGORY_ANR,))
 
-        if len(ret_dict) == 0:
+    def __get_exception_sum_info(self, analyzer):
+        summary = analyzer.get_exception_summary()
+        if len(summary) == 0:
             return ['null\n']
-        return ['total: %d, desc: %s\n' % (v, k) for k, v in ret_dict.items()]
-
-    def __get_anr_sum_info(self):
-        input_lines = self.__sysutils.read_lines_from_file(self.__log_anr_path)
-        totals = 0
-
-        for line in input_lines:
-            if 'E ANRManager: ANR' in line:
-                totals = totals + 1
-        return totals
+        return ['total: %d, exception: %s, at: %s, desc: %s\n' % item for item in summary]
 
 
 if __name__ == '__main__':
@@ -14,6 +14,7 @@ import sys
 sys.path.append(os.getenv('PYPATH'))
 from utils import Constants, LogManager, AdbUtils, SysUtils
 from monkeytest import MonkeyMonitor, ProfileMonitor, ChartParser, MonkeyReport
+from monkeytest import LogcatStreamer, ArtifactCollector, ProcSampler, ProfileDashboard
 
 
 class MonkeyTest(object):
@@ -25,16 +26,22 @@ class MonkeyTest(object):
     # --------------------------------------------------------------
     # Init
     # --------------------------------------------------------------
-    def __init__(self, test_pkg_name, run_mins):
+    def __init__(self, test_pkg_name, run_mins, serial='', log_dir_path=''):
         '''
         Constructor
+        serial: run on the device by "adb -s", or the only connected device if empty.
+        log_dir_path: local log dir, default is monkeyreports/<current time>.
         '''
         self.__test_pkg_name = test_pkg_name
         self.__run_mins = int(run_mins)
+        self.__serial = serial
 
-        cur_time = SysUtils.get_current_date_and_time()
-        self.__log_root_path = os.path.join(os.getcwd(), 'monkeyreports')
-        self.__log_dir_path_for_win = os.path.join(self.__log_root_path, cur_time)
+        if len(log_dir_path) > 0:
+            self.__log_dir_path_for_win = log_dir_path
+        else:
+            cur_time = SysUtils.get_current_date_and_time()
+            self.__log_root_path = os.path.join(os.getcwd(), 'monkeyreports')
+            self.__log_dir_path_for_win = os.path.join(self.__log_root_path, cur_time)
         self.__log_dir_path_for_shell = '/data/local/tmp/monkey_test_logs'
 
         self.__exec_log_path = os.path.join(self.__log_dir_path_for_win, 'run_log.log')
@@ -51,18 +58,28 @@ class MonkeyTest(object):
         SysUtils.create_dir(self.__log_dir_path_for_win)
         self.__logger = LogManager.build_logger(self.__exec_log_path)
         self.__sysutils = SysUtils()
-        self.__adbutils = AdbUtils()
-        self.__monitor = MonkeyMonitor()
+        self.__adbutils = AdbUtils(serial)
+        self.__adb = self.__adbutils.get_adb_cmd()
+        self.__monitor = MonkeyMonitor(serial)
         
-        self.__profile_monitor = ProfileMonitor(Constants.ITEST_COLLECT_INTERVAL)
+        self.__profile_monitor = ProfileMonitor(Constants.ITEST_COLLECT_INTERVAL, serial)
+        self.__collector = ArtifactCollector(serial)
+        self.__proc_samples_file_path = os.path.join(self.__log_dir_path_for_win, 'proc_samples.bin')
+        self.__proc_sampler = ProcSampler(test_pkg_name, self.__proc_samples_file_path,
+                                          Constants.PROC_SAMPLE_INTERVAL, serial)
+        self.__is_proc_sampler_started = False
         self.__chart_parser = ChartParser(self.__log_dir_path_for_win)
-        self.__report = MonkeyReport(self.__log_dir_path_for_win, self.__logcat_exception_file_name, self.__logcat_anr_file_name)
+        self.__dashboard = ProfileDashboard(self.__log_dir_path_for_win)
+        self.__report = MonkeyReport(self.__log_dir_path_for_win, self.__logcat_exception_file_name,
+                                     self.__logcat_anr_file_name, os.path.basename(self.__logcat_log_path_for_shell))
+        self.__logcat_streamer = None
+        self.__logcat_analyzer = None
 
     # --------------------------------------------------------------
     # Monkey and logcat processes
     # --------------------------------------------------------------
     def __build_monkey_cmd(self):
-        monkey_cmd = 'adb shell "monkey --throttle 500 -p %s' % self.__test_pkg_name
+        monkey_cmd = '%s shell "monkey --throttle 500 -p %s' % (self.__adb, self.__test_pkg_name)
 
         monkey_launch_params = '-c android.intent.category.MONKEY -c android.intent.category.LAUNCHER -c ' + \
             'android.intent.category.DEFAULT --monitor-native-crashes --kill-process-after-error'
@@ -94,8 +111,16 @@ class MonkeyTest(object):
         return subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     
     def __run_logcat_subprocess(self):
-        cmd = 'adb logcat -c && adb logcat -f %s -v threadtime *:%s' % (self.__logcat_log_path_for_shell, Constants.LOGCAT_LOG_LEVEL) 
+        cmd = '%s logcat -c && %s logcat -f %s -v threadtime *:%s' % (
+            self.__adb, self.__adb, self.__logcat_log_path_for_shell, Constants.LOGCAT_LOG_LEVEL)
         return subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def __start_live_logcat(self):
+        self.__logcat_streamer = LogcatStreamer(self.__log_dir_path_for_win,
+                                                os.path.basename(self.__logcat_log_path_for_shell),
+                                                self.__logcat_exception_file_name, self.__logcat_anr_file_name,
+                                                serial=self.__serial, app_pkg_name=self.__test_pkg_name)
+        return self.__logcat_streamer.start()
     
     # --------------------------------------------------------------
     # Adb and Shell utils
@@ -113,46 +138,39 @@ class MonkeyTest(object):
                 raise Exception('Monkey test exit because of device busy!')
     
     def __filter_shell_logcat_exception(self):
-        cmd = 'adb shell \"cat %s | grep \'at com.jd.b2b\' -C 20 > %s"' % (self.__logcat_log_path_for_shell, self.__logcat_exception_path_for_shell)
+        cmd = '%s shell \"cat %s | grep \'at com.jd.b2b\' -C 20 > %s"' % (self.__adb, self.__logcat_log_path_for_shell, self.__logcat_exception_path_for_shell)
         if not self.__sysutils.run_sys_cmd(cmd):
             self.__logger.warning('Filter exception for logcat failed!')
 
     def __filter_shell_logcat_anr(self):
-        cmd = 'adb shell \"cat %s | grep \'E ANRManager: ANR\' -C 20 > %s"' % (self.__logcat_log_path_for_shell, self.__logcat_anr_path_for_shell)
+        cmd = '%s shell \"cat %s | grep \'E ANRManager: ANR\' -C 20 > %s"' % (self.__adb, self.__logcat_log_path_for_shell, self.__logcat_anr_path_for_shell)
         if not self.__sysutils.run_sys_cmd(cmd):
             self.__logger.warning('Filter anr for logcat failed!')
 
     def __pull_all_testing_logs(self):
-        shell_log_files = (self.__logcat_log_path_for_shell, self.__monkey_log_path_for_shell,
-                           self.__logcat_exception_path_for_shell, self.__logcat_anr_path_for_shell)
-        for shell_f in shell_log_files:
-            cmd_pull_log_files = 'adb pull %s %s' % (shell_f, self.__log_dir_path_for_win)
-            if not self.__sysutils.run_sys_cmd(cmd_pull_log_files):
-                self.__logger.warning('Pull logcat file failed: ' + shell_f)
+        if Constants.IS_LIVE_LOGCAT:
+            # logcat files are already written on host by live streamer
+            shell_log_files = (self.__monkey_log_path_for_shell,)
+        else:
+            shell_log_files = (self.__logcat_log_path_for_shell, self.__monkey_log_path_for_shell,
+                               self.__logcat_exception_path_for_shell, self.__logcat_anr_path_for_shell)
+        file_pairs = [(shell_f, self.__log_dir_path_for_win) for shell_f in shell_log_files]
+        file_pairs.append(('/data/tombstones', self.__log_dir_path_for_win))
 
-        if not self.__adbutils.dump_tombstone_files(self.__log_dir_path_for_win):
-            self.__logger.warning('Pull tombstone file failed!')
+        anr_save_path = os.path.join(self.__log_dir_path_for_win, 'anr')
+        file_pairs.extend([(f, anr_save_path) for f in self.__get_latest_anr_files()])
 
-        self.__pull_latest_anr_files()
+        # all files are pulled at the same time
+        for shell_f in self.__collector.pull_files(file_pairs):
+            self.__logger.warning('Pull file failed: ' + shell_f)
 
-    def __pull_latest_anr_files(self):
+    def __get_latest_anr_files(self):
         '''
         Get anr files in 24 hours.
         '''
-        cmd = 'adb shell "find /data/anr/ -name *.txt -mtime -1 2>/dev/null"'
-        anr_files = self.__sysutils.run_sys_cmd_and_ret_lines(cmd)
-        if len(anr_files) == 0:
-            return
-        
-        save_path = os.path.join(self.__log_dir_path_for_win, 'anr')
-        self.__sysutils.create_dir(save_path)
-        for f in anr_files:
-            f = f.strip('\r\n')
-            if len(f) == 0:
-                continue
-            cmd = 'adb pull %s %s' % (f, save_path)
-            if not self.__sysutils.run_sys_cmd(cmd):
-                self.__logger.warning('Pull anr file failed: ' + f)
+        cmd = 'find /data/anr/ -name *.txt -mtime -1 2>/dev/null'
+        anr_files = [f.strip('\r\n') for f in self.__adbutils.run_shell_cmd_and_ret_lines(cmd)]
+        return [f for f in anr_files if len(f) > 0]
     
     # --------------------------------------------------------------
     # Create report and archive
@@ -161,16 +179,15 @@ class MonkeyTest(object):
         title_dict = {}
         title_dict['TEST PACKAGE'] = self.__test_pkg_name
         title_dict['RUN TIME (minutes)'] = str(self.__run_mins)
-        self.__report.create_monkey_test_report(title_dict)
+        analyzer = self.__logcat_streamer.get_analyzer() if self.__logcat_streamer is not None else None
+        self.__logcat_analyzer = self.__report.create_monkey_test_report(title_dict, analyzer)
     
     def __create_archive_report_file(self):
-        time.sleep(1)
-        root_dir = r'D:\JDTestLogs'  # temp local save path
-        target_file = os.path.join(root_dir, 'monkey_' + os.path.basename(self.__log_dir_path_for_win) + '.7z')
-        cmd = r'"C:\Program Files\7-Zip\7z" a -t7z %s %s' % (target_file, self.__log_dir_path_for_win)
+        root_dir = os.path.dirname(self.__log_dir_path_for_win)
+        target_file = os.path.join(root_dir, 'monkey_' + os.path.basename(self.__log_dir_path_for_win) + '.zip')
 
         self.__logger.debug('Create archive report file: ' + target_file)
-        if not self.__sysutils.run_sys_cmd(cmd):
+        if not self.__collector.create_archive(self.__log_dir_path_for_win, target_file):
             self.__logger.warning('Create archive report file failed!')
 
     # --------------------------------------------------------------
@@ -178,6 +195,10 @@ class MonkeyTest(object):
     # --------------------------------------------------------------
     def __is_profile_test_ok(self):
         return Constants.IS_PROFILE_TEST and int(self.__adbutils.get_android_version()[0]) < 7
+
+    def __is_proc_sampler_ok(self):
+        # iTest does not work on Android 7+, and profile is sampled from /proc instead
+        return Constants.IS_PROFILE_TEST and int(self.__adbutils.get_android_version()[0]) >= 7
     
     def __test_setup_main(self):
         if not self.__adbutils.is_devices_connected():
@@ -190,15 +211,22 @@ class MonkeyTest(object):
         self.__create_log_dir_for_shell(self.__log_dir_path_for_shell)
     
         # win env setup
-        self.__adbutils.dump_device_props(self.__device_props_file_path)
-        self.__adbutils.dump_app_info(Constants.PKG_NAME_ZGB, self.__app_dump_file_path)
+        if not self.__adbutils.dump_device_props_and_app_info(
+                self.__device_props_file_path, Constants.PKG_NAME_ZGB, self.__app_dump_file_path):
+            self.__logger.warning('Dump device props or app info failed!')
         
         if self.__is_profile_test_ok():
             self.__profile_monitor.start_monitor()
+        elif self.__is_proc_sampler_ok():
+            self.__proc_sampler.start()
+            self.__is_proc_sampler_started = True
 
     def __test_main(self):
         self.__logger.info('Start logcat process.')
-        logcat_p = self.__run_logcat_subprocess()
+        if Constants.IS_LIVE_LOGCAT:
+            self.__start_live_logcat()
+        else:
+            logcat_p = self.__run_logcat_subprocess()
         self.__logger.info('Start monkey main process.')
         monkey_p = self.__run_monkey_subprocess()
     
@@ -217,7 +245,12 @@ class MonkeyTest(object):
             t.join()
 
         monkey_p.kill()
-        logcat_p.kill()
+        if Constants.IS_LIVE_LOGCAT:
+            self.__logcat_streamer.stop()
+        else:
+            logcat_p.kill()
+        if self.__is_proc_sampler_started:
+            self.__proc_sampler.stop()
 
     def __test_clearup_main(self):
         # the adb connection maybe disconnect when running the monkey
@@ -225,8 +258,9 @@ class MonkeyTest(object):
             self.__profile_monitor.stop_monitor()
             self.__adbutils.stop_app(self.__test_pkg_name)
 
-            self.__filter_shell_logcat_exception()
-            self.__filter_shell_logcat_anr()
+            if not Constants.IS_LIVE_LOGCAT:
+                self.__filter_shell_logcat_exception()
+                self.__filter_shell_logcat_anr()
             self.__pull_all_testing_logs()
             self.__create_monkey_test_report()
 
@@ -234,8 +268,16 @@ class MonkeyTest(object):
                 time.sleep(1)
                 self.__profile_monitor.pull_itest_logfiles(self.__log_dir_path_for_win)
                 self.__chart_parser.build_all_profile_charts()
+                self.__dashboard.create_dashboard()
         else:
             self.__logger.error('Device disconnect!')
+
+        # samples are on host, and charts are built even if device disconnect
+        if self.__is_proc_sampler_started:
+            ProcSampler.export_profile_files(self.__proc_samples_file_path, self.__test_pkg_name,
+                                             os.path.join(self.__log_dir_path_for_win, 'handTest'))
+            self.__chart_parser.build_all_profile_charts()
+            self.__dashboard.create_dashboard()
         LogManager.clear_log_handles()
     
         if Constants.IS_CREATE_ARCHIVE:
@@ -246,6 +288,15 @@ class MonkeyTest(object):
         self.__test_main()
         self.__test_clearup_main()
 
+    def get_logcat_analyzer(self):
+        '''
+        Returns analyzer of logcat after test done, or None if report is not created.
+        '''
+        return self.__logcat_analyzer
+
+    def get_log_dir_path(self):
+        return self.__log_dir_path_for_win
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2018-12-14
+
+@author: zhengjin
+'''
+
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants, LogManager, AdbUtils, SysUtils
+
+
+class ProcSampler(object):
+    '''
+    Host side profile sampler for APP by /proc files, works on Android 7+ (iTest is not required).
+    Each tick reads cpu, memory and traffic in one batched command over a persistent adb shell,
+    and the sample is written into a fixed size binary ring file.
+    '''
+
+    # ring file header: magic, version, record size, capacity, total written records
+    HEADER_FORMAT = '<4sHHIQ'
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    MAGIC = b'PSMP'
+    VERSION = 1
+    # record: time, pid, app cpu %, system cpu %, rss KB, pss KB, system available mem KB, rx bytes, tx bytes
+    # -1 for value unavailable
+    RECORD_FORMAT = '<diffiiiqq'
+    RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+    RECORD_FIELDS = ('time', 'pid', 'app_cpu', 'sys_cpu', 'rss', 'pss', 'mem_available', 'rx_bytes', 'tx_bytes')
+
+    __re_meminfo_total = re.compile(r'^\s*TOTAL\s+(\d+)')
+
+    def __init__(self, pkg_name, ring_file_path, interval=1, serial='', capacity=12*60*60, pss_every_ticks=10):
+        '''
+        pss_every_ticks: if /proc/<pid>/smaps_rollup is not available (before Android 9),
+        pss is read by "dumpsys meminfo" every n ticks as it is slow.
+        '''
+        self.__logger = LogManager.get_logger()
+        self.__adbutils = AdbUtils(serial)
+        self.__pkg_name = pkg_name
+        self.__ring_file_path = ring_file_path
+        self.__interval = interval
+        self.__capacity = capacity
+        self.__pss_every_ticks = pss_every_ticks
+
+        self.__ring_file = None
+        self.__total_written = 0
+        self.__stop_event = threading.Event()
+        self.__sampler_thread = None
+
+        self.__has_smaps_rollup = None
+        self.__last_pss = -1
+        self.__last_cpu = None  # (total jiffies, idle jiffies)
+        self.__last_proc_cpu = None  # (pid, utime + stime, total jiffies)
+
+    # --------------------------------------------------------------
+    # Start and stop
+    # --------------------------------------------------------------
+    def start(self):
+        SysUtils.create_dir(os.path.dirname(self.__ring_file_path))
+        self.__ring_file = open(self.__ring_file_path, 'w+b')
+        self.__total_written = 0
+        self.__write_header()
+
+        self.__adbutils.use_shell_session(timeout=max(self.__interval * 5, 5))
+        self.__stop_event.clear()
+        self.__sampler_thread = threading.Thread(target=self.__sampler_loop, name='proc_sampler', daemon=True)
+        self.__sampler_thread.start()
+        self.__logger.info('Start proc sampler for %s, interval %ss' % (self.__pkg_name, self.__interval))
+        return self
+
+    def stop(self):
+        if self.__sampler_thread is None:
+            return
+        self.__stop_event.set()
+        self.__sampler_thread.join()
+        self.__sampler_thread = None
+        self.__adbutils.close_shell_session()
+        self.__ring_file.close()
+        self.__logger.info('Stop proc sampler, total samples: %d' % self.__total_written)
+
+    def __sampler_loop(self):
+        tick = 0
+        next_time = time.perf_counter()
+        while not self.__stop_event.is_set():
+            try:
+                record = self.__sample(tick)
+                if record is not None:
+                    self.__write_record(record)
+            except Exception as e:
+                self.__logger.error('Proc sampler failed: ' + str(e))
+            tick += 1
+            # fixed rate, and skip missed ticks if the device is slow
+            next_time += self.__interval
+            now = time.perf_counter()
+            if next_time < now:
+                next_time = now
+            self.__stop_event.wait(next_time - now)
+
+    # --------------------------------------------------------------
+    # Sample in one batched command
+    # --------------------------------------------------------------
+    def __build_sample_cmd(self, tick):
+        cmd_lines = ['echo @cpu; head -n 1 /proc/stat',
+                     'echo @meminfo; grep "^MemAvailable:" /proc/meminfo',
+                     'set -- $(pidof %s); pid=$1' % self.__pkg_name,
+                     'if [ -n "$pid" ]; then',
+                     'echo "@pid $pid"',
+                     'echo @stat; cat /proc/$pid/stat',
+                     'echo @status; grep -E "^(Uid|VmRSS):" /proc/$pid/status',
+                     'echo @pss; grep "^Pss:" /proc/$pid/smaps_rollup 2>/dev/null']
+        if not self.__has_smaps_rollup and tick % self.__pss_every_ticks == 0:
+            cmd_lines.append('echo @dumpsys; dumpsys meminfo $pid | grep TOTAL')
+        cmd_lines.extend(['set -- $(grep "^Uid:" /proc/$pid/status)',
+                          # acct tag 0x0 is the total of uid
+                          'if [ -e /proc/net/xt_qtaguid/stats ]; then',
+                          'echo @net; grep -E "^[0-9]+ [^ ]+ 0x0 $2 " /proc/net/xt_qtaguid/stats',
+                          'fi',
+                          'fi'])
+        return '\n'.join(cmd_lines)
+
+    def __sample(self, tick):
+        ret_code, lines = self.__adbutils.get_shell_session().run(self.__build_sample_cmd(tick))
+        if ret_code == -1:
+            return None
+
+        sections = {}
+        key = ''
+        pid = -1
+        for line in lines:
+            line = line.strip()
+            if line.startswith('@pid '):
+                pid = int(line.split()[1])
+            elif line.startswith('@'):
+                key = line[1:]
+                sections[key] = []
+            elif len(line) > 0 and len(key) > 0:
+                sections[key].append(line)
+
+        sys_cpu = self.__parse_sys_cpu(sections.get('cpu', []))
+        mem_available = self.__parse_kb_value(sections.get('meminfo', []), 'MemAvailable:')
+        if pid == -1:
+            self.__last_proc_cpu = None
+            return (time.time(), -1, -1.0, sys_cpu, -1, -1, mem_available, -1, -1)
+
+        app_cpu = self.__parse_app_cpu(pid, sections.get('stat', []))
+        rss = self.__parse_kb_value(sections.get('status', []), 'VmRSS:')
+        pss = self.__parse_pss(sections)
+        rx_bytes, tx_bytes = self.__parse_traffic(sections.get('net', None))
+        return (time.time(), pid, app_cpu, sys_cpu, rss, pss, mem_available, rx_bytes, tx_bytes)
+
+    def __parse_sys_cpu(self, lines):
+        # cpu  user nice system idle iowait irq softirq steal
+        if len(lines) == 0:
+            return -1.0
+        values = [int(v) for v in lines[0].split()[1:9]]
+        total, idle = sum(values), values[3] + values[4]
+        last = self.__last_cpu
+        self.__last_cpu = (total, idle)
+        if last is None or total <= last[0]:
+            return -1.0
+        return 100.0 * (1 - (idle - last[1]) / (total - last[0]))
+
+    def __parse_app_cpu(self, pid, lines):
+        if len(lines) == 0 or self.__last_cpu is None:
+            return -1.0
+        # process name may include spaces, and utime, stime are 14th, 15th fields
+        fields = lines[0][lines[0].rfind(')') + 2:].split()
+        proc_time = int(fields[11]) + int(fields[12])
+        last = self.__last_proc_cpu
+        self.__last_proc_cpu = (pid, proc_time, self.__last_cpu[0])
+        if last is None or last[0] != pid or self.__last_cpu[0] <= last[2]:
+            return -1.0
+        return 100.0 * (proc_time - last[1]) / (self.__last_cpu[0] - last[2])
+
+    def __parse_kb_value(self, lines, key):
+        for line in lines:
+            if line.startswith(key):
+                return int(line.split()[1])
+        return -1
+
+    def __parse_pss(self, sections):
+        pss = self.__parse_kb_value(sections.get('pss', []), 'Pss:')
+        if self.__has_smaps_rollup is None:
+            self.__has_smaps_rollup = pss != -1
+        if pss != -1:
+            return pss
+
+        for line in sections.get('dumpsys', []):
+            matched = self.__re_meminfo_total.match(line)
+            if matched is not None:
+                self.__last_pss = int(matched.group(1))
+                break
+        return self.__last_pss
+
+    def __parse_traffic(self, lines):
+        # idx iface acct_tag_hex uid_tag_int cnt_set rx_bytes rx_packets tx_bytes tx_packets ...
+        if lines is None:
+            return -1, -1  # xt_qtaguid is removed since Android 10
+        rx_bytes, tx_bytes = 0, 0
+        for line in lines:
+            fields = line.split()
+            rx_bytes += int(fields[5])
+            tx_bytes += int(fields[7])
+        return rx_bytes, tx_bytes
+
+    # --------------------------------------------------------------
+    # Ring file
+    # --------------------------------------------------------------
+    def __write_header(self):
+        self.__ring_file.seek(0)
+        self.__ring_file.write(struct.pack(self.HEADER_FORMAT, self.MAGIC, self.VERSION,
+                                           self.RECORD_SIZE, self.__capacity, self.__total_written))
+
+    def __write_record(self, record):
+        idx = self.__total_written % self.__capacity
+        self.__ring_file.seek(self.HEADER_SIZE + idx * self.RECORD_SIZE)
+        self.__ring_file.write(struct.pack(self.RECORD_FORMAT, *record))
+        self.__total_written += 1
+        self.__write_header()
+        self.__ring_file.flush()
+
+    @classmethod
+    def read_ring_file(cls, file_path):
+        '''
+        Returns records in time order, and old records are overwritten when ring is full.
+        '''
+        with open(file_path, 'rb') as f:
+            magic, _, record_size, capacity, total_written = struct.unpack(cls.HEADER_FORMAT, f.read(cls.HEADER_SIZE))
+            if magic != cls.MAGIC or record_size != cls.RECORD_SIZE:
+                raise Exception('Invalid proc sampler ring file: ' + file_path)
+            data = f.read(min(total_written, capacity) * record_size)
+
+        records = list(struct.iter_unpack(cls.RECORD_FORMAT, data))
+        if total_written > capacity:
+            start = total_written % capacity
+            records = records[start:] + records[:start]
+        return records
+
+    @classmethod
+    def export_profile_files(cls, ring_file_path, pkg_name, save_dir_path):
+        '''
+        Export samples as iTest text files (like cpu_com_jd_b2b.txt), and charts are built by ChartParser.
+        '''
+        records = cls.read_ring_file(ring_file_path)
+        SysUtils.create_dir(save_dir_path)
+        app_name = pkg_name.replace('.', '_')
+        outputs = {'cpu_%s.txt' % app_name: [], 'cpuSystem.txt': [], 'pss_%s.txt' % app_name: [],
+                   'pssSystemLeft.txt': [], 'upflow_%s.txt' % app_name: [], 'downflow_%s.txt' % app_name: []}
+
+        first_rx_tx = None
+        for record in records:
+            ts = time.strftime('%Y-%m-%d-%H-%M-%S', time.localtime(record[0]))
+            _, _, app_cpu, sys_cpu, _, pss, mem_available, rx_bytes, tx_bytes = record
+            outputs['cpu_%s.txt' % app_name].append('%s\t%.2f\n' % (ts, app_cpu))
+            outputs['cpuSystem.txt'].append('%s\t%.2f\n' % (ts, sys_cpu))
+            outputs['pss_%s.txt' % app_name].append('%s\t%.2f\n' % (ts, pss / 1024 if pss != -1 else -1))
+            outputs['pssSystemLeft.txt'].append('%s\t%.2f\n' % (ts, mem_available / 1024 if mem_available != -1 else -1))
+            if rx_bytes != -1 and first_rx_tx is None:
+                first_rx_tx = (rx_bytes, tx_bytes)
+            # traffic in KB since sampler started
+            up_kb = (tx_bytes - first_rx_tx[1]) / 1024 if rx_bytes != -1 else -1
+            down_kb = (rx_bytes - first_rx_tx[0]) / 1024 if rx_bytes != -1 else -1
+            outputs['upflow_%s.txt' % app_name].append('%s\t%.2f\n' % (ts, up_kb))
+            outputs['downflow_%s.txt' % app_name].append('%s\t%.2f\n' % (ts, down_kb))
+
+        sysutils = SysUtils()
+        for file_name, lines in outputs.items():
+            sysutils.write_lines_to_file(os.path.join(save_dir_path, file_name), lines)
+
+
+if __name__ == '__main__':
+
+    LogManager.build_logger(Constants.LOG_FILE_PATH)
+
+    save_dir_path = os.path.join(os.getenv('HOME'), 'Downloads/tmp_files')
+    ring_file_path = os.path.join(save_dir_path, 'proc_samples.bin')
+    sampler = ProcSampler(Constants.PKG_NAME_ZGB, ring_file_path).start()
+    time.sleep(30)
+    sampler.stop()
+    for r in ProcSampler.read_ring_file(ring_file_path)[:5]:
+        print(dict(zip(ProcSampler.RECORD_FIELDS, r)))
+    ProcSampler.export_profile_files(ring_file_path, Constants.PKG_NAME_ZGB, os.path.join(save_dir_path, 'handTest'))
+
+    LogManager.clear_log_handles()
+    print('proc sampler test DONE.')
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2018-12-18
+
+@author: zhengjin
+'''
+
+import json
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants, LogManager, SysUtils
+
+
+class ProfileDashboard(object):
+    '''
+    Build one html dashboard for profile data (iTest text files in handTest dir).
+    Series are pre-aggregated into multi-resolution tiles (raw, 10s and 1min min/avg/max), and the page
+    only parses tiles of the resolution and time range in current zoom.
+    Only 10s and 1min tiles are embedded in html, raw tiles are js files in tiles dir and loaded when zoom in.
+    '''
+
+    LEVEL_RAW = 0
+    LEVELS_SECS = (LEVEL_RAW, 10, 60)
+    TILE_POINTS = 2000
+
+    # chart title, y label, (series name, file name)
+    __charts = (('CPU', 'CPU usage (%)', (('app', 'cpu_com_jd_b2b.txt'), ('system', 'cpuSystem.txt'))),
+                ('Memory', 'Pss (MB)', (('app pss', 'pss_com_jd_b2b.txt'), ('system left', 'pssSystemLeft.txt'))),
+                ('Upflow', 'Upflow (KB)', (('app', 'upflow_com_jd_b2b.txt'),)),
+                ('Downflow', 'Downflow (KB)', (('app', 'downflow_com_jd_b2b.txt'),)))
+
+    def __init__(self, report_root_path):
+        self.__logger = LogManager.get_logger()
+        self.__report_root_path = report_root_path
+        self.__handtest_dir_path = os.path.join(report_root_path, 'handTest')
+        self.__dashboard_path = os.path.join(report_root_path, 'profile_dashboard.html')
+        self.__tiles_dir_name = 'profile_dashboard_tiles'
+        self.__sysutils = SysUtils()
+
+    # --------------------------------------------------------------
+    # Load and aggregate
+    # --------------------------------------------------------------
+    def __load_series(self, file_name):
+        '''
+        Returns (epoch secs, values), time is local time as recorded in file.
+        '''
+        file_path = os.path.join(self.__handtest_dir_path, file_name)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            self.__logger.warning('File is NOT exist or empty: ' + file_path)
+            return None, None
+
+        # line: "2018-11-26-12-19-50\t42.56"
+        times = np.loadtxt(file_path, usecols=0, dtype='U19', ndmin=1, encoding='utf-8')
+        values = np.loadtxt(file_path, usecols=1, dtype=np.float64, ndmin=1, encoding='utf-8')
+        iso_times = [t[:10] + 'T' + t[11:].replace('-', ':') for t in times]
+        secs = np.array(iso_times, dtype='datetime64[s]').astype(np.int64)
+
+        order = np.argsort(secs, kind='stable')
+        return secs[order], np.clip(values[order], 0, None)
+
+    @classmethod
+    def aggregate(cls, secs, values, bucket_secs):
+        '''
+        Returns (bucket start secs, min, avg, max) of each non-empty bucket, secs should be sorted.
+        '''
+        buckets = secs // bucket_secs
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        counts = np.diff(np.r_[starts, len(values)])
+        return (buckets[starts] * bucket_secs, np.minimum.reduceat(values, starts),
+                np.add.reduceat(values, starts) / counts, np.maximum.reduceat(values, starts))
+
+    def __build_tiles(self, secs, values):
+        '''
+        Returns tiles meta and tiles data. Tile data of raw level is [secs, values], and others are [secs, min, avg, max].
+        '''
+        metas, tiles = [], []
+        for level_secs in self.LEVELS_SECS:
+            if level_secs == self.LEVEL_RAW:
+                columns = (secs, values)
+            else:
+                columns = self.aggregate(secs, values, level_secs)
+            for start in range(0, len(columns[0]), self.TILE_POINTS):
+                end = min(start + self.TILE_POINTS, len(columns[0]))
+                metas.append({'level': level_secs, 'start': int(columns[0][start]),
+                              'end': int(columns[0][end - 1]), 'tile': len(tiles)})
+                tiles.append([columns[0][start:end].tolist()] +
+                             [np.round(c[start:end], 2).tolist() for c in columns[1:]])
+        return metas, tiles
+
+    # --------------------------------------------------------------
+    # Build html
+    # --------------------------------------------------------------
+    def create_dashboard(self, title='APP Profile Dashboard'):
+        charts, tiles = [], []
+        for chart_title, y_label, series_list in self.__charts:
+            chart = {'title': chart_title, 'yLabel': y_label, 'series': []}
+            for series_name, file_name in series_list:
+                secs, values = self.__load_series(file_name)
+                if secs is None:
+                    continue
+                metas, series_tiles = self.__build_tiles(secs, values)
+                for meta in metas:
+                    meta['tile'] += len(tiles)
+                tiles.extend(series_tiles)
+                chart['series'].append({'name': series_name, 'tiles': metas,
+                                        'avg': round(float(np.average(values)), 2), 'max': round(float(np.max(values)), 2)})
+            if len(chart['series']) > 0:
+                charts.append(chart)
+
+        if len(charts) == 0:
+            self.__logger.error('No profile data for dashboard: ' + self.__handtest_dir_path)
+            return False
+
+        tile_blocks = self.__write_tiles(charts, tiles)
+        html = self.__html_template % {'title': title, 'charts': json.dumps(charts, separators=(',', ':')),
+                                       'tiles': '\n'.join(tile_blocks)}
+        self.__sysutils.write_content_to_file(self.__dashboard_path, html)
+        self.__logger.info('Create profile dashboard: %s (%d tiles)' % (self.__dashboard_path, len(tiles)))
+        return True
+
+    def __write_tiles(self, charts, tiles):
+        '''
+        Writes raw tiles as js files (script src also works for file:// page, fetch not), and returns
+        html json blocks of aggregated tiles. Each json block is parsed only when it is in view.
+        '''
+        tiles_dir_path = os.path.join(self.__report_root_path, self.__tiles_dir_name)
+        self.__sysutils.delete_files_in_dir(tiles_dir_path)
+
+        raw_tile_ids = set()
+        for chart in charts:
+            for series in chart['series']:
+                for meta in series['tiles']:
+                    if meta['level'] == self.LEVEL_RAW:
+                        meta['src'] = '%s/tile-%d.js' % (self.__tiles_dir_name, meta['tile'])
+                        raw_tile_ids.add(meta['tile'])
+        if len(raw_tile_ids) > 0:
+            self.__sysutils.create_dir(tiles_dir_path)
+
+        tile_blocks = []
+        for i, tile in enumerate(tiles):
+            tile_json = json.dumps(tile, separators=(',', ':'))
+            if i in raw_tile_ids:
+                self.__sysutils.write_content_to_file(
+                    os.path.join(tiles_dir_path, 'tile-%d.js' % i), 'loadTile(%d, %s);\n' % (i, tile_json))
+            else:
+                tile_blocks.append('<script type="application/json" id="tile-%d">%s</script>' % (i, tile_json))
+        return tile_blocks
+
+    __html_template = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+.chart { margin-bottom: 24px; }
+canvas { border: 1px solid #ccc; cursor: crosshair; }
+.desc { font-size: 12px; color: #555; }
+</style>
+</head>
+<body>
+<h2>%(title)s</h2>
+<div class="desc">Wheel to zoom, drag to pan, double click to reset. Resolution: <span id="level"></span></div>
+<div id="charts"></div>
+%(tiles)s
+<script>
+var charts = %(charts)s;
+var colors = ['red', 'blue', 'green', 'orange'];
+var tileCache = {};
+var W = 1000, H = 260, PAD = 50;
+
+function loadTile(id, data) {
+  tileCache[id] = data;
+  drawAll();
+}
+
+function getTile(meta) {
+  if (!(meta.tile in tileCache)) {
+    if (!meta.src) {
+      tileCache[meta.tile] = JSON.parse(document.getElementById('tile-' + meta.tile).textContent);
+    } else {
+      // raw tile in side js file, drawn when loaded
+      tileCache[meta.tile] = null;
+      var script = document.createElement('script');
+      script.src = meta.src;
+      document.body.appendChild(script);
+    }
+  }
+  return tileCache[meta.tile];
+}
+
+var fullRange = [Infinity, -Infinity];
+charts.forEach(function (c) { c.series.forEach(function (s) { s.tiles.forEach(function (t) {
+  fullRange[0] = Math.min(fullRange[0], t.start); fullRange[1] = Math.max(fullRange[1], t.end); }); }); });
+if (fullRange[1] <= fullRange[0]) { fullRange[1] = fullRange[0] + 1; }
+var view = fullRange.slice();
+
+function chooseLevel(series) {
+  // finest level with at most 2 points per pixel in current view
+  var levels = [];
+  series.tiles.forEach(function (t) { if (levels.indexOf(t.level) < 0) { levels.push(t.level); } });
+  levels.sort(function (a, b) { return a - b; });
+  for (var i = 0; i < levels.length; i++) {
+    var step = levels[i] === 0 ? 1 : levels[i];
+    if ((view[1] - view[0]) / step <= 2 * (W - 2 * PAD)) { return levels[i]; }
+  }
+  return levels[levels.length - 1];
+}
+
+function visiblePoints(series, level) {
+  var points = [];
+  series.tiles.forEach(function (t) {
+    if (t.level !== level || t.end < view[0] || t.start > view[1]) { return; }
+    var data = getTile(t);
+    if (data === null) { return; }
+    for (var i = 0; i < data[0].length; i++) {
+      points.push(data.map(function (col) { return col[i]; }));
+    }
+  });
+  return points;
+}
+
+function fmtTime(secs) {
+  return new Date(secs * 1000).toISOString().substr(5, 14).replace('T', ' ');
+}
+
+function draw(chart) {
+  var ctx = chart.canvas.getContext('2d');
+  ctx.clearRect(0, 0, W, H);
+  var layers = [], yMax = 0, levelNames = [];
+  chart.series.forEach(function (s) {
+    var level = chooseLevel(s);
+    var points = visiblePoints(s, level);
+    points.forEach(function (p) { yMax = Math.max(yMax, p[p.length - 1]); });
+    layers.push({level: level, points: points});
+    levelNames.push(level === 0 ? 'raw' : level + 's');
+  });
+  document.getElementById('level').textContent = levelNames.join(', ');
+  yMax = yMax > 0 ? yMax * 1.1 : 1;
+  function x(t) { return PAD + (t - view[0]) / (view[1] - view[0]) * (W - 2 * PAD); }
+  function y(v) { return H - PAD + 20 - v / yMax * (H - PAD); }
+
+  ctx.strokeStyle = '#ddd'; ctx.fillStyle = '#333'; ctx.font = '11px sans-serif';
+  for (var i = 0; i <= 4; i++) {
+    var v = yMax * i / 4;
+    ctx.beginPath(); ctx.moveTo(PAD, y(v)); ctx.lineTo(W - PAD, y(v)); ctx.stroke();
+    ctx.fillText(v.toFixed(1), 4, y(v) + 4);
+    var t = view[0] + (view[1] - view[0]) * i / 4;
+    ctx.fillText(fmtTime(t), Math.min(x(t), W - PAD - 60), H - 8);
+  }
+
+  layers.forEach(function (layer, idx) {
+    var color = colors[idx %% colors.length];
+    if (layer.level !== 0) {
+      // min/max band
+      ctx.globalAlpha = 0.2; ctx.fillStyle = color; ctx.beginPath();
+      layer.points.forEach(function (p, i) { i === 0 ? ctx.moveTo(x(p[0]), y(p[3])) : ctx.lineTo(x(p[0]), y(p[3])); });
+      for (var i = layer.points.length - 1; i >= 0; i--) { ctx.lineTo(x(layer.points[i][0]), y(layer.points[i][1])); }
+      ctx.fill(); ctx.globalAlpha = 1;
+    }
+    ctx.strokeStyle = color; ctx.beginPath();
+    layer.points.forEach(function (p, i) {
+      var v = layer.level === 0 ? p[1] : p[2];
+      i === 0 ? ctx.moveTo(x(p[0]), y(v)) : ctx.lineTo(x(p[0]), y(v));
+    });
+    ctx.stroke();
+  });
+}
+
+function drawAll() { charts.forEach(draw); }
+
+var container = document.getElementById('charts');
+charts.forEach(function (chart) {
+  var div = document.createElement('div');
+  div.className = 'chart';
+  var desc = chart.series.map(function (s, i) {
+    return '<span style="color:' + colors[i %% colors.length] + '">' + s.name + '</span> (average: ' + s.avg + ', max: ' + s.max + ')';
+  }).join(', ');
+  div.innerHTML = '<h3>' + chart.title + ' - ' + chart.yLabel + '</h3><div class="desc">' + desc + '</div>';
+  var canvas = document.createElement('canvas');
+  canvas.width = W; canvas.height = H;
+  div.appendChild(canvas);
+  container.appendChild(div);
+  chart.canvas = canvas;
+
+  canvas.addEventListener('wheel', function (e) {
+    e.preventDefault();
+    var rect = canvas.getBoundingClientRect();
+    var center = view[0] + (e.clientX - rect.left - PAD) / (W - 2 * PAD) * (view[1] - view[0]);
+    var scale = e.deltaY < 0 ? 0.8 : 1.25;
+    var span = Math.max(10, Math.min(fullRange[1] - fullRange[0], (view[1] - view[0]) * scale));
+    view = [center - (center - view[0]) * span / (view[1] - view[0]), 0];
+    view[0] = Math.max(fullRange[0], Math.min(view[0], fullRange[1] - span));
+    view[1] = view[0] + span;
+    drawAll();
+  });
+  var dragX = null;
+  canvas.addEventListener('mousedown', function (e) { dragX = e.clientX; });
+  window.addEventListener('mouseup', function () { dragX = null; });
+  canvas.addEventListener('mousemove', function (e) {
+    if (dragX === null) { return; }
+    var shift = (dragX - e.clientX) / (W - 2 * PAD) * (view[1] - view[0]);
+    shift = Math.max(fullRange[0] - view[0], Math.min(shift, fullRange[1] - view[1]));
+    view = [view[0] + shift, view[1] + shift];
+    dragX = e.clientX;
+    drawAll();
+  });
+  canvas.addEventListener('dblclick', function () { view = fullRange.slice(); drawAll(); });
+});
+drawAll();
+</script>
+</body>
+</html>
+'''
+
+
+if __name__ == '__main__':
+
+    LogManager.build_logger(Constants.LOG_FILE_PATH)
+
+    root_path = os.path.join(os.getenv('PYPATH'), 'monkeytest/reports/examples')
+    ProfileDashboard(root_path).create_dashboard()
+
+    LogManager.clear_log_handles()
+    print('profile dashboard test DONE.')
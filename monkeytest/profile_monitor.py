@@ -25,14 +25,15 @@ class ProfileMonitor(object):
     __hand_log_dir = 'handTest'
     __hand_log_dir_path = __log_root_dir_path + '/' + __hand_log_dir
 
-    def __init__(self, itest_collect_interval):
+    def __init__(self, itest_collect_interval, serial=''):
         '''
         Constructor
         '''
         self.__is_stopped = True
         self.__logger = LogManager.get_logger()
         self.__sys_utils = SysUtils()
-        self.__adb_utils = AdbUtils()
+        self.__adb_utils = AdbUtils(serial)
+        self.__adb = self.__adb_utils.get_adb_cmd()
         # note: this value should be greater than interval config in iTest
         self.__wait_time_between_check = itest_collect_interval + 1
 
@@ -50,13 +51,13 @@ class ProfileMonitor(object):
         self.__is_stopped = False
 
     def __clear_itest_logs(self):
-        cmd = 'adb shell "cd %s;rm -rf %s*"' \
-            % (self.__log_root_dir_path, self.__hand_log_dir)
+        cmd = '%s shell "cd %s;rm -rf %s*"' \
+            % (self.__adb, self.__log_root_dir_path, self.__hand_log_dir)
         if not self.__sys_utils.run_sys_cmd(cmd):
             raise Exception('clear iTest log files failed!')
 
     def __launch_itest(self):
-        cmd = 'adb shell am start ' + self.__itest_pkg_name + '/' + self.__itest_boot_act
+        cmd = self.__adb + ' shell am start ' + self.__itest_pkg_name + '/' + self.__itest_boot_act
         self.__sys_utils.run_sys_cmd(cmd)
 
         for i in range(0, 3):
@@ -66,18 +67,26 @@ class ProfileMonitor(object):
         raise Exception('launch iTest app failed!')
 
     def __is_itest_logfile_created(self):
-        cmd = 'adb shell "cd %s;ls|grep %s"' \
-            % (self.__log_root_dir_path, self.__hand_log_dir)
+        cmd = '%s shell "cd %s;ls|grep %s"' \
+            % (self.__adb, self.__log_root_dir_path, self.__hand_log_dir)
         return len(self.__sys_utils.run_sys_cmd_and_ret_content(cmd)) != 0
 
     def __click_itest_monitor_btn(self):
-        cmd = 'adb shell input tap 800 1880'
+        cmd = self.__adb + ' shell input tap 800 1880'
         return self.__sys_utils.run_sys_cmd(cmd)
 
     # --------------------------------------------------------------
     # Running Monitor
     # --------------------------------------------------------------
     def running_monitor(self, run_mins, is_end_with_stop=True, interval=15):
+        # itest process and log file are checked in every loop, and reuse one adb shell
+        self.__adb_utils.use_shell_session()
+        try:
+            self.__running_monitor_loop(run_mins, is_end_with_stop, interval)
+        finally:
+            self.__adb_utils.close_shell_session()
+
+    def __running_monitor_loop(self, run_mins, is_end_with_stop, interval):
         run_secs = run_mins * 60
         start = time.perf_counter()
         while 1:
@@ -92,8 +101,8 @@ class ProfileMonitor(object):
                 return
 
     def __is_itest_process_running(self):
-        cmd = 'adb shell "ps | grep %s"' % self.__itest_pkg_name
-        if len(self.__sys_utils.run_sys_cmd_and_ret_content(cmd)) == 0:
+        cmd = 'ps | grep ' + self.__itest_pkg_name
+        if len(self.__adb_utils.run_shell_cmd_and_ret_content(cmd)) == 0:
             return False
         return True
 
@@ -107,9 +116,8 @@ class ProfileMonitor(object):
 
     def __get_cpu_logfile_record_time(self):
         file_name = 'cpuSystem.txt'
-        cmd = 'adb shell "cd %s;tail -n 1 %s"' \
-            % (self.__hand_log_dir_path, file_name)
-        last_line = self.__sys_utils.run_sys_cmd_and_ret_content(cmd)
+        cmd = 'cd %s;tail -n 1 %s' % (self.__hand_log_dir_path, file_name)
+        last_line = self.__adb_utils.run_shell_cmd_and_ret_content(cmd)
         return last_line.split()[0]  # record time
 
     def __is_itest_running(self):
@@ -132,7 +140,7 @@ class ProfileMonitor(object):
         self.__is_stopped = True
 
     def __force_stop_itest(self):
-        cmd = 'adb shell am force-stop ' + self.__itest_pkg_name
+        cmd = self.__adb + ' shell am force-stop ' + self.__itest_pkg_name
         self.__sys_utils.run_sys_cmd(cmd)
 
     def __clear_local_itest_logs(self, dir_path):
@@ -144,7 +152,7 @@ class ProfileMonitor(object):
             return
 
         self.__clear_local_itest_logs(os.path.join(local_save_path, self.__hand_log_dir))
-        cmd = 'adb pull %s %s' % (self.__hand_log_dir_path, local_save_path)
+        cmd = '%s pull %s %s' % (self.__adb, self.__hand_log_dir_path, local_save_path)
         if not self.__sys_utils.run_sys_cmd(cmd):
             self.__logger.error('dump iTest logs failed!')
 
@@ -4,40 +4,170 @@ Created on 2019-01-30
 @author: zhengjin
 '''
 
-import random
+import glob
+import multiprocessing
 import os
+import time
+import numpy as np
 
+# column index => (type, args), and values are generated for each duplicate row
+# int: (low, high) both inclusive, float: (low, high, decimals), choice: (values,)
+DEFAULT_MUTATION_SCHEMA = {0: ('int', 0, 100), 12: ('int', 0, 1000)}
+DEFAULT_CHUNK_LINES = 10000
+# max output lines generated in memory before write
+MAX_BLOCK_LINES = 200000
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
 
-def generate_data_from_csv(count):
+
+# --------------------------------------------------------------
+# Read input
+# --------------------------------------------------------------
+def read_csv_header(file_path):
+    with open(file_path, mode='r', encoding='utf-8') as f:
+        return f.readline()
+
+
+def read_csv_chunks(file_path, chunk_lines=DEFAULT_CHUNK_LINES):
+    '''
+    Yield lists of data lines (header excluded), and the file is never loaded at once.
+    '''
+    with open(file_path, mode='r', encoding='utf-8') as f:
+        f.readline()
+        chunk = []
+        for line in f:
+            line = line.rstrip('\r\n')
+            if len(line) == 0:
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            yield chunk
+
+
+# --------------------------------------------------------------
+# Generate data
+# --------------------------------------------------------------
+def build_column_values(rng, spec, size):
+    '''
+    Returns numpy array of str values for one mutated column.
+    '''
+    kind = spec[0]
+    if kind == 'int':
+        values = rng.integers(spec[1], spec[2] + 1, size=size)
+    elif kind == 'float':
+        values = np.round(rng.uniform(spec[1], spec[2], size=size), spec[3])
+    elif kind == 'choice':
+        values = rng.choice(np.asarray(spec[1]), size=size)
+    else:
+        raise ValueError('invalid mutation type: ' + kind)
+    return values.astype(str)
+
+
+def generate_chunk(lines, count, schema, rng, is_with_source=True):
+    '''
+    For each input line, returns the line and its count duplicates with mutated columns, joined as text block.
+    '''
+    columns = sorted(schema.keys())
+    # each line is split once into static segments around mutated columns, like "a,b," + v1 + ",c," + v2 + ",d"
+    segments = []
+    for line in lines:
+        fields = line.split(',')
+        if columns[-1] >= len(fields):
+            raise ValueError('mutated column index %d out of range (%d fields): %s' % (columns[-1], len(fields), line))
+        line_segments, prev = [], -1
+        for col in columns:
+            segment = ''.join([field + ',' for field in fields[prev + 1:col]])
+            line_segments.append(segment if prev == -1 else ',' + segment)
+            prev = col
+        line_segments.append(''.join([',' + field for field in fields[prev + 1:]]))
+        segments.append(line_segments)
+
+    size = len(lines) * count
+    mutated = [build_column_values(rng, schema[col], size).tolist() for col in columns]
+
+    output_lines = []
+    for i, line in enumerate(lines):
+        if is_with_source:
+            output_lines.append(line)
+        line_segments = segments[i]
+        for j in range(i * count, (i + 1) * count):
+            parts = [line_segments[0]]
+            for k in range(len(columns)):
+                parts.append(mutated[k][j])
+                parts.append(line_segments[k + 1])
+            output_lines.append(''.join(parts))
+    output_lines.append('')
+    return '\n'.join(output_lines)
+
+
+def iter_output_blocks(lines, count, schema, rng, is_with_source=True):
+    '''
+    Yield text blocks of at most about MAX_BLOCK_LINES lines, and memory is bounded for large count.
+    '''
+    if count + 1 <= MAX_BLOCK_LINES:
+        step = MAX_BLOCK_LINES // (count + 1)
+        for start in range(0, len(lines), step):
+            yield generate_chunk(lines[start:start + step], count, schema, rng, is_with_source)
+        return
+
+    for line in lines:
+        for done in range(0, count, MAX_BLOCK_LINES):
+            yield generate_chunk([line], min(MAX_BLOCK_LINES, count - done), schema, rng,
+                                 is_with_source=(is_with_source and done == 0))
+
+
+def generate_data_to_file(input_file_path, output_file_path, count, schema=None,
+                          chunk_lines=DEFAULT_CHUNK_LINES, seed=None, is_with_source=True):
+    '''
+    Each input line is generated with count duplicates into output file, and source lines are skipped if not is_with_source.
+    Returns number of output lines (header excluded).
+    '''
+    schema = schema if schema is not None else DEFAULT_MUTATION_SCHEMA
+    rng = np.random.default_rng(seed)
+    total = 0
+    with open(output_file_path, mode='w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(read_csv_header(input_file_path))  # first line as schema
+        for lines in read_csv_chunks(input_file_path, chunk_lines):
+            for block in iter_output_blocks(lines, count, schema, rng, is_with_source):
+                f.write(block)
+            total += len(lines) * (count + 1 if is_with_source else count)
+    return total
+
+
+def generate_data_from_csv(count, schema=None, processes=1, chunk_lines=DEFAULT_CHUNK_LINES, seed=None):
+    '''
+    If processes > 1, each process writes one shard file "test_data_out.part-<n>.csv".
+    Duplicates count is split evenly across processes, and source lines are only written in first shard.
+    '''
     root_dir = os.path.join(os.getenv('HOME'), 'Downloads/tmp_files/prophet_testdata')
     input_file_path = os.path.join(root_dir, 'test_data.csv')
     if not os.path.exists(input_file_path):
         print('input file NOT exist:', input_file_path)
         exit(1)
 
-    # read src data
-    input_lines = []
-    with open(input_file_path, mode='r', encoding='utf-8') as f:
-        input_lines = f.readlines()
-    print('total input lines:', len(input_lines))
-
-    # generate data
-    output_file_path = os.path.join(root_dir, 'test_data_out.csv')
-    with open(output_file_path, mode='w', encoding='utf-8') as f:
-        f.writelines([input_lines[0]])  # first line as schema
-
-        for line in input_lines[1:]:
-            output_lines = [line]
-            for i in range(0, count):
-                fields = line.split(',')
-                fields[0] = str(random.randint(0, 100))
-                fields[12] = str(random.randint(0, 1000))
-                output_lines.append(','.join(fields))
-            f.writelines(output_lines)
+    start = time.perf_counter()
+    processes = max(1, min(processes, count))
+    if processes == 1:
+        output_file_path = os.path.join(root_dir, 'test_data_out.csv')
+        total = generate_data_to_file(input_file_path, output_file_path, count, schema, chunk_lines, seed)
+    else:
+        # remove shard files of previous run, which may have more processes
+        for file_path in glob.glob(os.path.join(root_dir, 'test_data_out.part-*.csv')):
+            os.remove(file_path)
+        # independent random streams for shards, and reproducible by seed
+        seeds = np.random.SeedSequence(seed).spawn(processes)
+        counts = [count // processes + (1 if i < count % processes else 0) for i in range(processes)]
+        args = [(input_file_path, os.path.join(root_dir, 'test_data_out.part-%05d.csv' % i),
+                 counts[i], schema, chunk_lines, seeds[i], i == 0) for i in range(processes)]
+        with multiprocessing.Pool(processes=processes) as pool:
+            total = sum(pool.starmap(generate_data_to_file, args))
 
-    print('generate csv data done.')
+    print('generate csv data done, total output lines: %d, time: %.2f secs' % (total, time.perf_counter() - start))
 
 
 if __name__ == '__main__':
 
     generate_data_from_csv(10)
+#     generate_data_from_csv(1000, schema={0: ('int', 0, 100), 12: ('float', 0, 1000, 2)}, processes=4)
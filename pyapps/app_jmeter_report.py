@@ -1,9 +1,420 @@
 # -*- coding: utf-8 -*-
 
-import codecs
+import csv
+import getopt
+import glob
+import heapq
+import itertools
+import json
+import math
+import multiprocessing
 import os
 import sys
 
+BACKEND_PYTHON = 'python'
+BACKEND_NUMPY = 'numpy'
+
+
+class LatencyHistogram(object):
+    '''
+    Mergeable latency histogram (HDR-style log-linear buckets).
+    Values less than 2048 (ms) are recorded exactly, and larger values with relative error < 0.1%.
+    '''
+
+    SUB_BUCKET_BITS = 10
+    EXACT_LIMIT = 1 << (SUB_BUCKET_BITS + 1)
+
+    def __init__(self):
+        self.counts = {}  # bucket index => count
+        self.total = 0
+
+    def record(self, value, count=1):
+        idx = self._index_of(value)
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        self.total += count
+
+    def record_batch(self, values):
+        '''
+        Record numpy array of values, bucket indexes are computed by vectorized operations.
+        '''
+        import numpy as np
+
+        values = np.maximum(values.astype(np.int64), 0)
+        bit_lengths = np.frexp(values.astype(np.float64))[1].astype(np.int64)
+        shifts = np.maximum(bit_lengths - (self.SUB_BUCKET_BITS + 1), 0)
+        indexes = np.where(values < self.EXACT_LIMIT, values,
+                           (shifts << self.SUB_BUCKET_BITS) + (values >> shifts))
+        uniq_indexes, counts = np.unique(indexes, return_counts=True)
+        for idx, count in zip(uniq_indexes.tolist(), counts.tolist()):
+            self.counts[idx] = self.counts.get(idx, 0) + count
+        self.total += len(values)
+
+    def merge(self, other):
+        for idx, count in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + count
+        self.total += other.total
+        return self
+
+    def value_at_rank(self, rank):
+        '''
+        Rank: 1-based position in sorted values.
+        '''
+        rank = min(max(rank, 1), self.total)
+        seen = 0
+        for idx in sorted(self.counts.keys()):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return self._value_of(idx)
+        return 0
+
+    def value_at_percentile(self, percent):
+        return self.value_at_rank(int(round(self.total * percent)))
+
+    def ks_distance(self, other):
+        '''
+        Kolmogorov-Smirnov statistic, max distance between the cumulative distributions of two histograms.
+        '''
+        ret_distance = 0.0
+        seen, other_seen = 0, 0
+        for idx in sorted(set(self.counts.keys()) | set(other.counts.keys())):
+            seen += self.counts.get(idx, 0)
+            other_seen += other.counts.get(idx, 0)
+            ret_distance = max(ret_distance, abs(seen / self.total - other_seen / other.total))
+        return ret_distance
+
+    def to_dict(self):
+        return {'total': self.total, 'counts': [[idx, count] for idx, count in sorted(self.counts.items())]}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.total = data['total']
+        histogram.counts = {idx: count for idx, count in data['counts']}
+        return histogram
+
+    def _index_of(self, value):
+        value = max(int(value), 0)
+        if value < self.EXACT_LIMIT:
+            return value
+        shift = value.bit_length() - (self.SUB_BUCKET_BITS + 1)
+        return (shift << self.SUB_BUCKET_BITS) + (value >> shift)
+
+    def _value_of(self, idx):
+        if idx < self.EXACT_LIMIT:
+            return idx
+        shift = (idx >> self.SUB_BUCKET_BITS) - 1
+        return (idx - (shift << self.SUB_BUCKET_BITS)) << shift
+# end LatencyHistogram class
+
+
+class LabelSummary(object):
+    '''
+    Counters and latency histogram of one label, mergeable across jtl files.
+    '''
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.errors = 0
+        self.sum_elapsed = 0
+        self.min = sys.maxsize
+        self.max = 0
+        self.start_ts = sys.maxsize
+        self.end_ts = 0
+        self.histogram = LatencyHistogram()
+
+    def add(self, timestamp, elapsed, code):
+        self.count += 1
+        if code != '200':
+            self.errors += 1
+        self.sum_elapsed += elapsed
+        self.min = min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+        self.start_ts = min(self.start_ts, timestamp)
+        self.end_ts = max(self.end_ts, timestamp)
+        self.histogram.record(elapsed)
+
+    def add_batch(self, timestamps, elapsed, codes):
+        '''
+        Add samples from numpy arrays (vectorized backend).
+        '''
+        self.count += len(elapsed)
+        self.errors += int((codes != '200').sum())
+        self.sum_elapsed += int(elapsed.sum())
+        self.min = min(self.min, int(elapsed.min()))
+        self.max = max(self.max, int(elapsed.max()))
+        self.start_ts = min(self.start_ts, int(timestamps.min()))
+        self.end_ts = max(self.end_ts, int(timestamps.max()))
+        self.histogram.record_batch(elapsed)
+
+    def throughput(self):
+        duration = float((self.end_ts - self.start_ts) / 1000)
+        return float(self.count / duration) if duration > 0 else 0.0
+
+    def to_dict(self):
+        ret_dict = {k: v for k, v in self.__dict__.items() if k != 'histogram'}
+        ret_dict['histogram'] = self.histogram.to_dict()
+        return ret_dict
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data['label'])
+        summary.__dict__.update({k: v for k, v in data.items() if k != 'histogram'})
+        summary.histogram = LatencyHistogram.from_dict(data['histogram'])
+        return summary
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.sum_elapsed += other.sum_elapsed
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.start_ts = min(self.start_ts, other.start_ts)
+        self.end_ts = max(self.end_ts, other.end_ts)
+        self.histogram.merge(other.histogram)
+        return self
+# end LabelSummary class
+
+
+class JtlAggregator(object):
+    '''
+    Single pass aggregator for jmeter jtl (csv) file, memory is constant for the file size.
+    '''
+
+    JTL_COLUMNS = ('timeStamp', 'elapsed', 'label', 'responseCode')
+
+    def __init__(self):
+        self.summaries = {}  # label => LabelSummary
+
+    def add_file(self, file_path):
+        for timestamp, elapsed, label, code in read_jtl_rows(file_path):
+            self.add(timestamp, elapsed, label, code)
+        return self
+
+    def add(self, timestamp, elapsed, label, code):
+        summary = self.summaries.get(label)
+        if summary is None:
+            summary = LabelSummary(label)
+            self.summaries[label] = summary
+        summary.add(timestamp, elapsed, code)
+
+    def add_file_vectorized(self, file_path, chunk_size=1000000):
+        '''
+        Load jtl columns in chunks into typed numpy arrays by pandas, and aggregate by grouped array operations.
+        '''
+        if not os.path.exists(file_path):
+            raise Exception('File is NOT exist: ' + file_path)
+
+        with open(file_path, mode='r', encoding='utf-8', newline='') as f:
+            first_fields = next(csv.reader(f), None)
+        if first_fields is None:
+            return self
+        has_header, columns = parse_jtl_header(first_fields)
+        try:
+            # fast path, timestamp and elapsed are parsed into int64 by csv reader
+            partial = JtlAggregator()._add_csv_chunks(file_path, has_header, columns, chunk_size, is_typed=True)
+        except ValueError:
+            # timestamp or elapsed is not integer in some rows, and re-read all columns as str to skip them
+            partial = JtlAggregator()._add_csv_chunks(file_path, has_header, columns, chunk_size, is_typed=False)
+        return self.merge(partial)
+
+    def _add_csv_chunks(self, file_path, has_header, columns, chunk_size, is_typed):
+        '''
+        Malformed rows are skipped same as read_jtl_rows(), missing fields of short rows are read as "".
+        '''
+        import numpy as np
+        import pandas as pd
+
+        ts_idx, elapsed_idx, label_idx, code_idx = columns
+        last_idx = max(columns)
+        # columns are read by index, and empty label or code is kept as "" instead of NaN
+        dtypes = {ts_idx: np.int64 if is_typed else str, elapsed_idx: np.int64 if is_typed else str,
+                  label_idx: str, code_idx: str}
+        reader = pd.read_csv(file_path, header=None, skiprows=1 if has_header else 0, usecols=list(dtypes.keys()),
+                             dtype=dtypes, keep_default_na=False, on_bad_lines='skip', chunksize=chunk_size)
+        for chunk in reader:
+            is_valid = chunk[last_idx] != ''
+            if not is_typed:
+                chunk[ts_idx] = pd.to_numeric(chunk[ts_idx], errors='coerce')
+                chunk[elapsed_idx] = pd.to_numeric(chunk[elapsed_idx], errors='coerce')
+                is_valid &= (chunk[ts_idx] % 1 == 0) & (chunk[elapsed_idx] % 1 == 0)  # false for NaN
+            if not is_valid.all():
+                chunk = chunk[is_valid]
+            for label, group in chunk.groupby(label_idx, sort=False):
+                summary = self.summaries.get(label)
+                if summary is None:
+                    summary = LabelSummary(label)
+                    self.summaries[label] = summary
+                summary.add_batch(group[ts_idx].to_numpy(dtype=np.int64), group[elapsed_idx].to_numpy(dtype=np.int64),
+                                  group[code_idx].to_numpy(dtype=str))
+        return self
+
+    def merge(self, other):
+        for label, summary in other.summaries.items():
+            if label in self.summaries:
+                self.summaries[label].merge(summary)
+            else:
+                self.summaries[label] = summary
+        return self
+# end JtlAggregator class
+
+
+class JtlTimeSeries(object):
+    '''
+    Per N-seconds tps, error rate and latency percentiles for each label, in one streaming pass.
+    Buckets behind the latest sample by more than flush_lag_secs are written to csv and released.
+    '''
+
+    HEADER = ('time', 'label', 'samples', 'errors', 'tps', 'error_rate', 'average', 'median', '90%', '99%', 'max')
+
+    def __init__(self, output_path, bucket_secs=1, flush_lag_secs=300):
+        self._output_path = output_path
+        self._bucket_ms = int(bucket_secs * 1000)
+        self._flush_lag_ms = int(flush_lag_secs * 1000)
+        self._buckets = {}  # (bucket start ts, label) => LabelSummary
+        self._flushed_ts = 0
+        self._latest_ts = 0
+        self._late_samples = 0
+        self._writer = None
+        self._file = None
+
+    def add_files(self, file_paths, aggregator=None):
+        '''
+        Rows of multiple jtl files are merged by timestamp, so buckets are still filled in time order.
+        If aggregator is set, it is fed from the same rows, and jtl files are read only once.
+        '''
+        self._open()
+        try:
+            rows = heapq.merge(*[read_jtl_rows(path) for path in file_paths], key=lambda row: row[0])
+            for timestamp, elapsed, label, code in rows:
+                self.add(timestamp, elapsed, label, code)
+                if aggregator is not None:
+                    aggregator.add(timestamp, elapsed, label, code)
+        finally:
+            self._close()
+        if self._late_samples > 0:
+            print('warn: %d samples are later than %d secs, and skipped in time series.'
+                  % (self._late_samples, self._flush_lag_ms / 1000))
+        return self._output_path
+
+    def add(self, timestamp, elapsed, label, code):
+        bucket_ts = timestamp - timestamp % self._bucket_ms
+        if bucket_ts < self._flushed_ts:
+            self._late_samples += 1
+            return
+
+        key = (bucket_ts, label)
+        summary = self._buckets.get(key)
+        if summary is None:
+            summary = LabelSummary(label)
+            self._buckets[key] = summary
+        summary.add(timestamp, elapsed, code)
+
+        if timestamp > self._latest_ts:
+            self._latest_ts = timestamp
+            if self._latest_ts - self._flushed_ts > 2 * self._flush_lag_ms:
+                self._flush(self._latest_ts - self._flush_lag_ms)
+
+    def _open(self):
+        self._file = open(self._output_path, mode='w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+
+    def _close(self):
+        self._flush(sys.maxsize)
+        self._file.close()
+
+    def _flush(self, before_ts):
+        before_ts -= before_ts % self._bucket_ms
+        keys = sorted([key for key in self._buckets.keys() if key[0] < before_ts])
+        bucket_secs = self._bucket_ms / 1000
+        for key in keys:
+            s = self._buckets.pop(key)
+            self._writer.writerow((self._format_time(key[0]), s.label, s.count, s.errors, '%.2f' % (s.count / bucket_secs),
+                                   '%.4f' % (s.errors / s.count), int(s.sum_elapsed / s.count),
+                                   s.histogram.value_at_rank(int(s.count / 2) + 1),
+                                   s.histogram.value_at_percentile(0.9), s.histogram.value_at_percentile(0.99), s.max))
+        self._flushed_ts = max(self._flushed_ts, before_ts)
+
+    def _format_time(self, bucket_ts):
+        # seconds, and with milliseconds for fractional bucket (like 0.5 sec)
+        if self._bucket_ms % 1000 == 0:
+            return int(bucket_ts / 1000)
+        return '%.3f' % (bucket_ts / 1000)
+# end JtlTimeSeries class
+
+
+class JtlBaseline(object):
+    '''
+    Compact summary of a run (per label counters and histograms) saved as json,
+    and compare later runs with it to gate on latency, error rate and throughput regressions.
+    '''
+
+    PERCENTILES = (0.5, 0.9, 0.99)
+    KS_ALPHA_COEF = 1.36  # alpha = 0.05
+    ERROR_RATE_Z = 1.96  # alpha = 0.05
+
+    def __init__(self, threshold_percent=10):
+        self._threshold = threshold_percent / 100.0
+
+    def save(self, aggregator, file_path):
+        data = {'summaries': [summary.to_dict() for summary in aggregator.summaries.values()]}
+        with open(file_path, mode='w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def load(self, file_path):
+        if not os.path.exists(file_path):
+            raise Exception('Baseline file is NOT exist: ' + file_path)
+        with open(file_path, mode='r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {item['label']: LabelSummary.from_dict(item) for item in data['summaries']}
+
+    def compare(self, aggregator, file_path):
+        '''
+        Returns list of regression messages, empty if no regression.
+        Label in baseline but missing in current run (not requested, or renamed) is a regression.
+        '''
+        baselines = self.load(file_path)
+        ret_regressions = []
+        for label, summary in aggregator.summaries.items():
+            base = baselines.get(label)
+            if base is None:
+                print('warn: label [%s] is not in baseline, and skipped.' % label)
+                continue
+            ret_regressions.extend(['[%s] %s' % (label, msg) for msg in self._compare_label(base, summary)])
+        for label, base in baselines.items():
+            if label not in aggregator.summaries:
+                ret_regressions.append('[%s] missing in current run (baseline samples: %d)' % (label, base.count))
+        return ret_regressions
+
+    def _compare_label(self, base, cur):
+        ret_msgs = []
+
+        # latency: percentile increased over threshold, and distributions differ significantly (KS test)
+        n, m = base.count, cur.count
+        ks_critical = self.KS_ALPHA_COEF * math.sqrt((n + m) / (n * m))
+        ks_distance = base.histogram.ks_distance(cur.histogram)
+        for percent in self.PERCENTILES:
+            base_val = base.histogram.value_at_percentile(percent)
+            cur_val = cur.histogram.value_at_percentile(percent)
+            if cur_val > base_val * (1 + self._threshold) and ks_distance > ks_critical:
+                ret_msgs.append('%s%% latency: %d => %d ms (ks: %.4f > %.4f)'
+                                % (percent * 100, base_val, cur_val, ks_distance, ks_critical))
+
+        # error rate: two proportion z-test
+        base_rate, cur_rate = base.errors / n, cur.errors / m
+        pooled_rate = (base.errors + cur.errors) / (n + m)
+        std_err = math.sqrt(pooled_rate * (1 - pooled_rate) * (1 / n + 1 / m))
+        if cur_rate > base_rate and std_err > 0 and (cur_rate - base_rate) / std_err > self.ERROR_RATE_Z:
+            ret_msgs.append('error rate: %.3f%% => %.3f%%' % (base_rate * 100, cur_rate * 100))
+
+        # throughput
+        base_tps, cur_tps = base.throughput(), cur.throughput()
+        if cur_tps < base_tps * (1 - self._threshold):
+            ret_msgs.append('throughput: %.2f => %.2f /sec' % (base_tps, cur_tps))
+        return ret_msgs
+# end JtlBaseline class
+
 
 class JmeterReport(object):
     '''
@@ -22,90 +433,220 @@ class JmeterReport(object):
         print('-' * 170)
 
     def print(self, lines):
-        self._label = ''
-        self._start_ts = 0
-        self._end_ts = 0
-        self._count = 0
-        self._errors = 0
-        self._average = 0
-        self._elapsed_list = []
-
-        self._format_jtl_lines(lines)
-        self._parse_and_print_body()
-
-    def _format_jtl_lines(self, lines):
-        self._label = lines[0].split(',')[2]
-        self._start_ts = int(lines[0].split(',')[0])
-        self._end_ts = int(lines[len(lines) - 1].split(',')[0])
-        self._count = len(lines)
-
-        sum_elapsed = 0
+        summary = None
         for line in lines:
             fields = line.split(',')
-            elapsed = int(fields[1])
-            sum_elapsed += elapsed
-            self._elapsed_list.append(elapsed)
+            if summary is None:
+                summary = LabelSummary(fields[2])
+            summary.add(int(fields[0]), int(fields[1]), fields[3])
+        self.print_summary(summary)
 
-            code = fields[3]
-            if code != '200':
-                self._errors += 1
+    def print_jtl(self, jtl_path, processes=None, backend=BACKEND_PYTHON):
+        '''
+        Jtl_path: jtl file, dir or glob pattern of jtl files (like one file per load generator).
+        '''
+        aggregator = aggregate_jtl_files(collect_jtl_files(jtl_path), processes, backend)
+        self.print_aggregator(aggregator)
+        return aggregator
 
-        self._average = int(sum_elapsed / self._count)
+    def print_aggregator(self, aggregator):
+        for summary in aggregator.summaries.values():
+            self.print_summary(summary)
 
-    def _parse_and_print_body(self):
-        samplers_count = self._count
-        average = self._average
-        duration = float((self._end_ts - self._start_ts) / 1000)  # second
+    def print_summary(self, summary):
+        samplers_count = summary.count
+        average = int(summary.sum_elapsed / samplers_count)
+        duration = float((summary.end_ts - summary.start_ts) / 1000)  # second
 
         error_percent = '%.3f' % float(
-            100 * self._errors / samplers_count) + '%'
-
-        sorted_elapsed_list = sorted(self._elapsed_list)
-        median = sorted_elapsed_list[int(samplers_count / 2)]
-        min = sorted_elapsed_list[0]
-        max = sorted_elapsed_list[samplers_count - 1]
+            100 * summary.errors / samplers_count) + '%'
 
-        line_90 = sorted_elapsed_list[int(round(samplers_count * 0.9)) - 1]
-        line_99 = sorted_elapsed_list[int(round(samplers_count * 0.99)) - 1]
-        line_999 = sorted_elapsed_list[int(round(samplers_count * 0.999)) - 1]
-        line_9999 = sorted_elapsed_list[int(
-            round(samplers_count * 0.9999)) - 1]
+        histogram = summary.histogram
+        median = histogram.value_at_rank(int(samplers_count / 2) + 1)
+        line_90 = histogram.value_at_percentile(0.9)
+        line_99 = histogram.value_at_percentile(0.99)
+        line_999 = histogram.value_at_percentile(0.999)
+        line_9999 = histogram.value_at_percentile(0.9999)
 
-        throughput = float(samplers_count / duration)  # tps
+        throughput = summary.throughput()  # tps
 
-        line = ['%15.2f' % duration, '%20s' % self._label, '%10d' % samplers_count, '%10s' % error_percent, '%10d' % average, '%10d' % median, '%10d' % min, '%10d' % max, '%10d' %
+        line = ['%15.2f' % duration, '%20s' % summary.label, '%10d' % samplers_count, '%10s' % error_percent, '%10d' % average, '%10d' % median, '%10d' % summary.min, '%10d' % summary.max, '%10d' %
                 line_90, '%10d' % line_99, '%10d' % line_999, '%10d' % line_9999, '%20.2f' % throughput]
         print('|'.join(line))
 # end JmeterReport class
 
 
-def read_file(file_path):
+def read_jtl_rows(file_path):
+    '''
+    Yield (timestamp, elapsed, label, code) for each sample, the file is read line by line.
+    Malformed rows are skipped: truncated (no value at the last of 4 columns), or timestamp and elapsed are not integers.
+    '''
     if not os.path.exists(file_path):
         raise Exception('File is NOT exist: ' + file_path)
 
-    with codecs.open(file_path, 'r', 'utf-8') as f:
-        return f.readlines()
+    with open(file_path, mode='r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        first_fields = next(reader, None)
+        if first_fields is None:
+            return
+        has_header, (ts_idx, elapsed_idx, label_idx, code_idx) = parse_jtl_header(first_fields)
+        last_idx = max(ts_idx, elapsed_idx, label_idx, code_idx)
+        rows = reader if has_header else itertools.chain([first_fields], reader)
+
+        for fields in rows:
+            if len(fields) <= last_idx or len(fields[last_idx]) == 0:
+                continue
+            try:
+                timestamp, elapsed = int(fields[ts_idx]), int(fields[elapsed_idx])
+            except ValueError:
+                continue
+            yield timestamp, elapsed, fields[label_idx], fields[code_idx]
+
 
+def parse_jtl_header(first_fields):
+    '''
+    Returns (has header, column indexes of JTL_COLUMNS) by first line of jtl file, shared by python and numpy backends.
+    Jtl file without header (first line is sample, timestamp as digits) uses default columns order.
+    '''
+    if all([col in first_fields for col in JtlAggregator.JTL_COLUMNS]):
+        return True, [first_fields.index(col) for col in JtlAggregator.JTL_COLUMNS]
+    is_sample = len(first_fields) > 0 and first_fields[0].strip().isdigit()
+    return not is_sample, [0, 1, 2, 3]
+
+
+def collect_jtl_files(jtl_path):
+    if os.path.isdir(jtl_path):
+        file_paths = glob.glob(os.path.join(jtl_path, '*.jtl'))
+    elif glob.has_magic(jtl_path):
+        file_paths = glob.glob(jtl_path)
+    else:
+        file_paths = [jtl_path]
+
+    if len(file_paths) == 0:
+        raise Exception('No jtl files found: ' + jtl_path)
+    return sorted(file_paths)
+
+
+def aggregate_jtl_file(file_path):
+    return JtlAggregator().add_file(file_path)
+
+
+def aggregate_jtl_file_vectorized(file_path):
+    return JtlAggregator().add_file_vectorized(file_path)
+
+
+def aggregate_jtl_files(file_paths, processes=None, backend=BACKEND_PYTHON):
+    '''
+    Aggregate each jtl file in process pool into partial summaries, and merge them into one.
+    '''
+    if backend == BACKEND_NUMPY:
+        aggregate_func = aggregate_jtl_file_vectorized
+    elif backend == BACKEND_PYTHON:
+        aggregate_func = aggregate_jtl_file
+    else:
+        raise ValueError('invalid jtl aggregate backend: ' + backend)
 
-def main(ftl_file_path):
-    jtl_lines = read_file(ftl_file_path)
+    if len(file_paths) == 1:
+        return aggregate_func(file_paths[0])
 
-    lines_for_label = {}
-    for line in jtl_lines[1:]:
-        label = line.split(',')[2]
-        if label in lines_for_label.keys():
-            lines_for_label[label].append(line)
-        else:
-            lines_for_label[label] = [line]
+    processes = min(processes or multiprocessing.cpu_count(), len(file_paths))
+    with multiprocessing.Pool(processes) as pool:
+        partials = pool.map(aggregate_func, file_paths)
 
+    ret_aggregator = JtlAggregator()
+    for partial in partials:
+        ret_aggregator.merge(partial)
+    return ret_aggregator
+
+
+def main(jtl_path, processes=None, series_path='', bucket_secs=1, backend=BACKEND_PYTHON,
+         save_baseline_path='', baseline_path='', threshold=10):
+    '''
+    Returns exit code, 2 if regressions found compared with baseline.
+    '''
     report = JmeterReport()
-    for key in lines_for_label.keys():
-        report.print(lines_for_label[key])
+    if len(series_path) > 0:
+        # summaries and time series are from one streaming pass of jtl files
+        aggregator = JtlAggregator()
+        JtlTimeSeries(series_path, bucket_secs).add_files(collect_jtl_files(jtl_path), aggregator)
+        report.print_aggregator(aggregator)
+        print('time series (%s secs) saved: %s' % (bucket_secs, series_path))
+    else:
+        aggregator = report.print_jtl(jtl_path, processes, backend)
+
+    baseline = JtlBaseline(threshold)
+    if len(save_baseline_path) > 0:
+        baseline.save(aggregator, save_baseline_path)
+        print('baseline saved: ' + save_baseline_path)
+
+    if len(baseline_path) > 0:
+        regressions = baseline.compare(aggregator, baseline_path)
+        if len(regressions) > 0:
+            print('Regressions compared with baseline (threshold %s%%):' % threshold)
+            print('\n'.join(regressions))
+            return 2
+        print('No regression compared with baseline: ' + baseline_path)
+    return 0
+
+
+def cmd_args_parse():
+
+    def __usage():
+        lines = []
+        lines.append('Usage:')
+        lines.append('  $ python app_jmeter_report.py [-b numpy] [-p 4] [-s series.csv -t 1] [-w base.json | -c base.json -r 10] <jtl file|dir|"glob">')
+        lines.append('Options:')
+        lines.append('  -b: backend to aggregate jtl, python (default) or numpy (requires numpy and pandas).')
+        lines.append('  -p: number of processes to aggregate multiple jtl files.')
+        lines.append('  -s: save per label tps, error rate and latency series into csv file (jtl rows are read in one pass, and -b, -p are ignored).')
+        lines.append('  -t: time bucket of series in seconds, default 1.')
+        lines.append('  -w: save summary of this run as baseline json file.')
+        lines.append('  -c: compare with baseline json file, and exit with code 2 if any regression.')
+        lines.append('  -r: regression threshold percent for latency and throughput, default 10.')
+        lines.append('  -h: help')
+        print('\n'.join(lines))
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hb:p:s:t:w:c:r:')
+    ret_dict = {}
+    for op, value in opts:
+        if op == '-b':
+            ret_dict['backend'] = value
+        elif op == '-p':
+            ret_dict['processes'] = int(value)
+        elif op == '-s':
+            ret_dict['series_path'] = value
+        elif op == '-t':
+            ret_dict['bucket_secs'] = float(value)
+        elif op == '-w':
+            ret_dict['save_baseline_path'] = value
+        elif op == '-c':
+            ret_dict['baseline_path'] = value
+        elif op == '-r':
+            ret_dict['threshold'] = float(value)
+        elif op == '-h':
+            __usage()
+            exit(0)
+
+    for key in ('processes', 'bucket_secs'):
+        if key in ret_dict and ret_dict[key] <= 0:
+            print('error: -%s should be greater than 0.' % ('p' if key == 'processes' else 't'))
+            __usage()
+            exit(1)
+    if ret_dict.get('threshold', 0) < 0:
+        print('error: -r should not be negative.')
+        __usage()
+        exit(1)
+
+    if len(args) == 0:
+        __usage()
+        exit(1)
+    return args[0], ret_dict
 
 
 if __name__ == '__main__':
 
-    jtl_file_path = sys.argv[1]
-    main(jtl_file_path)
+    jtl_path, args_dict = cmd_args_parse()
+    exit_code = main(jtl_path, **args_dict)
 
     print('Jmeter report parse Done.')
+    exit(exit_code)
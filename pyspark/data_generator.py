@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-08-20
+@author: zhengjin
+
+Schema-driven test data generator, shared by data_prepare scripts.
+Columns are created by numpy in vectorized batches (driver side), and by pandas udf / mapInPandas on executors.
+
+Rows are generated in fixed size batches, and each batch has its own random seed (seed, batch id),
+so the data is deterministic by seed, and not depends on number of partitions.
+
+Submit spark job with this module shipped to executors:
+bin/spark-submit \
+--master yarn-client \
+--py-files /mnt/spark_dir/data_generator.py \
+/mnt/spark_dir/data_prepare01.py
+'''
+
+import datetime
+import numpy as np
+import pandas as pd
+
+# column spec: (name, type, args...)
+# seq: (start,) long row index from start
+# seq_choice: (sep, values) str(row index) + sep + random value
+# seq_dt: (start_dt, rows_per_dt) date str like "20190701", changed every rows_per_dt rows
+# uuid: (prefix,) prefix + random uuid4 str
+# int: (low, high) both inclusive
+# float: (low, high, decimals)
+# choice: (values,)
+# date: (start_date, end_date) random date str like "2019-07-01", both inclusive
+# const: (value,)
+DEFAULT_BATCH_ROWS = 1000000
+
+
+class DataGenerator(object):
+
+    def __init__(self, schema, seed=None, batch_rows=DEFAULT_BATCH_ROWS):
+        self._schema = schema
+        # seed is fixed on driver, and all executors use the same one
+        self._seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._batch_rows = batch_rows
+
+    def get_names(self):
+        return [spec[0] for spec in self._schema]
+
+    def get_seed(self):
+        return self._seed
+
+    def get_batch_count(self, row_count):
+        return (row_count + self._batch_rows - 1) // self._batch_rows
+
+    # --------------------------------------------------------------
+    # Generate by numpy
+    # --------------------------------------------------------------
+    def generate_batch(self, batch_id, row_count):
+        '''
+        Returns pandas dataframe of rows [batch_id * batch_rows, (batch_id + 1) * batch_rows) within row_count.
+        '''
+        start = batch_id * self._batch_rows
+        size = max(0, min(self._batch_rows, row_count - start))
+        rng = np.random.default_rng([self._seed, batch_id])
+        seq = np.arange(start, start + size, dtype=np.int64)
+
+        data = {}
+        for spec in self._schema:
+            data[spec[0]] = self._build_column(rng, seq, spec)
+        return pd.DataFrame(data, columns=self.get_names())
+
+    def generate(self, row_count):
+        '''
+        Generate all rows on driver side, for small tables.
+        '''
+        batches = [self.generate_batch(i, row_count) for i in range(self.get_batch_count(row_count))]
+        if len(batches) == 0:
+            return self.generate_batch(0, 0)
+        return pd.concat(batches, ignore_index=True)
+
+    def _build_column(self, rng, seq, spec):
+        kind = spec[1]
+        size = len(seq)
+        if kind == 'seq':
+            return seq + spec[2]
+        if kind == 'seq_choice':
+            suffixes = rng.choice(np.asarray(list(spec[3]), dtype=str), size=size)
+            return np.char.add(np.char.add(seq.astype(str), spec[2]), suffixes)
+        if kind == 'seq_dt':
+            # only a few distinct dates in batch, and values are taken from formatted table
+            if size == 0:
+                return np.array([], dtype=str)
+            start = np.datetime64(datetime.datetime.strptime(spec[2], '%Y%m%d').date())
+            days = seq // spec[3]
+            dates = start + np.arange(days[0], days[-1] + 1).astype('timedelta64[D]')
+            table = np.char.replace(np.datetime_as_string(dates, unit='D'), '-', '')
+            return self._to_object_table(table)[days - days[0]]
+        if kind == 'uuid':
+            return self._build_uuids(rng, spec[2], size)
+        if kind == 'int':
+            return rng.integers(spec[2], spec[3] + 1, size=size, dtype=np.int64)
+        if kind == 'float':
+            return np.round(rng.uniform(spec[2], spec[3], size=size), spec[4])
+        if kind == 'choice':
+            return self._to_object_table(np.asarray(list(spec[2])))[rng.integers(0, len(spec[2]), size=size)]
+        if kind == 'date':
+            start = np.datetime64(spec[2], 'D')
+            dates = np.arange(start, np.datetime64(spec[3], 'D') + np.timedelta64(1, 'D'))
+            table = np.datetime_as_string(dates, unit='D')
+            return self._to_object_table(table)[rng.integers(0, len(table), size=size)]
+        if kind == 'const':
+            return self._to_object_table(np.asarray([spec[2]]))[np.zeros(size, dtype=np.int64)]
+        raise ValueError('invalid column type: ' + kind)
+
+    def _to_object_table(self, table):
+        # str values are taken by reference from object table, and no copy of fixed width str array into pandas
+        return table.astype(object) if table.dtype.kind in ('U', 'S') else table
+
+    def _build_uuids(self, rng, prefix, size):
+        raw = rng.integers(0, 256, size=(size, 16), dtype=np.uint8)
+        raw[:, 6] = (raw[:, 6] & 0x0f) | 0x40  # version 4
+        raw[:, 8] = (raw[:, 8] & 0x3f) | 0x80  # variant
+        hex_chars = np.frombuffer(raw.tobytes().hex().encode('ascii'), dtype=np.uint8).reshape(size, 32)
+
+        # layout: prefix + 8-4-4-4-12
+        prefix_len = len(prefix)
+        chars = np.full((size, prefix_len + 36), ord('-'), dtype=np.uint8)
+        chars[:, :prefix_len] = np.frombuffer(prefix.encode('ascii'), dtype=np.uint8)
+        src, dst = 0, prefix_len
+        for width in (8, 4, 4, 4, 12):
+            chars[:, dst:dst + width] = hex_chars[:, src:src + width]
+            src += width
+            dst += width + 1
+        return chars.view('S%d' % (prefix_len + 36)).ravel().astype(str)
+
+    # --------------------------------------------------------------
+    # Generate by spark
+    # --------------------------------------------------------------
+    def get_spark_schema(self):
+        from pyspark.sql.types import StructType, StructField, LongType, DoubleType, BooleanType, StringType
+
+        def _spark_type(values):
+            kind = np.asarray(values).dtype.kind
+            if kind in ('i', 'u'):
+                return LongType()
+            if kind == 'f':
+                return DoubleType()
+            if kind == 'b':
+                return BooleanType()
+            return StringType()
+
+        fields = []
+        for spec in self._schema:
+            kind = spec[1]
+            if kind in ('seq', 'int'):
+                data_type = LongType()
+            elif kind == 'float':
+                data_type = DoubleType()
+            elif kind == 'choice':
+                data_type = _spark_type(spec[2])
+            elif kind == 'const':
+                data_type = _spark_type([spec[2]])
+            else:
+                data_type = StringType()
+            fields.append(StructField(spec[0], data_type, True))
+        return StructType(fields)
+
+    def create_dataframe(self, sqlContext, row_count, num_partitions=None):
+        '''
+        Only batch ids are distributed, and each batch of rows is generated on executor.
+        spark 3.0+: mapInPandas, spark 2.3+: grouped map pandas udf, others: rdd flatMap.
+        '''
+        num_batches = self.get_batch_count(row_count)
+        num_partitions = num_partitions if num_partitions is not None else max(1, num_batches)
+        batch_df = sqlContext.range(0, num_batches, 1, num_partitions)
+        spark_schema = self.get_spark_schema()
+
+        if hasattr(batch_df, 'mapInPandas'):
+            def _gen_batches(iterator):
+                for pdf in iterator:
+                    for batch_id in pdf['id'].tolist():
+                        yield self.generate_batch(batch_id, row_count)
+            return batch_df.mapInPandas(_gen_batches, spark_schema)
+
+        try:
+            from pyspark.sql.functions import pandas_udf, PandasUDFType
+        except ImportError:
+            def _gen_rows(row):
+                return self.generate_batch(row.id, row_count).astype(object).values.tolist()
+            return sqlContext.createDataFrame(batch_df.rdd.flatMap(_gen_rows), spark_schema)
+
+        @pandas_udf(spark_schema, PandasUDFType.GROUPED_MAP)
+        def _gen_batch(pdf):
+            return self.generate_batch(int(pdf['id'].iloc[0]), row_count)
+        return batch_df.groupby('id').apply(_gen_batch)
+
+
+def write_data(df, write_path, f_type='parquet', partition_cols=None, mode=None):
+    '''
+    Write dataframe as parquet or orc files, and partitioned by columns (like dt=20190701) if set.
+    Spark default mode (error if path exists) is used, unless mode is set like "overwrite".
+    '''
+    writer = df.write
+    if mode is not None:
+        writer = writer.mode(mode)
+    if partition_cols:
+        writer = writer.partitionBy(*partition_cols)
+    if f_type == 'orc':
+        writer.orc(write_path)
+    elif f_type == 'parquet':
+        writer.parquet(write_path)
+    else:
+        raise ValueError('invalid file type: ' + f_type)
+
+
+if __name__ == '__main__':
+
+    import time
+
+    schema = [('id', 'seq', 0), ('flag', 'seq_choice', '_', 'yn'), ('dt', 'seq_dt', '20190701', 4),
+              ('evt_id', 'uuid', 'acc_'), ('age', 'int', 18, 85), ('rate', 'float', -3., 2., 2),
+              ('job', 'choice', ['admin', 'services', 'retired']), ('open_date', 'date', '2017-01-10', '2017-09-30'),
+              ('date2', 'const', '2015-4-20')]
+    generator = DataGenerator(schema, seed=1, batch_rows=5)
+    print(generator.generate(12))
+
+    start = time.perf_counter()
+    generator = DataGenerator(schema, seed=1)
+    rows = len(generator.generate_batch(0, DEFAULT_BATCH_ROWS))
+    print('generate %d rows in %.3f secs' % (rows, time.perf_counter() - start))
+    print('data generator test DONE.')
@@ -13,25 +13,21 @@ bin/spark-submit \
 --num-executors 1 \
 --executor-memory 1g \
 --executor-cores 2 \
+--py-files /mnt/spark_dir/data_generator.py \
 /mnt/spark_dir/data_prepare01.py
 '''
 
 import random
-import numpy as np
-import uuid
 
 import pyspark
 from pyspark import SparkConf, SparkContext
 from pyspark.sql import SQLContext
 
-
-TYPE_LIST = 'abcdefghijklmnopqrstuvwxyz'
-FLAG_LIST = map(str, range(2))
-# FLAG_LIST = (str(i) for i in range(2))
+from data_generator import DataGenerator, write_data
 
 
-def gen_evt_id(prefix):
-    return prefix + '_' + str(uuid.uuid4())
+TYPE_LIST = 'abcdefghijklmnopqrstuvwxyz'
+FLAG_LIST = [str(i) for i in range(2)]
 
 
 def print_df_info(pyspark_df):
@@ -62,36 +58,25 @@ def pyspark_data_demo01(sc, sqlContext):
 
 
 # demo02: generate parquet data
-def extend_tbl_account(id_account_rdd):
-
-    def _extend_acount(account_id):
-        account_type = 'acc_' + random.choice(TYPE_LIST)
-        offshore = random.choice(FLAG_LIST)
-        open_date = '2017-0%d-%d' % (random.randint(1, 9), random.randint(10, 30))
-        close_date = '2019-0%d-%d' % (random.randint(1, 9), random.randint(10, 30))
-        return [account_id, account_type, offshore, open_date, close_date]
-
-    result_rdd = id_account_rdd.map(lambda x: _extend_acount(x))
-    schema = ['account_id', 'account_type', 'offshore', 'open_date', 'close_date']
-    return result_rdd, schema
+ACCOUNT_SCHEMA = [
+    ('account_id', 'uuid', 'acc_'),
+    ('account_type', 'choice', ['acc_' + t for t in TYPE_LIST]),
+    ('offshore', 'choice', FLAG_LIST),
+    ('open_date', 'date', '2017-01-10', '2017-09-30'),
+    ('close_date', 'date', '2019-01-10', '2019-09-30'),
+]
 
 
 def pyspark_data_demo02(sc, sqlContext):
-    print('generate id_account_list.')
+    print('generate tbl_account.')
     num_account = 1500
-    id_account_rdd = sc.parallelize(range(num_account), 1) \
-        .map(lambda x: gen_evt_id('acc'))
-    id_account_rdd.persist(storageLevel=pyspark.StorageLevel.MEMORY_AND_DISK)
-
-    print('extend tbl_account by account_ids:')
-    tbl_account_rdd, schema_account = extend_tbl_account(id_account_rdd)
-    tbl_account_df = sqlContext.createDataFrame(tbl_account_rdd, schema_account)
+    generator = DataGenerator(ACCOUNT_SCHEMA, seed=22)
+    tbl_account_df = generator.create_dataframe(sqlContext, num_account, 1)
     print_df_info(tbl_account_df)
 
     write_dir = 'hdfs:///user/root/test/account'
-    tbl_account_df.write.parquet(write_dir)
-    id_account_rdd.unpersist()
-    print('write id_account_list success.')
+    write_data(tbl_account_df, write_dir)
+    print('write tbl_account success.')
 
     # hdfs dfs -ls -h /user/root/test/account
     # outputs:
@@ -142,64 +127,46 @@ def pyspark_data_demo03(sc, sqlContext):
 
 
 # demo04: prepare bank data
-def pyspark_data_demo04(sc, sqlContext):
-    jobs = ['technician', 'management', 'blue-collar', 'entrepreneur',
-            'services', 'admin', 'housemaid', 'unemployed', 'unknown', 'retired']
-    maritals = ['married', 'divorced', 'single']
-    educations = ['unknown', 'university.degree', 'professional.course',
-                  'high.school', 'basic.4y', 'basic.6y', 'basic.9y']
-    flag = ['yes', 'no']
-    contacts = ['cellular', 'telephone']
-    months = ['jun', 'feb', 'mar', 'apr', 'may', 'jun',
-              'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
-    days_of_week = ['mon', 'tue', 'wed', 'thu', 'fri']
-    poutcomes = ['nonexistent', 'success', 'failure']
-    labels = [0, 1]
-    dates = ['2015-3-20', '2015-4-20', '2015-4-21']
-
-    def _extend_bank_record(record_id):
-        fields = [record_id]  # id
-        fields.append(random.randint(18, 85))  # age
-        fields.append(random.choice(jobs))  # job
-        fields.append(random.choice(maritals))  # marital
-        fields.append(random.choice(educations))  # education
-        fields.append(random.choice(flag))  # default
-        fields.append(random.choice(flag))  # housing
-        fields.append(random.choice(flag))  # load
-        fields.append(random.choice(contacts))  # contact
-        fields.append(random.choice(months))  # month
-        fields.append(random.choice(days_of_week))  # day_of_week
-        fields.append(random.randint(1, 199))  # duration
-        fields.append(random.randint(1, 199))  # campaign
-        fields.append(random.choice([3, 6, 999]))  # pdays
-        fields.append(random.choice([0, 1]))  # previous
-        fields.append(random.choice(poutcomes))  # poutcome
-        fields.append(float('%.2f' % np.random.uniform(-3., 2.)))  # emp_var_rate
-        fields.append(float('%.3f' % np.random.uniform(92., 94.)))  # cons_price_idx
-        fields.append(random.choice(labels))  # y
-        fields.append(random.choice(dates))  # date1
-        fields.append('2015-4-20')  # date2
-        fields.append('2015-4-20')  # date3
-
-        return fields
+BANK_SCHEMA = [
+    ('id', 'uuid', 'acc_'),
+    ('age', 'int', 18, 85),
+    ('job', 'choice', ['technician', 'management', 'blue-collar', 'entrepreneur',
+                       'services', 'admin', 'housemaid', 'unemployed', 'unknown', 'retired']),
+    ('marital', 'choice', ['married', 'divorced', 'single']),
+    ('education', 'choice', ['unknown', 'university.degree', 'professional.course',
+                             'high.school', 'basic.4y', 'basic.6y', 'basic.9y']),
+    ('default', 'choice', ['yes', 'no']),
+    ('housing', 'choice', ['yes', 'no']),
+    ('loan', 'choice', ['yes', 'no']),
+    ('contact', 'choice', ['cellular', 'telephone']),
+    ('month', 'choice', ['jun', 'feb', 'mar', 'apr', 'may', 'jun',
+                         'jul', 'aug', 'sep', 'oct', 'nov', 'dec']),
+    ('day_of_week', 'choice', ['mon', 'tue', 'wed', 'thu', 'fri']),
+    ('duration', 'int', 1, 199),
+    ('campaign', 'int', 1, 199),
+    ('pdays', 'choice', [3, 6, 999]),
+    ('previous', 'choice', [0, 1]),
+    ('poutcome', 'choice', ['nonexistent', 'success', 'failure']),
+    ('emp_var_rate', 'float', -3., 2., 2),
+    ('cons_price_idx', 'float', 92., 94., 3),
+    ('y', 'choice', [0, 1]),
+    ('date1', 'choice', ['2015-3-20', '2015-4-20', '2015-4-21']),
+    ('date2', 'const', '2015-4-20'),
+    ('date3', 'const', '2015-4-20'),
+]
 
+
+def pyspark_data_demo04(sc, sqlContext):
     print('generate bank_data start.')
     num_bankdata = 2 * 10000
     num_partitions = 1
-    bankdata_rdd = sc.parallelize(range(num_bankdata), num_partitions) \
-        .map(lambda x: gen_evt_id('acc')) \
-        .map(lambda id: _extend_bank_record(id))
-    # bankdata_rdd.repartition(1)
-
-    schema = ['id', 'age', 'job', 'marital', 'education', 'default',
-              'housing', 'loan', 'contact', 'month', 'day_of_week', 'duration',
-              'campaign', 'pdays', 'previous', 'poutcome', 'emp_var_rate',
-              'cons_price_idx', 'y', 'date1', 'date2', 'date3']
-    bankdata_df = sqlContext.createDataFrame(bankdata_rdd, schema)
+    # for large data set (like 1 billion rows), set more partitions, and rows are generated in batches on executors
+    generator = DataGenerator(BANK_SCHEMA, seed=4)
+    bankdata_df = generator.create_dataframe(sqlContext, num_bankdata, num_partitions)
     print_df_info(bankdata_df)
 
     write_dir = 'hdfs:///user/root/test/bankdata'
-    bankdata_df.write.parquet(write_dir)
+    write_data(bankdata_df, write_dir)
     print('write band_data success.')
 
 
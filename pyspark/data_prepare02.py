@@ -13,17 +13,18 @@ bin/spark-submit \
 --num-executors 1 \
 --executor-memory 1g \
 --executor-cores 2 \
+--py-files /mnt/spark_dir/data_generator.py \
 /mnt/spark_dir/data_prepare02.py
 '''
 
 import datetime
-import random
 
-import pyspark
 from pyspark import SparkConf, SparkContext
 from pyspark.sql import SQLContext
 from pyspark.sql import HiveContext
 
+from data_generator import DataGenerator, write_data
+
 
 def print_df_info(df):
     print('\nDATAFRAME INFO:')
@@ -48,35 +49,17 @@ class DataCreate(object):
         self._sqlContext = sqlContext
         self._hiveContext = hiveContext
 
-    def data_prepare(self, write_path, row_count, dt, dt_n, part_n=1, f_type='parquet'):
+    def data_prepare(self, write_path, row_count, dt, dt_n, part_n=1, f_type='parquet', seed=None):
         '''
-        Create parquet or orc files partitioned by dt (date).
+        Create parquet or orc files partitioned by dt (date), row_count rows for each dt.
+        All dt are generated in one job, and written by partitionBy('dt').
+        Only the written dt dirs are replaced (dynamic partition overwrite, spark 2.3+), and other dt are kept.
         '''
-        schema = ['id', 'flag']
-        write_path = self._format_path(write_path)
-        dt_timestamp = datetime.datetime.strptime(dt, '%Y%m%d')
-
-        start = 0
-        for i in range(dt_n):
-            test_rdd = self._sc.parallelize(range(start, start+row_count), part_n) \
-                .map(lambda x: [x, str(x) + random.choice('yn')])
-            test_df = self._hiveContext.createDataFrame(test_rdd, schema)
-
-            dt = datetime.datetime.strftime(
-                dt_timestamp + datetime.timedelta(days=i), '%Y%m%d')
-            if f_type == 'orc':
-                test_df.write.orc(write_path + dt)
-            else:
-                test_df.write.parquet(write_path + dt)
-
-            start += row_count
-
-    def _format_path(self, path):
-        if path.endswith('/'):
-            path += 'dt='
-        else:
-            path += '/dt='
-        return path
+        schema = [('id', 'seq', 0), ('flag', 'seq_choice', '', 'yn'), ('dt', 'seq_dt', dt, row_count)]
+        generator = DataGenerator(schema, seed=seed)
+        test_df = generator.create_dataframe(self._hiveContext, row_count * dt_n, part_n)
+        self._hiveContext.setConf('spark.sql.sources.partitionOverwriteMode', 'dynamic')
+        write_data(test_df, write_path, f_type=f_type, partition_cols=['dt'], mode='overwrite')
 # DataCreate class end
 
 
@@ -169,7 +152,6 @@ def testDataPrepareForOrc(sc, sqlContext, hiveContext):
 
 def testUpdateDFColumns(sc, sqlContext, hiveContext):
     from pyspark.sql.types import StringType, IntegerType
-    import pyspark.sql.functions as F
 
     d_path = 'hdfs:///user/root/test/test_parquet/'
     start_date = '20191001'
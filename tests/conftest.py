@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-09-02
+@author: zhengjin
+
+Unit tests for pure functions of utils, pyapps, monkeytest and pyspark modules.
+Run from project root: python -m pytest -q tests
+'''
+
+import os
+import sys
+import pytest
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('PYPATH', project_dir)
+# scripts in pyapps and pyspark are imported by module name, same as they are run or shipped
+for path in (project_dir, os.path.join(project_dir, 'pyapps'), os.path.join(project_dir, 'pyspark')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from utils import LogManager
+
+
+@pytest.fixture(scope='session', autouse=True)
+def setup_logger(tmp_path_factory):
+    if not LogManager.has_logger():
+        LogManager.build_logger(str(tmp_path_factory.mktemp('logs').joinpath('unit_tests_log.log')))
+    yield
+    LogManager.clear_log_handles()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-09-02
+@author: zhengjin
+'''
+
+import numpy as np
+
+from monkeytest.chart_parser import ChartParser
+from monkeytest.profile_dashboard import ProfileDashboard
+
+
+class TestDownsampleMinMax(object):
+
+    def test_short_series_not_downsampled(self):
+        x_arr, y_arr = ChartParser.downsample_min_max([3, 1, 2], 10)
+        assert(x_arr.tolist() == [0, 1, 2] and y_arr.tolist() == [3, 1, 2])
+
+    def test_spikes_kept_in_time_order(self):
+        values = np.zeros(10000, dtype=np.int64)
+        values[1234], values[8765] = 100, -5
+        x_arr, y_arr = ChartParser.downsample_min_max(values, 100)
+        assert(len(x_arr) <= 100)
+        assert(np.all(np.diff(x_arr) > 0))
+        assert(1234 in x_arr and 8765 in x_arr)
+        assert(y_arr.max() == 100 and y_arr.min() == -5)
+        assert(np.array_equal(values[x_arr], y_arr))
+
+    def test_partial_last_bucket(self):
+        values = np.arange(1001)
+        x_arr, y_arr = ChartParser.downsample_min_max(values, 10)
+        assert(x_arr[0] == 0 and x_arr[-1] == 1000)
+
+
+class TestProfileDashboardAggregate(object):
+
+    def test_aggregate_buckets(self):
+        secs = np.array([0, 1, 9, 10, 25, 29])
+        values = np.array([1., 5., 3., 2., 4., 6.])
+        starts, mins, avgs, maxs = ProfileDashboard.aggregate(secs, values, 10)
+        assert(starts.tolist() == [0, 10, 20])
+        assert(mins.tolist() == [1., 2., 4.])
+        assert(avgs.tolist() == [3., 2., 5.])
+        assert(maxs.tolist() == [5., 2., 6.])
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-09-02
+@author: zhengjin
+'''
+
+import re
+
+from data_generator import DataGenerator
+from app_create_data import generate_data_to_file
+
+SCHEMA = [('id', 'seq', 100), ('flag', 'seq_choice', '_', 'yn'), ('dt', 'seq_dt', '20190701', 4),
+          ('evt_id', 'uuid', 'acc_'), ('age', 'int', 18, 85), ('rate', 'float', -3., 2., 2),
+          ('job', 'choice', ['admin', 'services', 'retired']), ('open_date', 'date', '2017-01-10', '2017-09-30'),
+          ('date2', 'const', '2015-4-20')]
+
+
+class TestDataGenerator(object):
+
+    def test_same_seed_same_data(self):
+        df1 = DataGenerator(SCHEMA, seed=7, batch_rows=5).generate(12)
+        df2 = DataGenerator(SCHEMA, seed=7, batch_rows=5).generate(12)
+        assert(df1.equals(df2))
+        assert(not df1.equals(DataGenerator(SCHEMA, seed=8, batch_rows=5).generate(12)))
+
+    def test_batch_same_as_generate(self):
+        generator = DataGenerator(SCHEMA, seed=7, batch_rows=5)
+        df = generator.generate(12)
+        batch = generator.generate_batch(2, 12)
+        assert(len(batch) == 2)
+        assert(batch.reset_index(drop=True).equals(df.iloc[10:].reset_index(drop=True)))
+
+    def test_column_values(self):
+        df = DataGenerator(SCHEMA, seed=7, batch_rows=5).generate(12)
+        assert(list(df.columns) == [spec[0] for spec in SCHEMA])
+        assert(df['id'].tolist() == list(range(100, 112)))
+        # flag is row index (not id) with random suffix
+        assert(all([flag[:-2] == str(i) and flag[-2:] in ('_y', '_n') for i, flag in enumerate(df['flag'])]))
+        assert(df['dt'].tolist() == ['20190701'] * 4 + ['20190702'] * 4 + ['20190703'] * 4)
+        re_uuid = re.compile(r'^acc_[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$')
+        assert(all([re_uuid.match(uuid) for uuid in df['evt_id']]))
+        assert(df['age'].between(18, 85).all() and df['rate'].between(-3., 2.).all())
+        assert(set(df['job']) <= {'admin', 'services', 'retired'})
+        assert(df['open_date'].between('2017-01-10', '2017-09-30').all())
+        assert(set(df['date2']) == {'2015-4-20'})
+
+    def test_empty(self):
+        df = DataGenerator(SCHEMA, seed=7).generate(0)
+        assert(len(df) == 0 and list(df.columns) == [spec[0] for spec in SCHEMA])
+
+
+class TestCreateData(object):
+
+    def write_input(self, tmp_path):
+        file_path = tmp_path / 'test_data.csv'
+        lines = ['c%d' % i for i in range(14)]
+        rows = [','.join(['%d%d' % (r, i) for i in range(14)]) for r in range(5)]
+        file_path.write_text('\n'.join([','.join(lines)] + rows) + '\n', encoding='utf-8')
+        return str(file_path)
+
+    def test_same_seed_same_output(self, tmp_path):
+        input_path = self.write_input(tmp_path)
+        out1, out2 = str(tmp_path / 'out1.csv'), str(tmp_path / 'out2.csv')
+        assert(generate_data_to_file(input_path, out1, 3, seed=7) == 20)
+        generate_data_to_file(input_path, out2, 3, seed=7)
+        with open(out1) as f1, open(out2) as f2:
+            assert(f1.read() == f2.read())
+
+    def test_mutated_columns_only(self, tmp_path):
+        input_path = self.write_input(tmp_path)
+        out_path = str(tmp_path / 'out.csv')
+        assert(generate_data_to_file(input_path, out_path, 2, seed=7, is_with_source=False) == 10)
+        with open(out_path) as f:
+            lines = f.read().splitlines()
+        assert(lines[0].startswith('c0,'))
+        for i, line in enumerate(lines[1:]):
+            fields = line.split(',')
+            src_fields = ['%d%d' % (i // 2, col) for col in range(14)]
+            assert(len(fields) == 14)
+            assert(0 <= int(fields[0]) <= 100 and 0 <= int(fields[12]) <= 1000)
+            assert([f for col, f in enumerate(fields) if col not in (0, 12)] ==
+                   [f for col, f in enumerate(src_fields) if col not in (0, 12)])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-09-02
+@author: zhengjin
+'''
+
+import threading
+import pytest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from utils import HttpUtils
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    '''
+    Returns 503 for path /fail, otherwise 200. Each response sets a cookie, and request cookies are recorded.
+    '''
+
+    protocol_version = 'HTTP/1.1'  # keep alive
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Cookie'), self.client_address[1]))
+        self.send_response(503 if self.path.startswith('/fail') else 200)
+        self.send_header('Set-Cookie', 'sid=%d; Path=/' % len(self.server.requests))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def mock_url():
+    server = HTTPServer(('127.0.0.1', 0), MockHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % server.server_port, server.requests
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpUtilsPooledSession(object):
+
+    def setup_method(self):
+        HttpUtils.close_pooled_sessions()
+
+    def teardown_method(self):
+        HttpUtils.close_pooled_sessions()
+
+    def test_connection_reused(self, mock_url):
+        url, requests = mock_url
+        del requests[:]
+        http_utils = HttpUtils().use_pooled_session(pool_size=1)
+        for _ in range(3):
+            resp = http_utils.send_http_request(HttpUtils.HTTP_METHOD_GET, url + '/index', 'k1=v1')
+            assert(resp.status_code == 200)
+        # same client port, one tcp connection for all requests
+        assert(len(set([port for _, _, port in requests])) == 1)
+
+    def test_cookies_not_shared(self, mock_url):
+        url, requests = mock_url
+        del requests[:]
+        HttpUtils().use_pooled_session().send_http_request(HttpUtils.HTTP_METHOD_GET, url + '/login', '')
+        HttpUtils().use_pooled_session().send_http_request(HttpUtils.HTTP_METHOD_GET, url + '/index', '')
+        assert([cookie for _, cookie, _ in requests] == [None, None])
+
+    def test_retry_returns_last_response(self, mock_url):
+        url, requests = mock_url
+        del requests[:]
+        http_utils = HttpUtils().use_pooled_session(max_retries=2, backoff_factor=0)
+        resp = http_utils.send_http_request(HttpUtils.HTTP_METHOD_GET, url + '/fail', '')
+        assert(resp is not None and resp.status_code == 503)
+        assert(len(requests) == 3)
+
+    def test_default_request_not_pooled(self, mock_url):
+        url, requests = mock_url
+        del requests[:]
+        http_utils = HttpUtils().use_pooled_session().use_default_request()
+        resp = http_utils.send_http_request(HttpUtils.HTTP_METHOD_GET, url + '/fail', '')
+        assert(resp.status_code == 503)
+        assert(len(requests) == 1)
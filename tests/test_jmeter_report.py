@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-09-02
+@author: zhengjin
+'''
+
+import random
+import pytest
+
+from app_jmeter_report import LatencyHistogram, JtlAggregator, JtlBaseline, aggregate_jtl_files, \
+    BACKEND_PYTHON, BACKEND_NUMPY
+
+JTL_HEADER = 'timeStamp,elapsed,label,responseCode,responseMessage,success\n'
+
+
+def write_jtl(file_path, rows, header=JTL_HEADER):
+    with open(file_path, mode='w', encoding='utf-8') as f:
+        f.write(header)
+        f.writelines(rows)
+    return str(file_path)
+
+
+def build_rows(labels, count, elapsed_range=(10, 300), error_rate=0.01, seed=1):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(count):
+        code = '500' if rnd.random() < error_rate else '200'
+        rows.append('%d,%d,%s,%s,OK,%s\n' % (1560000000000 + i * 10, rnd.randint(*elapsed_range),
+                                             rnd.choice(labels), code, 'true' if code == '200' else 'false'))
+    return rows
+
+
+def summary_values(aggregator):
+    return {label: (s.count, s.errors, s.sum_elapsed, s.min, s.max, s.start_ts, s.end_ts,
+                    s.histogram.value_at_percentile(0.9))
+            for label, s in aggregator.summaries.items()}
+
+
+class TestLatencyHistogram(object):
+
+    def test_exact_values_under_limit(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 101):
+            histogram.record(value)
+        assert(histogram.value_at_percentile(0.5) == 50)
+        assert(histogram.value_at_percentile(0.99) == 99)
+
+    def test_relative_error_for_large_values(self):
+        histogram = LatencyHistogram()
+        histogram.record(123456)
+        assert(abs(histogram.value_at_percentile(1.0) - 123456) / 123456 < 0.001)
+
+    def test_record_batch_same_as_record(self):
+        import numpy as np
+        values = np.array([0, 5, 2047, 2048, 5000, 99999], dtype=np.int64)
+        single, batch = LatencyHistogram(), LatencyHistogram()
+        for value in values:
+            single.record(int(value))
+        batch.record_batch(values)
+        assert(single.counts == batch.counts and single.total == batch.total)
+
+
+class TestJtlBackends(object):
+
+    def test_backends_same_summaries(self, tmp_path):
+        jtl_path = write_jtl(tmp_path / 'run.jtl', build_rows(['login', 'query', ''], 5000))
+        python_summaries = summary_values(aggregate_jtl_files([jtl_path], backend=BACKEND_PYTHON))
+        numpy_summaries = summary_values(aggregate_jtl_files([jtl_path], backend=BACKEND_NUMPY))
+        assert(python_summaries == numpy_summaries)
+        assert(sum([v[0] for v in python_summaries.values()]) == 5000)
+
+    def test_backends_skip_malformed_rows(self, tmp_path):
+        rows = ['1,10,a,200,OK,true\n',
+                '2,11,b\n',  # truncated
+                '3,xx,a,200,OK,true\n',  # elapsed is not integer
+                ',12,a,200,OK,true\n',  # timestamp missing
+                '4,13,a,500,Error,false,extra\n',
+                '5,14,"c,1",200,OK,true\n']
+        jtl_path = write_jtl(tmp_path / 'bad.jtl', rows)
+        for backend in (BACKEND_PYTHON, BACKEND_NUMPY):
+            summaries = summary_values(aggregate_jtl_files([jtl_path], backend=backend))
+            assert(sorted(summaries.keys()) == ['a', 'c,1'])
+            assert(summaries['a'][:3] == (2, 1, 23))
+
+    def test_headerless_file(self, tmp_path):
+        rows = build_rows(['login'], 100)
+        with_header = summary_values(JtlAggregator().add_file(write_jtl(tmp_path / 'a.jtl', rows)))
+        for backend in (BACKEND_PYTHON, BACKEND_NUMPY):
+            jtl_path = write_jtl(tmp_path / 'b.jtl', rows, header='')
+            assert(summary_values(aggregate_jtl_files([jtl_path], backend=backend)) == with_header)
+
+    def test_merge_files_same_as_one_file(self, tmp_path):
+        rows = build_rows(['login', 'query'], 2000)
+        one = summary_values(JtlAggregator().add_file(write_jtl(tmp_path / 'all.jtl', rows)))
+        file_paths = [write_jtl(tmp_path / 'p1.jtl', rows[:700]), write_jtl(tmp_path / 'p2.jtl', rows[700:])]
+        assert(summary_values(aggregate_jtl_files(file_paths, processes=2)) == one)
+
+
+class TestJtlBaseline(object):
+
+    @pytest.fixture
+    def baseline_path(self, tmp_path):
+        aggregator = JtlAggregator().add_file(write_jtl(tmp_path / 'base.jtl', build_rows(['login', 'query'], 4000)))
+        file_path = str(tmp_path / 'base.json')
+        JtlBaseline().save(aggregator, file_path)
+        return file_path
+
+    def test_no_regression_for_same_run(self, tmp_path, baseline_path):
+        aggregator = JtlAggregator().add_file(write_jtl(tmp_path / 'cur.jtl', build_rows(['login', 'query'], 4000)))
+        assert(JtlBaseline().compare(aggregator, baseline_path) == [])
+
+    def test_latency_regression(self, tmp_path, baseline_path):
+        rows = build_rows(['login', 'query'], 4000, elapsed_range=(100, 600), seed=2)
+        aggregator = JtlAggregator().add_file(write_jtl(tmp_path / 'cur.jtl', rows))
+        regressions = JtlBaseline().compare(aggregator, baseline_path)
+        assert(any(['latency' in msg for msg in regressions]))
+
+    def test_error_rate_regression(self, tmp_path, baseline_path):
+        rows = build_rows(['login', 'query'], 4000, error_rate=0.1, seed=2)
+        aggregator = JtlAggregator().add_file(write_jtl(tmp_path / 'cur.jtl', rows))
+        regressions = JtlBaseline().compare(aggregator, baseline_path)
+        assert(any(['error rate' in msg for msg in regressions]))
+
+    def test_missing_label_regression(self, tmp_path, baseline_path):
+        aggregator = JtlAggregator().add_file(write_jtl(tmp_path / 'cur.jtl', build_rows(['login'], 4000)))
+        regressions = JtlBaseline().compare(aggregator, baseline_path)
+        assert(len(regressions) == 1 and regressions[0].startswith('[query] missing'))
@@ -1,6 +1,9 @@
 from utils.constants import Constants
 from utils.log_manager import LogManager
 from utils.sys_utils import SysUtils
+from utils.sys_utils import CmdResult
 from utils.adb_utils import AdbUtils
+from utils.adb_utils import AdbShellSession
 from utils.http_utils import HttpUtils
 from utils.xlsx_utils import XlsxUtils
+from utils.xlsx_utils import XlsxBulkWriter
@@ -9,6 +9,10 @@ Created on 2018-10-26
 import sys
 import os
 import re
+import queue
+import subprocess
+import threading
+import time
 
 sys.path.append(os.getenv('PYPATH'))
 from utils import Constants
@@ -16,6 +20,120 @@ from utils import LogManager
 from utils import SysUtils
 
 
+class AdbShellSession(object):
+    '''
+    Persistent "adb shell" process, and commands are run one by one in the same shell.
+    Each command is framed by a sentinel line with its exit code, like: __ADB_CMD_END__<seq> <exit code>
+    '''
+
+    # sentinel is joined by printf, and not appears in the input line echoed by pty shell
+    __sentinel_head = '__ADB_CMD_'
+    __sentinel_tail = 'END__'
+
+    def __init__(self, serial='', timeout=10):
+        self.__logger = LogManager.get_logger()
+        self.__adb_args = ['adb', '-s', serial] if len(serial) > 0 else ['adb']
+        self.__timeout = timeout
+        self.__lock = threading.Lock()
+        self.__process = None
+        self.__lines = None
+        self.__seq = 0
+
+    def __start(self):
+        self.__logger.debug('Start adb shell session: ' + ' '.join(self.__adb_args))
+        self.__process = subprocess.Popen(self.__adb_args + ['shell'], stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.__lines = queue.Queue()
+        t = threading.Thread(target=self.__read_loop, args=(self.__process, self.__lines), daemon=True)
+        t.start()
+
+    def __read_loop(self, process, lines):
+        for raw_line in process.stdout:
+            lines.put(raw_line.decode(encoding='utf-8', errors='replace'))
+        lines.put(None)  # shell exit
+
+    def is_alive(self):
+        return self.__process is not None and self.__process.poll() is None
+
+    def run(self, cmd, timeout=None):
+        '''
+        Returns (exit code, output lines). Exit code is -1 if timeout or shell exit, and session is restarted by next run.
+        '''
+        timeout = timeout if timeout is not None else self.__timeout
+        with self.__lock:
+            if not self.is_alive():
+                self.__start()
+            self.__seq += 1
+            sentinel = '%s%s%d ' % (self.__sentinel_head, self.__sentinel_tail, self.__seq)
+            # run in sub shell, and cd or variables are not leaked into the following commands
+            # stdin from /dev/null, then command cannot read the following framed commands
+            frame = "( %s\n) </dev/null 2>&1\nprintf '%%s%%s %%d\\n' %s %s%d $?\n" % (
+                cmd, self.__sentinel_head, self.__sentinel_tail, self.__seq)
+
+            self.__logger.debug('Exec shell session command: ' + cmd)
+            try:
+                self.__process.stdin.write(frame.encode(encoding='utf-8'))
+                self.__process.stdin.flush()
+            except OSError as e:
+                self.__logger.error('Write into adb shell session failed: ' + str(e))
+                self.__close()
+                return -1, []
+            return self.__read_until_sentinel(cmd, sentinel, frame.split('\n')[:-1], timeout)
+
+    def __read_until_sentinel(self, cmd, sentinel, frame_lines, timeout):
+        ret_lines = []
+        echo_idx = 0  # frame lines echoed by pty shell are skipped
+        deadline = time.perf_counter() + timeout
+        while 1:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # output of the timeout command is out of frame, and the session can not be reused
+                self.__logger.error('Shell session command time out(%ss): %s' % (timeout, cmd))
+                self.__close()
+                return -1, ret_lines
+            try:
+                line = self.__lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                self.__logger.error('Adb shell session exit when run command: ' + cmd)
+                self.__close()
+                return -1, ret_lines
+
+            if echo_idx < len(frame_lines) and line.rstrip('\r\n') == frame_lines[echo_idx]:
+                echo_idx += 1
+                continue
+            idx = line.find(sentinel)
+            if idx == -1:
+                ret_lines.append(line.rstrip('\r\n') + '\n')
+                continue
+            try:
+                exit_code = int(line[idx + len(sentinel):].strip())
+            except ValueError:
+                ret_lines.append(line.rstrip('\r\n') + '\n')
+                continue
+            if idx > 0:  # last output line without line end
+                ret_lines.append(line[:idx] + '\n')
+            return exit_code, ret_lines
+
+    def __close(self):
+        if self.__process is None:
+            return
+        if self.__process.poll() is None:
+            try:
+                self.__process.stdin.write(b'exit\n')
+                self.__process.stdin.flush()
+                self.__process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.__process.kill()
+        self.__process = None
+        self.__lines = None
+
+    def close(self):
+        with self.__lock:
+            self.__close()
+
+
 class AdbUtils(object):
 
     __adb = None
@@ -26,9 +144,68 @@ class AdbUtils(object):
             cls.__adb = AdbUtils()
         return cls.__adb
 
-    def __init__(self):
+    def __init__(self, serial=''):
+        '''
+        Commands are sent to the device of serial by "adb -s", or the only connected device if serial is empty.
+        '''
         self.__logger = LogManager.get_logger()
         self.__sys_utils = SysUtils.get_instance()
+        self.__serial = serial
+        self.__adb_cmd = 'adb -s %s' % serial if len(serial) > 0 else 'adb'
+        self.__shell_session = None
+
+    def get_serial(self):
+        return self.__serial
+
+    def get_adb_cmd(self):
+        return self.__adb_cmd
+
+    # --------------------------------------------------------------
+    # Shell session
+    # --------------------------------------------------------------
+    def use_shell_session(self, timeout=10):
+        '''
+        Run shell commands in one persistent "adb shell" process, instead of a new adb process for each command.
+        '''
+        if self.__shell_session is None:
+            self.__shell_session = AdbShellSession(self.__serial, timeout)
+        return self
+
+    def get_shell_session(self):
+        return self.__shell_session
+
+    def close_shell_session(self):
+        if self.__shell_session is not None:
+            self.__shell_session.close()
+            self.__shell_session = None
+        return self
+
+    def run_shell_cmd(self, cmd):
+        if self.__shell_session is not None:
+            ret_code, _ = self.__shell_session.run(cmd)
+            return ret_code == 0
+        return self.__sys_utils.run_sys_cmd('%s shell "%s"' % (self.__adb_cmd, cmd))
+
+    def run_shell_cmd_and_ret_lines(self, cmd):
+        if self.__shell_session is not None:
+            _, lines = self.__shell_session.run(cmd)
+            if len(lines) == 0:
+                self.__logger.warning('The output is empty for shell command => ' + cmd)
+            return lines
+        return self.__sys_utils.run_sys_cmd_and_ret_lines('%s shell "%s"' % (self.__adb_cmd, cmd))
+
+    def run_shell_cmd_and_ret_content(self, cmd):
+        if self.__shell_session is not None:
+            _, lines = self.__shell_session.run(cmd)
+            content = ''.join(lines)
+            if content == '':
+                self.__logger.warning('The output is empty for shell command => ' + cmd)
+            return content.strip('\r\n')
+        return self.__sys_utils.run_sys_cmd_and_ret_content('%s shell "%s"' % (self.__adb_cmd, cmd))
+
+    # --------------------------------------------------------------
+    # Device and app function
+    # --------------------------------------------------------------
 
     @classmethod
     def print_adb_info(cls):
@@ -36,21 +213,34 @@ class AdbUtils(object):
         return os.popen(cmd).read()
 
     def start_app(self, app_launch_info):
-        cmd = 'adb shell am start -S ' + app_launch_info
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return self.run_shell_cmd('am start -S ' + app_launch_info)
     
     def stop_app(self, package_name):
-        cmd = 'adb shell am force-stop ' + package_name
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return self.run_shell_cmd('am force-stop ' + package_name)
 
     def clear_app_data(self, pkg_name):
-        cmd = 'adb shell pm clear %s' % pkg_name
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return self.run_shell_cmd('pm clear ' + pkg_name)
+
+    @classmethod
+    def get_connected_devices(cls):
+        '''
+        Returns serials of all devices in "device" state.
+        '''
+        serials = []
+        for line in os.popen('adb devices').readlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[1] == 'device':
+                serials.append(fields[0])
+        return serials
 
     def is_devices_connected(self):
-        # support one device
         self.__logger.debug('check adb devices connected.')
-        
+        if len(self.__serial) > 0:
+            is_connected = self.__serial in self.get_connected_devices()
+            if is_connected:
+                self.__logger.info('connected device: ' + self.__serial)
+            return is_connected
+
         cmd = 'adb devices -l'
 #         cmd = 'adb get-serialno'
         ret_content = self.__sys_utils.run_sys_cmd_and_ret_content(cmd)
@@ -62,53 +252,63 @@ class AdbUtils(object):
         return True
 
     def is_package_on_top(self, pkg_name):
-        cmd = 'adb shell "dumpsys activity | grep mFocusedActivity | grep %s"' % pkg_name
-        ret_content = self.__sys_utils.run_sys_cmd_and_ret_content(cmd)
+        cmd = 'dumpsys activity | grep mFocusedActivity | grep ' + pkg_name
+        ret_content = self.run_shell_cmd_and_ret_content(cmd)
         return len(ret_content) != 0
 
     def dump_app_info(self, app_name, file_path):
+        return self.__sys_utils.run_sys_cmd(self.__build_dump_app_info_cmd(app_name, file_path))
+
+    def __build_dump_app_info_cmd(self, app_name, file_path):
         if os.path.exists(file_path):
             self.__logger.warning('file %s is exist and will be override!' % file_path)
-        cmd = 'adb shell dumpsys package %s > %s' % (app_name, file_path)
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return '%s shell dumpsys package %s > %s' % (self.__adb_cmd, app_name, file_path)
 
     def get_android_version(self):
-        cmd = 'adb shell "getprop | grep \'ro.build.version.release\' | cut -f 2 -d \' \'"'
-        ret_content = self.__sys_utils.run_sys_cmd_and_ret_content(cmd)
+        cmd = 'getprop | grep \'ro.build.version.release\' | cut -f 2 -d \' \''
+        ret_content = self.run_shell_cmd_and_ret_content(cmd)
         return ret_content.lstrip('[').rstrip(']')
 
     def dump_device_props(self, file_path):
+        return self.__sys_utils.run_sys_cmd(self.__build_dump_device_props_cmd(file_path))
+
+    def __build_dump_device_props_cmd(self, file_path):
         if os.path.exists(file_path):
             self.__logger.warning('file %s is exist and will be override!' % file_path)
-        cmd = 'adb shell getprop > %s' % file_path
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return '%s shell getprop > %s' % (self.__adb_cmd, file_path)
+
+    def dump_device_props_and_app_info(self, props_file_path, app_name, app_info_file_path, timeout=30):
+        '''
+        Dump device props and app info at the same time.
+        '''
+        cmds = (self.__build_dump_device_props_cmd(props_file_path),
+                self.__build_dump_app_info_cmd(app_name, app_info_file_path))
+        results = self.__sys_utils.run_cmds(cmds, timeout=timeout)
+        return all([result.is_ok() for result in results])
 
     def dump_logcat_by_tag(self, tag, file_path):
-        cmd = 'adb logcat -c && adb logcat -s %s -v time -d > %s' % (tag, file_path)
+        cmd = '%s logcat -c && %s logcat -s %s -v time -d > %s' % (self.__adb_cmd, self.__adb_cmd, tag, file_path)
         return self.__sys_utils.run_sys_cmd(cmd)
 
     def dump_anr_files(self, save_path):
-        cmd = 'adb pull /data/anr %s' % save_path
+        cmd = '%s pull /data/anr %s' % (self.__adb_cmd, save_path)
         return self.__sys_utils.run_sys_cmd(cmd)
 
     def clear_anr_dir(self):
-        cmd = 'adb shell "rm -f /data/anr/* 2>/dev/null"'
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return self.run_shell_cmd('rm -f /data/anr/* 2>/dev/null')
 
     def dump_tombstone_files(self, save_path):
-        cmd = 'adb pull /data/tombstones %s' % save_path
+        cmd = '%s pull /data/tombstones %s' % (self.__adb_cmd, save_path)
         return self.__sys_utils.run_sys_cmd(cmd)
 
     def clear_tombstone_dir(self):
-        cmd = 'adb shell "rm -f /data/tombstones/* 2>/dev/null"'
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return self.run_shell_cmd('rm -f /data/tombstones/* 2>/dev/null')
 
     # --------------------------------------------------------------
     # Process handle function
     # --------------------------------------------------------------
     def get_process_id_by_name(self, p_name):
-        cmd = 'adb shell ps | findstr %s' % p_name
-        for line in os.popen(cmd).readlines():
+        for line in self.run_shell_cmd_and_ret_lines('ps | grep ' + p_name):
             if p_name in line:
                 return line.split()[1]  # process id
         return ''
@@ -116,19 +316,16 @@ class AdbUtils(object):
     def kill_process_by_pid(self, p_id):
         if p_id is None or len(p_id) == 0:
             return
-        cmd = 'adb shell kill %s' % p_id
-        return self.__sys_utils.run_sys_cmd(cmd)
+        return self.run_shell_cmd('kill ' + p_id)
 
     # --------------------------------------------------------------
     # IO function
     # --------------------------------------------------------------
     def create_dir_on_shell(self, dir_path):
-        cmd = 'adb shell "mkdir %s 2>/dev/null"' % dir_path
-        return self.__sys_utils.run_sys_cmd_and_ret_lines(cmd)
+        return self.run_shell_cmd_and_ret_lines('mkdir %s 2>/dev/null' % dir_path)
 
     def remove_files_on_shell(self, file_path):
-        cmd = 'adb shell "rm -rf %s 2>/dev/null"' % file_path
-        return self.__sys_utils.run_sys_cmd_and_ret_lines(cmd)
+        return self.run_shell_cmd_and_ret_lines('rm -rf %s 2>/dev/null' % file_path)
 
 
 if __name__ == '__main__':
@@ -139,6 +336,13 @@ if __name__ == '__main__':
     if utils.is_devices_connected():
         logger.info('Monkey pid:', utils.get_process_id_by_name('monkey'))
         logger.info('android version:', utils.get_android_version())
+
+        utils.use_shell_session()
+        start = time.perf_counter()
+        for i in range(20):
+            utils.get_process_id_by_name('adbd')
+        logger.info('shell session, 20 queries in %.3f secs' % (time.perf_counter() - start))
+        utils.close_shell_session()
     else:
         logger.info('no adb device connect!')
 
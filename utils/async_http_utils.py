@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+'''
+Created on 2019-03-20
+
+@author: zhengjin
+
+aiohttp is required, and this module is not exported by utils package:
+from utils.async_http_utils import AsyncHttpUtils
+Case schema and headers format are taken from apitest (TestBase and LoadCases), so pytest is also required.
+'''
+
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+import aiohttp
+
+sys.path.append(os.getenv('PYPATH'))
+from utils import Constants
+from utils import LogManager
+from utils import HttpUtils
+Constants.add_project_paths()
+
+# same case schema and headers format as api test cases
+from common import LoadCases
+from testcases import TestBase
+
+
+class AsyncHttpResponse(object):
+    '''
+    Response read from aiohttp, with the same fields used by api test asserts.
+    '''
+
+    def __init__(self, url, status_code, headers, content, elapsed):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed  # datetime.timedelta, same as requests.Response.elapsed
+
+    @property
+    def text(self):
+        return self.content.decode(encoding='utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncHttpUtils(object):
+    '''
+    Asyncio http engine, send many requests at once with concurrency limit per host.
+    '''
+
+    HTTP_METHOD_GET = HttpUtils.HTTP_METHOD_GET
+    HTTP_METHOD_POST_DATA = HttpUtils.HTTP_METHOD_POST_DATA
+    HTTP_METHOD_POST_JSON = HttpUtils.HTTP_METHOD_POST_JSON
+
+    def __init__(self, limit_per_host=100, limit_total=0):
+        self.__logger = LogManager.get_logger()
+        self.__limit_per_host = limit_per_host
+        self.__limit_total = limit_total
+        self.__headers = {}
+        self.__session = None
+
+    def set_default_headers(self, headers):
+        self.__headers = headers
+        return self
+
+    # --------------------------------------------------------------
+    # Session
+    # --------------------------------------------------------------
+    def __get_session(self):
+        # session is bound to the running event loop, create it lazily inside the loop
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.__limit_total, limit_per_host=self.__limit_per_host)
+            self.__session = aiohttp.ClientSession(connector=connector)
+        return self.__session
+
+    async def close(self):
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+        self.__session = None
+
+    # --------------------------------------------------------------
+    # Async Http Request
+    # --------------------------------------------------------------
+    async def send_http_request(self, method, url, data, headers={}, timeout=1):
+        req_headers = dict(self.__headers)
+        req_headers.update(headers)
+
+        kwargs = {'headers': req_headers, 'timeout': aiohttp.ClientTimeout(total=timeout)}
+        if method == self.HTTP_METHOD_GET:
+            http_method = 'GET'
+            kwargs['params'] = self.__format_query_to_dict(data)
+        elif method == self.HTTP_METHOD_POST_DATA:
+            http_method = 'POST'
+            kwargs['data'] = data
+        elif method == self.HTTP_METHOD_POST_JSON:
+            http_method = 'POST'
+            kwargs['json'] = data
+        else:
+            raise ValueError('invalid http request method!')
+
+        start = time.perf_counter()
+        try:
+            async with self.__get_session().request(http_method, url, **kwargs) as resp:
+                content = await resp.read()
+                return AsyncHttpResponse(str(resp.url), resp.status, dict(resp.headers), content,
+                                         datetime.timedelta(seconds=time.perf_counter() - start))
+        except asyncio.TimeoutError:
+            self.__logger.error('http %s request time out(%ss): %s' % (method, timeout, url))
+        except aiohttp.ClientError as e:
+            self.__logger.error('http %s request failed: %s, %s' % (method, url, e))
+        return None
+
+    async def send_http_requests(self, requests, timeout=1):
+        '''
+        Requests: list of tuple (method, url, data, headers), and returns responses in input order.
+        Response is None for the request which is None or failed, and not breaks other requests.
+        '''
+        async def _none():
+            return None
+
+        tasks = [self.send_http_request(req[0], req[1], req[2], req[3], timeout) if req is not None else _none()
+                 for req in requests]
+        ret_resps = []
+        for req, resp in zip(requests, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(resp, Exception):
+                self.__logger.error('http %s request failed: %s, %r' % (req[0], req[1], resp))
+                resp = None
+            ret_resps.append(resp)
+        return ret_resps
+
+    def __format_query_to_dict(self, query):
+        data_dict = {}
+        if len(query) > 0:
+            for entry in query.split('&'):
+                k, _, v = entry.partition('=')  # value may include "=", or missing
+                data_dict[k] = v
+        return data_dict
+
+    # --------------------------------------------------------------
+    # Batch Cases
+    # --------------------------------------------------------------
+    def send_cases(self, cases, timeout=1):
+        '''
+        Cases: list of case dicts from LoadCases.get_tc_data_dict(), and returns responses in input order.
+        '''
+        requests = []
+        for case in cases:
+            try:
+                requests.append(self.__format_case_to_request(case))
+            except (KeyError, ValueError) as e:
+                self.__logger.error('invalid case, and skipped: %r, %s' % (case, e))
+                requests.append(None)
+
+        async def _run():
+            try:
+                return await self.send_http_requests(requests, timeout)
+            finally:
+                await self.close()
+
+        start = time.perf_counter()
+        ret_resps = asyncio.run(_run())
+        self.__logger.info('send %d cases in %.3f secs, failed: %d' % (
+            len(cases), time.perf_counter() - start, len([r for r in ret_resps if r is None])))
+        return ret_resps
+
+    def __format_case_to_request(self, case):
+        method = case[TestBase.CASE_SCHEMA_METHOD]
+        data = case[TestBase.CASE_SCHEMA_QUERY] if method == self.HTTP_METHOD_GET else case[TestBase.CASE_SCHEMA_BODY]
+        if method == self.HTTP_METHOD_POST_JSON and isinstance(data, str):
+            data = json.loads(data)
+        headers = case.get(TestBase.CASE_SCHEMA_HEADER, {})
+        if isinstance(headers, str):
+            headers = LoadCases.format_headers_to_dict(headers)
+        return method, case[TestBase.CASE_SCHEMA_URL], data, headers
+
+
+if __name__ == '__main__':
+
+    LogManager.build_logger(Constants.LOG_FILE_PATH)
+
+    mock_url = 'http://127.0.0.1:17891/index'
+    cases = []
+    for i in range(100):
+        cases.append({TestBase.CASE_SCHEMA_METHOD: AsyncHttpUtils.HTTP_METHOD_GET, TestBase.CASE_SCHEMA_URL: mock_url,
+                      TestBase.CASE_SCHEMA_QUERY: 'k1=v1&k2=%d' % i, TestBase.CASE_SCHEMA_BODY: '',
+                      TestBase.CASE_SCHEMA_HEADER: 'X-Test-Method:X-Test-Get'})
+        cases.append({TestBase.CASE_SCHEMA_METHOD: AsyncHttpUtils.HTTP_METHOD_POST_JSON, TestBase.CASE_SCHEMA_URL: mock_url,
+                      TestBase.CASE_SCHEMA_QUERY: '', TestBase.CASE_SCHEMA_BODY: '{"index": %d}' % i,
+                      TestBase.CASE_SCHEMA_HEADER: 'X-Test-Method:X-Test-Post'})
+
+    http_utils = AsyncHttpUtils(limit_per_host=20)
+    resps = http_utils.send_cases(cases, timeout=3)
+    assert(len(resps) == len(cases))
+    assert(all([resp is not None and resp.status_code == 200 for resp in resps]))
+
+    LogManager.clear_log_handles()
+    print('async http utils test DONE.')
@@ -45,6 +45,8 @@ class Constants(object):
     MAX_RUN_TIME = 12 * 60 * 60
     WAIT_TIME_IN_LOOP = 15
     LOGCAT_LOG_LEVEL = 'I'
+    # stream logcat into host (compressed segments, live exception and anr), instead of on-device file + grep + pull
+    IS_LIVE_LOGCAT = True
 
     PKG_NAME_ZGB = 'com.jd.b2b'
     RUN_MINS_TEXT = 'run_mins'
@@ -52,6 +54,8 @@ class Constants(object):
 
     IS_PROFILE_TEST = True
     ITEST_COLLECT_INTERVAL = 3
+    # secs, for Android 7+ profile by /proc sampler
+    PROC_SAMPLE_INTERVAL = 1
     IS_CREATE_ARCHIVE = False
 
     # fix dependency paths
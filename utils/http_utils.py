@@ -8,9 +8,17 @@ Created on 2019-03-06
 import base64
 import os
 import sys
+import itertools
 import json
+import logging
+import threading
 import requests
 
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 sys.path.append(os.getenv('PYPATH'))
 from utils import LogManager
 from utils import Constants
@@ -24,6 +32,11 @@ class HttpUtils(object):
 
     __http = None
 
+    # pooled sessions shared by all instances, one per base host (scheme://netloc)
+    __sessions = {}
+    __sessions_configs = {}
+    __sessions_lock = threading.Lock()
+
     @classmethod
     def get_instance(cls):
         if cls.__http is None:
@@ -33,11 +46,94 @@ class HttpUtils(object):
     def __init__(self):
         self.__logger = LogManager.get_logger()
         self.__headers = {}
+        self.__is_pooled = False
+        self.__pool_configs = {}
+        self.__log_sample_rate = 1
+        self.__is_log_failed_only = False
+        self.__log_counter = itertools.count()
 
     def set_default_headers(self, headers):
         self.__headers = headers
         return self
 
+    def set_log_sampling(self, sample_rate=1, is_failed_only=False):
+        '''
+        Log request and response info for 1 in every sample_rate requests, or only for failed requests.
+        '''
+        if sample_rate < 1:
+            raise ValueError('log sample rate should be greater than 0!')
+        self.__log_sample_rate = sample_rate
+        self.__is_log_failed_only = is_failed_only
+        return self
+
+    # --------------------------------------------------------------
+    # Pooled Sessions
+    # --------------------------------------------------------------
+    def use_pooled_session(self, pool_size=10, keep_alive=True, max_retries=3, backoff_factor=0.3):
+        '''
+        Send requests by a shared requests.Session per base host instead of requests.get/post,
+        so the tcp (and tls) connections are reused across test cases.
+        Cookies are not kept by the shared sessions, and each case sends its own cookie headers.
+        Configs only apply to sessions created later, the existing session of a host is kept until closed.
+        '''
+        self.__is_pooled = True
+        self.__pool_configs = {'pool_size': pool_size, 'keep_alive': keep_alive,
+                               'max_retries': max_retries, 'backoff_factor': backoff_factor}
+        with self.__sessions_lock:
+            for base_host, cfgs in self.__sessions_configs.items():
+                if cfgs != self.__pool_configs:
+                    self.__logger.warning('pooled http session for %s exists, and new configs are ignored: %s'
+                                          % (base_host, self.__pool_configs))
+        return self
+
+    def use_default_request(self):
+        self.__is_pooled = False
+        return self
+
+    @classmethod
+    def close_pooled_sessions(cls):
+        with cls.__sessions_lock:
+            for sess in cls.__sessions.values():
+                sess.close()
+            cls.__sessions.clear()
+            cls.__sessions_configs.clear()
+
+    def __get_requester(self, url):
+        if not self.__is_pooled:
+            return requests
+
+        parsed = urlparse(url)
+        base_host = '%s://%s' % (parsed.scheme, parsed.netloc)
+        sess = self.__sessions.get(base_host)
+        if sess is not None:
+            return sess
+
+        with self.__sessions_lock:
+            sess = self.__sessions.get(base_host)
+            if sess is None:
+                sess = self.__create_session()
+                self.__sessions[base_host] = sess
+                self.__sessions_configs[base_host] = self.__pool_configs
+                self.__logger.debug('create pooled http session for: ' + base_host)
+        return sess
+
+    def __create_session(self):
+        cfgs = self.__pool_configs
+        # return the last 5xx response instead of raising RetryError when retries are exhausted
+        retry = Retry(total=cfgs['max_retries'], backoff_factor=cfgs['backoff_factor'],
+                      status_forcelist=(502, 503, 504), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=cfgs['pool_size'],
+                              max_retries=retry, pool_block=True)
+
+        sess = requests.Session()
+        # shared by all test cases, so set-cookie from one case should not be sent by others
+        sess.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        sess.mount('http://', adapter)
+        sess.mount('https://', adapter)
+        if not cfgs['keep_alive']:
+            sess.headers['Connection'] = 'close'
+        return sess
+
     def send_http_request(self, method, url, data, headers={}, timeout=1, is_log_body=True):
         if method == self.HTTP_METHOD_GET:
             return self.__send_get_request(url, data, headers, timeout, is_log_body)
@@ -62,11 +158,11 @@ class HttpUtils(object):
 
         resp = None
         try:
-            self.__log_request_info(url, query, self.__headers)
-            resp = requests.get(url, params=data_dict, headers=self.__headers, timeout=timeout)
-            self.__log_response_info(resp, is_log_body)
+            resp = self.__get_requester(url).get(url, params=data_dict, headers=self.__headers, timeout=timeout)
         except TimeoutError:
             self.__logger.error('http get request time out(%ds)!' % timeout)
+        finally:
+            self.__log_http_info(url, query, resp, is_log_body)
 
         return resp
 
@@ -78,11 +174,11 @@ class HttpUtils(object):
 
         resp = None
         try:
-            self.__log_request_info(url, data, self.__headers)
-            resp = requests.post(url, headers=self.__headers, data=data, timeout=timeout)
-            self.__log_response_info(resp, is_log_body)
+            resp = self.__get_requester(url).post(url, headers=self.__headers, data=data, timeout=timeout)
         except TimeoutError:
             self.__logger.error('http post request time out(%ds)!' % timeout)
+        finally:
+            self.__log_http_info(url, data, resp, is_log_body)
 
         return resp
 
@@ -91,11 +187,11 @@ class HttpUtils(object):
 
         resp = None
         try:
-            self.__log_request_info(url, json.dumps(json_object), self.__headers)
-            resp = requests.post(url, headers=self.__headers, json=json_object, timeout=timeout)
-            self.__log_response_info(resp, is_log_body)
+            resp = self.__get_requester(url).post(url, headers=self.__headers, json=json_object, timeout=timeout)
         except TimeoutError:
             self.__logger.error('http post request time out(%ds)!' % timeout)
+        finally:
+            self.__log_http_info(url, json_object, resp, is_log_body)
 
         return resp
 
@@ -106,36 +202,54 @@ class HttpUtils(object):
     # --------------------------------------------------------------
     # Print Logs
     # --------------------------------------------------------------
-    def __log_request_info(self, url, data, headers={}):
-        self.__logger.debug('\n\n')
-        self.__print_div_line()
-        self.__print_with_prefix('Request: ' + url)
-
-        self.__print_div_line()
-        self.__print_with_prefix('Headers:')
-        for item in ['%s: %s' % (k, v) for k, v in headers.items()]:
-            self.__print_with_prefix(item)
-
-        self.__print_div_line()
+    def __is_debug_log_enabled(self):
+        if not self.__logger.isEnabledFor(logging.DEBUG):
+            return False
+        for handler in self.__logger.handlers:
+            if handler.level <= logging.DEBUG:
+                return True
+        return False
+
+    def __is_log_sampled(self, resp):
+        if self.__is_log_failed_only:
+            return resp is None or resp.status_code >= 400
+        return next(self.__log_counter) % self.__log_sample_rate == 0
+
+    def __log_http_info(self, url, data, resp, is_log_body):
+        # skip all formatting and body decoding if the logs will be dropped
+        if not self.__is_debug_log_enabled() or not self.__is_log_sampled(resp):
+            return
+
+        lines = self.__format_request_info(url, data, self.__headers)
+        if resp is not None:
+            lines.extend(self.__format_response_info(resp, is_log_body))
+        self.__logger.debug('\n\n' + '\n'.join(['* ' + line for line in lines]))
+
+    def __format_request_info(self, url, data, headers={}):
+        if not isinstance(data, str):
+            data = json.dumps(data)
+
+        lines = [self.__div_line(), 'Request: ' + url]
+        lines.extend([self.__div_line(), 'Headers:'])
+        lines.extend(['%s: %s' % (k, v) for k, v in headers.items()])
+
+        lines.append(self.__div_line())
         if data.startswith('{'):
-            self.__print_with_prefix('Body: \n' + data[:512])
+            lines.append('Body: \n' + data[:512])
         else:
-            self.__print_with_prefix('Query: ' + data)
+            lines.append('Query: ' + data)
 
-        self.__print_div_line()
-        self.__print_with_prefix('END')
+        lines.extend([self.__div_line(), 'END'])
+        return lines
 
-    def __log_response_info(self, resp, is_log_body=True):
-        self.__print_div_line()
-        self.__print_with_prefix('Url: ' + resp.url)
-        self.__print_with_prefix('Status Code: %d' % resp.status_code)
+    def __format_response_info(self, resp, is_log_body=True):
+        lines = [self.__div_line(), 'Url: ' + resp.url]
+        lines.append('Status Code: %d' % resp.status_code)
 
-        self.__print_div_line()
-        self.__print_with_prefix('Headers:')
-        for item in ['%s: %s' % (k, v) for k, v in resp.headers.items()]:
-            self.__print_with_prefix(item)
+        lines.extend([self.__div_line(), 'Headers:'])
+        lines.extend(['%s: %s' % (k, v) for k, v in resp.headers.items()])
 
-        self.__print_div_line()
+        lines.append(self.__div_line())
         content = 'null'
         if is_log_body:
             try:
@@ -145,16 +259,13 @@ class HttpUtils(object):
                     content = resp.content.decode(encoding='gbk')
                 except UnicodeDecodeError as _:
                     content = str(base64.b64encode(resp.content))
-        self.__print_with_prefix('Body: \n' + content[:1024])
+        lines.append('Body: \n' + content[:1024])
 
-        self.__print_div_line()
-        self.__print_with_prefix('END')
+        lines.extend([self.__div_line(), 'END'])
+        return lines
 
-    def __print_div_line(self):
-        self.__print_with_prefix('-'*60)
-
-    def __print_with_prefix(self, text):
-        self.__logger.debug('* ' + text)
+    def __div_line(self):
+        return '-'*60
 
 
 if __name__ == '__main__':
@@ -184,5 +295,13 @@ if __name__ == '__main__':
         HttpUtils.HTTP_METHOD_POST_JSON, mock_url, data_dict, headers=headers)
     assert(resp is not None and resp.status_code == 200)
 
+    # pooled session, and log failed requests only
+    http_utils.use_pooled_session(pool_size=4).set_log_sampling(is_failed_only=True)
+    for _ in range(3):
+        resp = http_utils.send_http_request(
+            HttpUtils.HTTP_METHOD_GET, mock_url, query, headers=headers, timeout=0.5)
+        assert(resp is not None and resp.status_code == 200)
+    HttpUtils.close_pooled_sessions()
+
     LogManager.clear_log_handles()
     print('http utils test DONE.')
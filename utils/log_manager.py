@@ -26,6 +26,10 @@ class LogManager(object):
             raise Exception('Pls init logger by build_logger() before use!')
         return cls.__logger
 
+    @classmethod
+    def has_logger(cls):
+        return cls.__logger is not None
+
     @classmethod
     def build_logger(cls, log_path, stream_log_level=logging.INFO, file_log_level=logging.DEBUG):
         log_format_short = '%(asctime)s %(filename)s: [%(levelname)s] >>> %(message)s'
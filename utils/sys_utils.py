@@ -8,7 +8,10 @@ Created on 2018-10-26
 import os
 import sys
 import codecs
+import concurrent.futures
+import signal
 import time
+import threading
 import subprocess
 
 sys.path.append(os.getenv('PYPATH'))
@@ -16,6 +19,26 @@ from utils import Constants
 from utils import LogManager
 
 
+class CmdResult(object):
+    '''
+    Result of a command run by SysUtils.run_cmd() and SysUtils.run_cmds().
+    Ret code is -1 if the command is killed because of timeout.
+    '''
+
+    def __init__(self, cmd, ret_code, stdout, stderr, elapsed):
+        self.cmd = cmd
+        self.ret_code = ret_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.elapsed = elapsed  # seconds
+
+    def is_ok(self):
+        return self.ret_code == 0
+
+    def get_lines(self):
+        return self.stdout.splitlines(keepends=True)
+
+
 class SysUtils(object):
     '''
     classdocs
@@ -80,10 +103,11 @@ class SysUtils(object):
         self.__logger.debug('Exec command: ' + cmd)
     
         p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p.wait()
+        # read both pipes until exit, wait() before read blocks when pipe buffer is full
+        output, error = p.communicate()
     
-        lines_error = p.stderr.readlines()
-        lines_output = p.stdout.readlines()
+        lines_error = error.splitlines(keepends=True)
+        lines_output = output.splitlines(keepends=True)
         if len(lines_error) > 0:
             return lines_error
         if len(lines_output) > 0:
@@ -91,6 +115,83 @@ class SysUtils(object):
         self.__logger.warning('The output is empty for command => ' + cmd)
         return ''
 
+    # --------------------------------------------------------------
+    # Command runner
+    # --------------------------------------------------------------
+    def run_cmd(self, cmd, timeout=None):
+        '''
+        Run command in shell, and returns CmdResult with exit code, output and elapsed time.
+        '''
+        self.__logger.debug('Exec command: ' + cmd)
+        start = time.perf_counter()
+        p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             start_new_session=self.__is_posix())
+        try:
+            output, error = p.communicate(timeout=timeout)
+            ret_code = p.returncode
+        except subprocess.TimeoutExpired:
+            self.__logger.error('Command time out(%ss) => %s' % (timeout, cmd))
+            self.__kill_process_tree(p)
+            output, error = p.communicate()
+            ret_code = -1
+        return self.__build_cmd_result(cmd, ret_code, output, error, time.perf_counter() - start)
+
+    def iter_cmd_output_lines(self, cmd, timeout=None):
+        '''
+        Run command in shell, and yield output lines (stderr included) while command is running.
+        '''
+        self.__logger.debug('Exec command: ' + cmd)
+        p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                             start_new_session=self.__is_posix())
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, self.__kill_process_tree, args=(p,))
+            timer.start()
+        try:
+            for line in p.stdout:
+                yield line.decode(encoding='utf-8', errors='replace')
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if p.poll() is None:
+                self.__kill_process_tree(p)  # generator is closed before command exit
+            p.stdout.close()
+            ret_code = p.wait()
+            if ret_code != 0:
+                self.__logger.warning('Failed, run command => %s, return code is %d' % (cmd, ret_code))
+
+    def run_cmds(self, cmds, timeout=None, max_concurrency=10):
+        '''
+        Run commands at the same time, and returns CmdResult list in input order.
+        Commands are run in threads, and asyncio subprocess is not supported by default event loop on windows (python 3.7).
+        '''
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            results = list(executor.map(lambda cmd: self.run_cmd(cmd, timeout), cmds))
+        self.__logger.debug('run %d commands in %.3f secs, failed: %d' % (
+            len(cmds), time.perf_counter() - start, len([r for r in results if not r.is_ok()])))
+        return results
+
+    def __is_posix(self):
+        return os.name == 'posix'
+
+    def __kill_process_tree(self, p):
+        # kill shell and its children (like "sleep" in "echo x; sleep 5"), which hold the output pipes
+        if self.__is_posix():
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            subprocess.run('taskkill /F /T /PID %d' % p.pid, shell=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def __build_cmd_result(self, cmd, ret_code, output, error, elapsed):
+        if ret_code != 0:
+            self.__logger.warning('Failed, run command => %s, return code is %d' % (cmd, ret_code))
+        return CmdResult(cmd, ret_code, output.decode(encoding='utf-8', errors='replace'),
+                         error.decode(encoding='utf-8', errors='replace'), elapsed)
+
     # --------------------------------------------------------------
     # IO functions
     # --------------------------------------------------------------    
@@ -167,6 +268,11 @@ if __name__ == '__main__':
 
     utils = SysUtils.get_instance()
     utils.run_sys_cmd('python --version')
+
+    results = utils.run_cmds(['sleep 1 && echo %d' % i for i in range(5)], timeout=3)
+    print(['%s: %.3fs' % (r.stdout.strip(), r.elapsed) for r in results])
+    for line in utils.iter_cmd_output_lines('python --version'):
+        print(line.strip())
     utils.write_content_to_file(Constants.TEST_FILE_PATH, 'test')
 
     LogManager.clear_log_handles()
@@ -5,14 +5,17 @@ Created on 2019-03-07
 @author: zhengjin
 '''
 
+import glob
 import os
 import json
 import sys
+import threading
 import xlrd
 
 sys.path.append(os.getenv('PYPATH'))
 from utils import Constants
 from utils import LogManager
+from utils import SysUtils
 
 
 class XlsxUtils(object):
@@ -28,15 +31,41 @@ class XlsxUtils(object):
     def __init__(self):
         self.__logger = LogManager.get_logger()
         self.__sheet = None
+        self.__sheet_file_path = None
+        self.__workbooks = {}  # file_path => (mtime, workbook)
 
     def get_all_sheets_names(self, file_path):
         self.__verify_target_file(file_path)
+        return self.__open_workbook(file_path).sheet_names()
 
-        workbook = xlrd.open_workbook(file_path)
-        ret_names = []
-        for sheet in workbook.sheets():
-            ret_names.append(sheet.name)
-        return ret_names
+    def __open_workbook(self, file_path, sheet_name=None):
+        '''
+        Open workbook once and reuse it until the file is modified, sheets are loaded on demand.
+        Sheets of .xlsx are all loaded when open (on_demand is not supported by xlrd), and the workbook
+        is opened again if the sheet was unloaded after read.
+        '''
+        mtime = os.path.getmtime(file_path)
+        cached = self.__workbooks.get(file_path)
+        if cached is not None and cached[0] == mtime:
+            workbook = cached[1]
+            if sheet_name is None or workbook.on_demand or sheet_name not in workbook.sheet_names() \
+                    or workbook.sheet_loaded(sheet_name):
+                return workbook
+        if cached is not None:
+            cached[1].release_resources()
+
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        self.__workbooks[file_path] = (mtime, workbook)
+        return workbook
+
+    def release_workbooks(self):
+        '''
+        Release cached workbooks (file mmap and shared strings), call it when all sheets are read.
+        '''
+        for _, workbook in self.__workbooks.values():
+            workbook.release_resources()
+        self.__workbooks.clear()
+        self.__sheet = None
 
     def __verify_target_file(self, file_path):
         if not os.path.exists(file_path):
@@ -51,8 +80,8 @@ class XlsxUtils(object):
         self.__verify_target_file(file_path)
 
         self.__logger.info('load data from excel / sheet: %s / %s' % (file_path, sheet_name))
-        workbook = xlrd.open_workbook(file_path)
-        self.__sheet = workbook.sheet_by_name(sheet_name)
+        self.__sheet = self.__open_workbook(file_path, sheet_name).sheet_by_name(sheet_name)
+        self.__sheet_file_path = file_path
         return self
 
     def read_header_row(self):
@@ -64,15 +93,8 @@ class XlsxUtils(object):
         return ret_header
 
     def read_all_rows_by_sheet(self, is_include_header=False):
-        self.__verify_before_read_data()
-        ret_rows = []
-        for row in self.__sheet.get_rows():
-            tmp_row = []
-            for cell in row:
-                tmp_row.append(str(cell.value))
-            ret_rows.append(tmp_row)
-
-        return ret_rows[1:] if is_include_header else ret_rows
+        start_row = 1 if is_include_header else 0
+        return list(self.read_rows_iter(start_row=start_row))
 
     def read_values_by_cloumn(self, col_num, is_include_header=False):
         self.__verify_before_read_data()
@@ -87,6 +109,59 @@ class XlsxUtils(object):
         ret_val = self.__sheet.cell(row_num, col_num).value
         return str(ret_val)
 
+    # --------------------------------------------------------------
+    # Streaming read for large data sheet
+    # --------------------------------------------------------------
+    def read_rows_iter(self, columns=None, start_row=0, end_row=None):
+        '''
+        Yield rows of loaded sheet one by one.
+        Columns: list of column index to read, like [0, 3]; and rows in range [start_row, end_row).
+        The sheet is unloaded after iterating, and pre_read_sheet() is required before next read.
+        '''
+        self.__verify_before_read_data()
+        try:
+            nrows = self.__sheet.nrows
+            end_row = nrows if end_row is None else min(end_row, nrows)
+            for row_num in range(start_row, end_row):
+                values = self.__sheet.row_values(row_num)
+                if columns is not None:
+                    values = [values[col] for col in columns]
+                yield [str(val) for val in values]
+        finally:
+            self.__unload_sheet()
+
+    def __unload_sheet(self):
+        cached = self.__workbooks.get(self.__sheet_file_path)
+        if cached is not None and self.__sheet is not None:
+            cached[1].unload_sheet(self.__sheet.name)
+        self.__sheet = None
+
+    def stream_rows_by_sheet(self, file_path, sheet_name, columns=None, start_row=0, end_row=None):
+        '''
+        Yield rows from .xlsx sheet by openpyxl read-only mode, the whole sheet is not loaded into memory.
+        Columns and rows range are same as read_rows_iter().
+        '''
+        import openpyxl
+
+        self.__verify_target_file(file_path)
+        self.__logger.info('stream data from excel / sheet: %s / %s' % (file_path, sheet_name))
+
+        kwargs = {'min_row': start_row + 1, 'max_row': end_row, 'values_only': True}
+        if columns is not None:
+            # only read cells between the min and max projected columns
+            kwargs['min_col'] = min(columns) + 1
+            kwargs['max_col'] = max(columns) + 1
+            columns = [col - min(columns) for col in columns]
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for values in workbook[sheet_name].iter_rows(**kwargs):
+                if columns is not None:
+                    values = [values[col] for col in columns]
+                yield ['' if val is None else str(val) for val in values]
+        finally:
+            workbook.close()
+
     def __verify_before_read_data(self):
         if self.__sheet is None:
             raise Exception('Pls load sheet data first!')
@@ -94,7 +169,87 @@ class XlsxUtils(object):
     # --------------------------------------------------------------
     # Write data to excel sheet
     # --------------------------------------------------------------
-    # TODO:
+    def write_rows_to_sheet(self, file_path, sheet_name, header, rows, is_override=True):
+        '''
+        Write header and rows into .xlsx sheet in one batch (workbook is loaded and saved once).
+        If is_override, the existing sheet is replaced, otherwise rows are appended to it.
+        '''
+        import openpyxl
+
+        if os.path.exists(file_path):
+            workbook = openpyxl.load_workbook(file_path)
+        else:
+            workbook = openpyxl.Workbook()
+            workbook.remove(workbook.active)
+
+        if sheet_name in workbook.sheetnames and is_override:
+            workbook.remove(workbook[sheet_name])
+        if sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+        else:
+            sheet = workbook.create_sheet(sheet_name)
+            sheet.append(header)
+
+        for row in rows:
+            sheet.append(row)
+        workbook.save(file_path)
+        self.__logger.info('write %d rows into excel / sheet: %s / %s' % (len(rows), file_path, sheet_name))
+
+
+class XlsxBulkWriter(object):
+    '''
+    Buffer rows in memory, and write them into excel sheet in one batch.
+    For multiple processes, each process dumps its rows into a spool dir, and one aggregator process merges and writes them.
+    '''
+
+    def __init__(self, file_path, sheet_name, header):
+        self.__logger = LogManager.get_logger()
+        self.__file_path = file_path
+        self.__sheet_name = sheet_name
+        self.__header = header
+        self.__rows = []
+        self.__lock = threading.Lock()
+
+    def append_row(self, row):
+        with self.__lock:
+            self.__rows.append(list(row))
+
+    def __pop_rows(self):
+        with self.__lock:
+            rows = self.__rows
+            self.__rows = []
+        return rows
+
+    def flush(self, is_override=True):
+        rows = self.__pop_rows()
+        if len(rows) == 0:
+            self.__logger.warning('no rows to write into sheet: ' + self.__sheet_name)
+            return
+        XlsxUtils.get_instance().write_rows_to_sheet(
+            self.__file_path, self.__sheet_name, self.__header, rows, is_override)
+
+    # --------------------------------------------------------------
+    # Multiple processes
+    # --------------------------------------------------------------
+    def dump_to_spool(self, spool_dir, worker_id):
+        rows = self.__pop_rows()
+        if len(rows) == 0:
+            return
+
+        SysUtils.create_dir(spool_dir)
+        spool_path = os.path.join(spool_dir, 'rows_%s_%d.json' % (worker_id, os.getpid()))
+        with open(spool_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(spool_path + '.tmp', spool_path)
+
+    def merge_spool_and_flush(self, spool_dir, is_override=True):
+        for spool_path in sorted(glob.glob(os.path.join(spool_dir, 'rows_*.json'))):
+            with open(spool_path, 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+            with self.__lock:
+                self.__rows.extend(rows)
+            os.remove(spool_path)
+        self.flush(is_override)
 
 
 if __name__ == '__main__':
@@ -114,5 +269,19 @@ if __name__ == '__main__':
     # print('test cases:', xlsx.read_values_by_cloumn(1))
     print(xlsx.read_all_rows_by_sheet())
 
+    # streaming read: case name and url columns of rows 1 and 2, sheet is unloaded after each read
+    for row in xlsx.pre_read_sheet(file_path, sheet_name).read_rows_iter(columns=[1, 4], start_row=1, end_row=3):
+        print(row)
+    xlsx.release_workbooks()
+    for row in xlsx.stream_rows_by_sheet(file_path, sheet_name, columns=[1, 4], start_row=1, end_row=3):
+        print(row)
+
+    # bulk write results
+    results_path = os.path.join(os.getenv('HOME'), 'Downloads/tmp_files', 'test_results.xlsx')
+    writer = XlsxBulkWriter(results_path, 'Results', ['CaseName', 'StatusCode', 'Latency(ms)', 'Outcome'])
+    writer.append_row(['test_index_get_01', 200, 12, 'passed'])
+    writer.append_row(['test_index_get_02', 500, 35, 'failed'])
+    writer.flush()
+
     LogManager.clear_log_handles()
     print('xlsx utils test DONE.')